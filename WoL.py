@@ -11,36 +11,30 @@ TARGET_MAC = os.getenv("WOL_MAC")
 BROADCAST_IP = os.getenv("WOL_BROADCAST_ADDR")
 OLLAMA_URL = os.getenv("OLLAMA_URL")
 
-# --- VALIDATION ---
-missing_vars = []
-if not TARGET_MAC or TARGET_MAC == "XX-XX-XX-XX-XX-XX":
-    missing_vars.append("WOL_MAC (in .env)")
-if not BROADCAST_IP:
-    missing_vars.append("WOL_BROADCAST_ADDR (in .env)")
+# Importing this module never exits: the RAG server and the keep-alive scheduler
+# (src/keepalive.py) import it and simply skip waking when it isn't configured.
 
-if missing_vars:
-    print("❌ Error: Missing configuration variables:")
-    for v in missing_vars:
-        print(f"   - {v}")
-    print("\nPlease update your .env file.")
-    exit(1)
+def missing_config():
+    """Names of the Wake-on-LAN settings missing from the environment (empty if configured)."""
+    missing_vars = []
+    if not TARGET_MAC or TARGET_MAC == "XX-XX-XX-XX-XX-XX":
+        missing_vars.append("WOL_MAC (in .env)")
+    if not BROADCAST_IP:
+        missing_vars.append("WOL_BROADCAST_ADDR (in .env)")
+    return missing_vars
 
-# Parse IP/Port from URL
-from urllib.parse import urlparse
-try:
-    if OLLAMA_URL:
-        parsed = urlparse(OLLAMA_URL)
-        OLLAMA_IP = parsed.hostname
-        OLLAMA_PORT = parsed.port or 11434
+def ollama_address(url=None):
+    """(ip, port) of the Ollama server from OLLAMA_URL (or OLLAMA_HOST_IP); ValueError if unset."""
+    from urllib.parse import urlparse
+    url = url or OLLAMA_URL
+    if url:
+        parsed = urlparse(url)
+        ip, port = parsed.hostname, parsed.port or 11434
     else:
-        OLLAMA_IP = os.getenv("OLLAMA_HOST_IP")
-        OLLAMA_PORT = 11434
-        
-    if not OLLAMA_IP:
+        ip, port = os.getenv("OLLAMA_HOST_IP"), 11434
+    if not ip:
         raise ValueError("No OLLAMA_IP found")
-except Exception as e:
-    print(f"❌ Error parsing Ollama configuration: {e}")
-    exit(1)
+    return ip, port
 # ---------------------
 
 def create_magic_packet(macaddress):
@@ -58,39 +52,63 @@ def create_magic_packet(macaddress):
         send_data += struct.pack('B', int(data[i: i + 2], 16))
     return send_data
 
-def wake_device():
-    print(f"Sending Wake-on-LAN packet to {TARGET_MAC}...")
-    packet = create_magic_packet(TARGET_MAC)
+def wake_device(mac=None, broadcast_ip=None, ports=(9, 7)):
+    mac = mac or TARGET_MAC
+    broadcast_ip = broadcast_ip or BROADCAST_IP
+    if not mac or not broadcast_ip:
+        raise ValueError(f"Wake-on-LAN is not configured: missing {', '.join(missing_config())}")
+    print(f"Sending Wake-on-LAN packet to {mac}...")
+    packet = create_magic_packet(mac)
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.sendto(packet, (BROADCAST_IP, 9))
-        sock.sendto(packet, (BROADCAST_IP, 7))
+        for port in ports:
+            sock.sendto(packet, (broadcast_ip, port))
 
-def wait_for_ollama(ip, port, timeout=60):
+def is_up(ip, port, timeout=1.0):
+    """True if something accepts TCP connections at ip:port (fast check)."""
+    try:
+        with socket.create_connection((ip, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def wait_for_ollama(ip, port, timeout=60, interval=2):
     """Loops until Ollama responds or timeout is reached."""
     print(f"Waiting for Ollama to become reachable at {ip}:{port}...")
     start_time = time.time()
-    
+
     while time.time() - start_time < timeout:
-        try:
-            # Try to connect to the TCP port (fast check)
-            with socket.create_connection((ip, port), timeout=1):
-                print(f"✅ Server is UP! (Connected in {int(time.time() - start_time)}s)")
-                return True
-        except (socket.timeout, ConnectionRefusedError, OSError):
-            # Wait 2 seconds before trying again
-            time.sleep(2)
-            print(".", end="", flush=True)
+        # Try to connect to the TCP port (fast check)
+        if is_up(ip, port):
+            print(f"✅ Server is UP! (Connected in {int(time.time() - start_time)}s)")
+            return True
+        # Wait before trying again
+        time.sleep(interval)
+        print(".", end="", flush=True)
 
     print("\n❌ Timed out waiting for server.")
     return False
 
 if __name__ == '__main__':
+    # --- VALIDATION ---
+    missing_vars = missing_config()
+    if missing_vars:
+        print("❌ Error: Missing configuration variables:")
+        for v in missing_vars:
+            print(f"   - {v}")
+        print("\nPlease update your .env file.")
+        exit(1)
+    try:
+        OLLAMA_IP, OLLAMA_PORT = ollama_address()
+    except Exception as e:
+        print(f"❌ Error parsing Ollama configuration: {e}")
+        exit(1)
+
     wake_device()
-    
+
     # This will pause the script here until the PC is actually ready
     if wait_for_ollama(OLLAMA_IP, OLLAMA_PORT):
         print("\n🚀 Starting Embedding Task...")
         # --- YOUR EMBEDDING CODE GOES HERE ---
     else:
-        print("\nCould not connect. Is the PC actually waking up?")
\ No newline at end of file
+        print("\nCould not connect. Is the PC actually waking up?")
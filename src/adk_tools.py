@@ -1,33 +1,30 @@
-import os
 try:
-    from src.build_rag import VectorStore
+    from src.build_rag import acquire_store, current_db_path
 except ImportError:
-    from build_rag import VectorStore
+    from build_rag import acquire_store, current_db_path
 
-def search_juce_docs(query: str) -> str:
+def search_juce_docs(query: str, version: str = "") -> str:
     """
     Search the JUCE C++ Framework documentation for classes, methods, and concepts.
     Returns snippets of relevant documentation.
     
     Args:
         query: The search query (e.g. "AudioBuffer", "how to use Slider").
+        version: Optional JUCE docs version to search (e.g. "7.0.12"); empty searches all indexed versions.
     """
-    # Create a fresh VectorStore instance for every call as requested
+    # Shared store: loaded once per process, reloaded only when the index changes on disk.
+    # It is pinned for the query, so a reload closes the old store only after we're done
     try:
-        # User requested explicit absolute path handling here as well
-        # __file__ is src/adk_tools.py -> dirname is src/ -> dirname is root
-        src_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(src_dir)
-        db_path = os.path.join(project_root, "data", "juce_chroma_db")
-        store = VectorStore(db_path=db_path)
+        # Live index generation if one was published, else data/juce_chroma_db (absolute path)
+        db_path = current_db_path()
+        with acquire_store(db_path=db_path) as store:
+            print(f"[Tool] Searching for: {query}")
+            try:
+                results = store.hybrid_query(query, top_k=5, version=version or None)
+            except Exception as e:
+                return f"Error executing search: {e}"
     except Exception as e:
         return f"Error initializing VectorStore: {e}"
-
-    print(f"[Tool] Searching for: {query}")
-    try:
-        results = store.hybrid_query(query, top_k=5)
-    except Exception as e:
-        return f"Error executing search: {e}"
         
     if not results or not results.get('documents') or not results['documents'][0]:
         return "No relevant documentation found in the local database."
@@ -45,6 +42,10 @@ def search_juce_docs(query: str) -> str:
             f"Content:\n{doc_text}\n"
         )
         output.append(snippet)
+
+    legs = (results.get('legs') or [None])[0] or {}
+    if legs.get('vector') in ("timeout", "error", "circuit_open"):
+        output.append("Note: semantic search was unavailable; these are keyword matches only.")
         
     return "\n".join(output)
 
@@ -0,0 +1,431 @@
+import bisect
+import math
+import struct
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from src.section_file import BlobStrings, map_file, read_sections, write_sections
+except ImportError:
+    from section_file import BlobStrings, map_file, read_sections, write_sections
+
+# On-disk layout (little-endian), see InvertedBM25Index.save():
+#   header: magic, format version, k1, b, n_docs, n_terms, n_postings,
+#           then (offset, length) in bytes for each section in SECTIONS order.
+#   Sections are laid out as in src/section_file.py (shared with the doc store).
+#   Version 2 added the per-document docs-version bitmask, version 3 the per-document
+#   attribute codes used by filters; older files still open.
+MAGIC = b"JUCEBM25"
+FORMAT_VERSION = 3
+SECTIONS_V1 = [
+    ("vocab_offsets", np.uint64),   # n_terms + 1 byte offsets into vocab_blob
+    ("vocab_blob", np.uint8),       # UTF-8 terms, sorted (so binary-searchable)
+    ("term_offsets", np.int64),     # n_terms + 1 offsets into the postings arrays
+    ("postings_docs", np.int32),
+    ("postings_tfs", np.int32),
+    ("idf", np.float64),
+    ("doc_norms", np.float64),
+    ("id_offsets", np.uint64),      # n_docs + 1 byte offsets into id_blob
+    ("id_blob", np.uint8),          # UTF-8 chunk IDs in document order
+]
+SECTIONS_V2 = SECTIONS_V1 + [
+    ("doc_versions", np.uint64),    # per document: bit i set if it belongs to version_names[i]
+    ("version_offsets", np.uint64), # byte offsets into version_blob
+    ("version_blob", np.uint8),     # UTF-8 docs version names
+]
+# Filterable chunk attributes. Per attribute: a code per document into the sorted distinct
+# values, so a filter is a precomputed boolean doc mask (and a prefix filter a code range)
+ATTRIBUTES = ("type", "page", "title")
+SECTIONS = SECTIONS_V2 + [
+    section
+    for name in ATTRIBUTES
+    for section in ((f"doc_{name}", np.uint32), (f"{name}_offsets", np.uint64), (f"{name}_blob", np.uint8))
+]
+SECTIONS_BY_VERSION = {1: SECTIONS_V1, 2: SECTIONS_V2, 3: SECTIONS}
+MAX_VERSIONS = 64
+
+
+def _header(sections) -> struct.Struct:
+    return struct.Struct("<8sI4xddQQQ" + "QQ" * len(sections))
+
+
+HEADER = _header(SECTIONS)
+
+# Filter masks kept per index (LRU). Each is a corpus-sized bool array and the keys come
+# from query filters (url_prefix, class titles, versions), so the cache must stay bounded
+MASK_CACHE_SIZE = 64
+
+
+class InvertedBM25Index:
+    """
+    BM25 (Okapi) over an inverted index.
+
+    Postings are stored CSR-style: the postings of term `t` are
+    postings_docs[term_offsets[t]:term_offsets[t + 1]] (ascending doc IDs) with
+    matching term frequencies in postings_tfs. IDF per term and the length norm
+    k1 * (1 - b + b * len(d) / avgdl) per document are precomputed, so a query only
+    touches the postings of its own terms.
+
+    Scores are identical to rank_bm25.BM25Okapi (same IDF epsilon floor, same
+    handling of repeated query terms).
+
+    `doc_ids` maps document indices to chunk IDs. Indexes returned by open() are
+    memory-mapped: vocabulary and IDs are looked up in place, nothing is unpickled.
+
+    A chunk shared by several docs versions is one document; `doc_versions` holds a
+    bitmask per document over `version_names`, used to restrict scoring to a version.
+    `attributes` maps an attribute name (see ATTRIBUTES) to (per-document codes, sorted
+    distinct values); filters on them become doc masks that are applied before scoring.
+    """
+
+    def __init__(self, vocabulary: Sequence[str], term_offsets: np.ndarray, postings_docs: np.ndarray,
+                 postings_tfs: np.ndarray, idf: np.ndarray, doc_norms: np.ndarray, doc_ids: Sequence[str] = (),
+                 k1: float = 1.5, b: float = 0.75, doc_versions: Optional[np.ndarray] = None,
+                 version_names: Sequence[str] = (),
+                 attributes: Optional[Dict[str, Tuple[np.ndarray, Sequence[str]]]] = None):
+        self.vocabulary = vocabulary
+        # In-memory indexes get a hash map; mapped ones binary-search the sorted vocabulary blob
+        self.term_ids: Optional[Dict[str, int]] = None
+        if not isinstance(vocabulary, BlobStrings):
+            self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.doc_ids = doc_ids
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.idf = idf
+        self.doc_norms = doc_norms
+        self.k1 = k1
+        self.b = b
+        self.doc_versions = doc_versions
+        self.version_names = list(version_names)
+        self.attributes = attributes or {}
+        # Version and attribute masks by key, least recently used first
+        self.masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.masks_lock = threading.Lock()
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.doc_norms)
+
+    def term_id(self, term: str) -> Optional[int]:
+        if self.term_ids is not None:
+            return self.term_ids.get(term)
+        return self.vocabulary.find(term)
+
+    def version_mask(self, version: str) -> Optional[np.ndarray]:
+        """Boolean mask of the documents in `version`; None if the index has no version data."""
+        if self.doc_versions is None:
+            return None
+
+        def compute():
+            if version in self.version_names:
+                bit = np.uint64(1 << self.version_names.index(version))
+                return (self.doc_versions & bit) != 0
+            return np.zeros(self.corpus_size, dtype=bool)
+        return self.cached_mask(("version", version), compute)
+
+    def cached_mask(self, key: tuple, compute) -> np.ndarray:
+        """Mask for `key` from the bounded LRU, computed (outside the lock) on a miss."""
+        with self.masks_lock:
+            mask = self.masks.get(key)
+            if mask is not None:
+                self.masks.move_to_end(key)
+                return mask
+        mask = compute()
+        with self.masks_lock:
+            self.masks[key] = mask
+            self.masks.move_to_end(key)
+            while len(self.masks) > MASK_CACHE_SIZE:
+                self.masks.popitem(last=False)
+        return mask
+
+    def attribute_values(self, name: str) -> Optional[Sequence[str]]:
+        """Sorted distinct values of attribute `name`; None if the index has no such data."""
+        if name not in self.attributes:
+            return None
+        return self.attributes[name][1]
+
+    def attribute_mask(self, name: str, values: Sequence[str]) -> Optional[np.ndarray]:
+        """Boolean mask of the documents whose `name` attribute is one of `values`."""
+        if name not in self.attributes:
+            return None
+        key = (name, "in", tuple(sorted(set(values))))
+
+        def compute():
+            codes, names = self.attributes[name]
+            wanted = []
+            for value in key[2]:
+                i = bisect.bisect_left(names, value)
+                if i < len(names) and names[i] == value:
+                    wanted.append(i)
+            return np.isin(codes, np.asarray(wanted, dtype=codes.dtype))
+        return self.cached_mask(key, compute)
+
+    def attribute_prefix_range(self, name: str, prefix: str) -> Optional[Tuple[int, int]]:
+        """[lo, hi) codes of the values of `name` starting with `prefix` (they are contiguous)."""
+        if name not in self.attributes:
+            return None
+        names = self.attributes[name][1]
+        return bisect.bisect_left(names, prefix), bisect.bisect_left(names, prefix + chr(0x10FFFF))
+
+    def attribute_prefix_mask(self, name: str, prefix: str) -> Optional[np.ndarray]:
+        """Boolean mask of the documents whose `name` attribute starts with `prefix`."""
+        bounds = self.attribute_prefix_range(name, prefix)
+        if bounds is None:
+            return None
+        codes = self.attributes[name][0]
+        return self.cached_mask((name, "prefix", prefix), lambda: (codes >= bounds[0]) & (codes < bounds[1]))
+
+    @staticmethod
+    def encode_attribute(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+        """Per-document values -> (uint32 codes, sorted distinct values)."""
+        names = sorted(set(values))
+        code_of = {name: i for i, name in enumerate(names)}
+        return np.asarray([code_of[v] for v in values], dtype=np.uint32), names
+
+    @staticmethod
+    def encode_versions(doc_versions: List[Sequence[str]]) -> Tuple[np.ndarray, List[str]]:
+        """Per-document version lists -> (bitmask array, sorted version names)."""
+        names = sorted({v for versions in doc_versions for v in versions})
+        if len(names) > MAX_VERSIONS:
+            raise ValueError(f"At most {MAX_VERSIONS} docs versions per index, got {len(names)}")
+        bits = {name: 1 << i for i, name in enumerate(names)}
+        masks = np.zeros(len(doc_versions), dtype=np.uint64)
+        for i, versions in enumerate(doc_versions):
+            masks[i] = sum(bits[v] for v in set(versions))
+        return masks, names
+
+    @classmethod
+    def build(cls, corpus_tokens: List[List[str]], doc_ids: Optional[List[str]] = None,
+              k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+              doc_versions: Optional[List[Sequence[str]]] = None,
+              doc_attributes: Optional[Dict[str, List[str]]] = None) -> "InvertedBM25Index":
+        doc_freqs = [Counter(tokens) for tokens in corpus_tokens]
+        corpus_size = len(doc_freqs)
+        doc_len = np.asarray([len(tokens) for tokens in corpus_tokens], dtype=np.float64)
+
+        vocabulary = sorted({term for freqs in doc_freqs for term in freqs})
+        term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+        # (term, doc, tf) triples in doc order; a stable sort by term keeps doc IDs ascending per term
+        n_postings = sum(len(freqs) for freqs in doc_freqs)
+        triple_terms = np.empty(n_postings, dtype=np.int64)
+        triple_docs = np.empty(n_postings, dtype=np.int32)
+        triple_tfs = np.empty(n_postings, dtype=np.int32)
+        pos = 0
+        for doc_id, freqs in enumerate(doc_freqs):
+            n = len(freqs)
+            triple_terms[pos:pos + n] = [term_ids[term] for term in freqs]
+            triple_docs[pos:pos + n] = doc_id
+            triple_tfs[pos:pos + n] = list(freqs.values())
+            pos += n
+        order = np.argsort(triple_terms, kind="stable")
+        postings_docs = triple_docs[order]
+        postings_tfs = triple_tfs[order]
+
+        df = np.bincount(triple_terms, minlength=len(vocabulary))
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=term_offsets[1:])
+
+        # Same IDF as BM25Okapi: negative IDFs (terms in > half the corpus) floor at epsilon * mean IDF
+        idf = np.array([math.log(corpus_size - f + 0.5) - math.log(f + 0.5) for f in df.tolist()], dtype=np.float64)
+        if len(idf):
+            eps = epsilon * (sum(idf.tolist()) / len(idf))
+            idf[idf < 0] = eps
+
+        avgdl = doc_len.sum() / corpus_size if corpus_size else 0.0
+        if avgdl > 0:
+            doc_norms = k1 * (1 - b + b * doc_len / avgdl)
+        else:
+            doc_norms = np.full(corpus_size, k1 * (1 - b), dtype=np.float64)
+
+        if doc_ids is None:
+            doc_ids = [str(i) for i in range(corpus_size)]
+        version_masks, version_names = None, []
+        if doc_versions is not None:
+            version_masks, version_names = cls.encode_versions(doc_versions)
+        attributes = {}
+        for name, values in (doc_attributes or {}).items():
+            if name not in ATTRIBUTES:
+                raise ValueError(f"Unknown attribute {name!r}; expected one of {ATTRIBUTES}")
+            attributes[name] = cls.encode_attribute(values)
+        return cls(vocabulary, term_offsets, postings_docs, postings_tfs, idf, doc_norms, doc_ids=list(doc_ids), k1=k1, b=b,
+                   doc_versions=version_masks, version_names=version_names, attributes=attributes)
+
+    def _term_contributions(self, query_tokens: List[str]):
+        """Yields (doc_ids, partial_scores) for every query token found in the vocabulary."""
+        for token in query_tokens:
+            term_id = self.term_id(token)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end].astype(np.float64)
+            yield docs, self.idf[term_id] * (tfs * (self.k1 + 1) / (tfs + self.doc_norms[docs]))
+
+    def score_matches(self, query_tokens: List[str], doc_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (doc_ids, scores) for documents containing at least one query term.
+        `doc_mask` (boolean, one entry per document) restricts the result, e.g. to one
+        version or doc type. Postings outside the mask are dropped before aggregation,
+        so a selective filter makes the query cheaper.
+        """
+        parts = list(self._term_contributions(query_tokens))
+        if not parts:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        docs = np.concatenate([d for d, _ in parts])
+        partial = np.concatenate([s for _, s in parts])
+        if doc_mask is not None:
+            keep = doc_mask[docs]
+            docs, partial = docs[keep], partial[keep]
+        # Sums per doc in query-token order, like BM25Okapi's per-term accumulation
+        matched, inverse = np.unique(docs, return_inverse=True)
+        return matched, np.bincount(inverse, weights=partial)
+
+    @staticmethod
+    def select_top_k(doc_ids: np.ndarray, scores: np.ndarray, k: int, min_score: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized top-k over parallel (ascending doc_ids, scores) arrays: O(n) argpartition-style
+        selection, then only the k winners are sorted. Ties at the cut-off go to the lower
+        doc ID, so the result equals a stable full sort by descending score.
+        """
+        if min_score is not None:
+            keep = scores >= min_score
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        n = len(scores)
+        if k <= 0 or n == 0:
+            return doc_ids[:0], scores[:0]
+        if n > k:
+            kth = np.partition(scores, n - k)[n - k]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - len(above)]
+            selected = np.concatenate([above, ties])
+        else:
+            selected = np.arange(n)
+        order = selected[np.lexsort((doc_ids[selected], -scores[selected]))]
+        return doc_ids[order], scores[order]
+
+    def top_k(self, query_tokens: List[str], k: int, min_score: Optional[float] = None,
+              doc_mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Best `k` (doc_id, score) pairs, highest score first; ties go to the lower doc ID."""
+        matched, scores = self.score_matches(query_tokens, doc_mask=doc_mask)
+        best_docs, best_scores = self.select_top_k(matched, scores, k, min_score=min_score)
+        return list(zip(best_docs.tolist(), best_scores.tolist()))
+
+    def top_k_batch(self, queries_tokens: List[List[str]], k: int, min_score: Optional[float] = None,
+                    doc_mask: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        top_k() for several queries in one pass: the postings of every query are scored
+        together as a sparse (query x document) matrix keyed query * n_docs + doc, then
+        the best `k` are selected per query row. Results equal per-query top_k calls.
+        """
+        n_docs = self.corpus_size
+        keys, weights = [], []
+        for q, tokens in enumerate(queries_tokens):
+            for docs, partial in self._term_contributions(tokens):
+                if doc_mask is not None:
+                    keep = doc_mask[docs]
+                    docs, partial = docs[keep], partial[keep]
+                keys.append(docs.astype(np.int64) + q * n_docs)
+                weights.append(partial)
+        results: List[List[Tuple[int, float]]] = [[] for _ in queries_tokens]
+        if not keys:
+            return results
+
+        # One unique/bincount over all queries; keys sort by query row, then doc
+        matched, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        bounds = np.searchsorted(matched, np.arange(len(queries_tokens) + 1, dtype=np.int64) * n_docs)
+        for q in range(len(queries_tokens)):
+            lo, hi = bounds[q], bounds[q + 1]
+            if lo == hi:
+                continue
+            best_docs, best_scores = self.select_top_k(matched[lo:hi] - q * n_docs, scores[lo:hi], k, min_score=min_score)
+            results[q] = list(zip(best_docs.tolist(), best_scores.tolist()))
+        return results
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """Dense scores for every document (BM25Okapi.get_scores compatible)."""
+        scores = np.zeros(self.corpus_size)
+        matched, matched_scores = self.score_matches(query_tokens)
+        scores[matched] = matched_scores
+        return scores
+
+    def save(self, path: str):
+        """Writes the binary index atomically (readers holding the old mapping are unaffected)."""
+        vocab_offsets, vocab_blob = BlobStrings.pack(list(self.vocabulary))
+        id_offsets, id_blob = BlobStrings.pack(list(self.doc_ids))
+        version_offsets, version_blob = BlobStrings.pack(self.version_names)
+        doc_versions = self.doc_versions
+        if doc_versions is None:
+            doc_versions = np.zeros(0, dtype=np.uint64)  # Empty section = no version data
+        arrays = {}
+        for name in ATTRIBUTES:
+            # Empty sections = no data for that attribute
+            codes, values = self.attributes.get(name, (np.zeros(0, dtype=np.uint32), []))
+            value_offsets, value_blob = BlobStrings.pack(list(values))
+            arrays[f"doc_{name}"] = codes
+            arrays[f"{name}_offsets"] = value_offsets
+            arrays[f"{name}_blob"] = np.frombuffer(value_blob, dtype=np.uint8)
+        arrays.update({
+            "vocab_offsets": vocab_offsets,
+            "vocab_blob": np.frombuffer(vocab_blob, dtype=np.uint8),
+            "term_offsets": self.term_offsets,
+            "postings_docs": self.postings_docs,
+            "postings_tfs": self.postings_tfs,
+            "idf": self.idf,
+            "doc_norms": self.doc_norms,
+            "id_offsets": id_offsets,
+            "id_blob": np.frombuffer(id_blob, dtype=np.uint8),
+            "doc_versions": doc_versions,
+            "version_offsets": version_offsets,
+            "version_blob": np.frombuffer(version_blob, dtype=np.uint8),
+        })
+
+        write_sections(path, HEADER, (MAGIC, FORMAT_VERSION, self.k1, self.b, self.corpus_size,
+                                      len(self.vocabulary), len(self.postings_docs)), SECTIONS, arrays)
+
+    @classmethod
+    def open(cls, path: str) -> "InvertedBM25Index":
+        """Memory-maps an index written by save(). Cost is independent of corpus size."""
+        buffer = map_file(path, _header(SECTIONS_V1).size, "BM25 index")
+
+        magic, version = struct.unpack_from("<8sI", buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a BM25 index: {path}")
+        if version not in SECTIONS_BY_VERSION:
+            raise ValueError(f"Unsupported BM25 index version {version} in {path}; rebuild the index")
+        section_list = SECTIONS_BY_VERSION[version]
+        header = _header(section_list)
+        if len(buffer) < header.size:
+            raise ValueError(f"Truncated BM25 index: {path}")
+
+        fields = header.unpack_from(buffer, 0)
+        k1, b, n_docs, n_terms, n_postings = fields[2:7]
+        sections = read_sections(buffer, section_list, fields[7:], path, "BM25 index")
+
+        vocabulary = BlobStrings(sections["vocab_offsets"], sections["vocab_blob"])
+        doc_ids = BlobStrings(sections["id_offsets"], sections["id_blob"])
+        if len(vocabulary) != n_terms or len(doc_ids) != n_docs or len(sections["postings_docs"]) != n_postings:
+            raise ValueError(f"Corrupt BM25 index: {path}")
+
+        doc_versions, version_names = None, []
+        if "doc_versions" in sections and len(sections["doc_versions"]):
+            doc_versions = sections["doc_versions"]
+            version_names = list(BlobStrings(sections["version_offsets"], sections["version_blob"]))
+            if len(doc_versions) != n_docs:
+                raise ValueError(f"Corrupt BM25 index: {path}")
+        attributes = {}
+        for name in ATTRIBUTES:
+            codes = sections.get(f"doc_{name}")
+            if codes is None or not len(codes):
+                continue
+            if len(codes) != n_docs:
+                raise ValueError(f"Corrupt BM25 index: {path}")
+            attributes[name] = (codes, BlobStrings(sections[f"{name}_offsets"], sections[f"{name}_blob"]))
+        return cls(vocabulary, sections["term_offsets"], sections["postings_docs"], sections["postings_tfs"],
+                   sections["idf"], sections["doc_norms"], doc_ids=doc_ids, k1=k1, b=b,
+                   doc_versions=doc_versions, version_names=version_names, attributes=attributes)
@@ -3,23 +3,31 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import sys
-import socket
 
-# Add root to path for Turbo WoL
+# Add root to path for WoL
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 try:
-    import TURBO_WoL
+    import WoL
 except ImportError:
-    TURBO_WoL = None
+    WoL = None
+import asyncio
+import functools
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import hashlib
-from typing import List, Dict, Iterator
+from typing import List, Dict, Iterator, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import time
-import pickle
+import json
+import re
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
 import warnings
+import numpy as np
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings("ignore")
@@ -27,7 +35,35 @@ warnings.filterwarnings("ignore")
 # Imports that will be available after installation
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import chromadb
-from rank_bm25 import BM25Okapi
+
+try:
+    from src.crawl import HostRateLimiter, fetch_with_retry
+    from src.page_cache import PageCache
+    from src.embedding_cache import QueryEmbeddingCache
+    from src.bm25_index import InvertedBM25Index, ATTRIBUTES as BM25_ATTRIBUTES
+    from src.index_generations import IndexGenerations, Snapshot, default_index_root
+    from src.pipeline import Batcher, Pipeline, Stage
+    from src.html_parsing import parse_page, resolve_backend
+    from src.html_archive import HtmlArchive
+    from src.local_docs import LocalDocs
+    from src.symbols import SymbolIndex, member_symbol, looks_like_symbol
+    from src.doc_store import DocStore
+    from src.embedding_backends import OllamaEmbeddingFunction, create_embedding_backend
+    from src.circuit_breaker import CallAttempt, CircuitBreaker, CircuitOpenError
+except ImportError:
+    from crawl import HostRateLimiter, fetch_with_retry
+    from page_cache import PageCache
+    from embedding_cache import QueryEmbeddingCache
+    from bm25_index import InvertedBM25Index, ATTRIBUTES as BM25_ATTRIBUTES
+    from index_generations import IndexGenerations, Snapshot, default_index_root
+    from pipeline import Batcher, Pipeline, Stage
+    from html_parsing import parse_page, resolve_backend
+    from html_archive import HtmlArchive
+    from local_docs import LocalDocs
+    from symbols import SymbolIndex, member_symbol, looks_like_symbol
+    from doc_store import DocStore
+    from embedding_backends import OllamaEmbeddingFunction, create_embedding_backend
+    from circuit_breaker import CallAttempt, CircuitBreaker, CircuitOpenError
 
 @dataclass
 class ScrapedItem:
@@ -39,120 +75,270 @@ class ScrapedDocument:
     url: str
     title: str
     items: List[ScrapedItem] # Changed from raw_text
+    version: Optional[str] = None  # JUCE docs version ("master", "7.0.12", ...)
+
+DOCS_URL = "https://docs.juce.com/{version}/"
+DEFAULT_VERSION = "master"
+# Chunk metadata that differs between docs versions sharing one stored chunk
+VERSION_FIELDS = ("url", "version", "chunk_index")
+
+def docs_version(base_url: str) -> Optional[str]:
+    """Version segment of a docs.juce.com base URL (https://docs.juce.com/7.0.12/ -> "7.0.12")."""
+    parsed = urlparse(base_url)
+    segments = [s for s in parsed.path.split("/") if s]
+    if parsed.hostname == "docs.juce.com" and segments:
+        return segments[-1]
+    return None
+
+# Chunk filters understood by VectorStore.hybrid_query(filters=...)
+FILTER_KEYS = ("type", "title", "class", "url_prefix")
+CLASS_TITLE_RE = re.compile(r"^(?:JUCE:\s*)?(.+?)\s+(?:Class|Struct|Union)(?: Template)? Reference\s*$")
+
+def normalize_class_name(name: str) -> str:
+    # "juce::AudioBuffer< Type >" and "AudioBuffer" name the same class
+    name = name.strip()
+    if name.startswith("juce::"):
+        name = name[len("juce::"):]
+    return name.split("<")[0].strip()
+
+def class_name(title: str) -> Optional[str]:
+    """Class or struct of a Doxygen page title ("JUCE: juce::Slider Class Reference" -> "Slider")."""
+    match = CLASS_TITLE_RE.match(title.strip())
+    return normalize_class_name(match.group(1)) if match else None
+
+def as_list(value) -> List:
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def version_path(url: str, version: Optional[str]) -> str:
+    """Page path relative to its version root; the same page of two versions shares it."""
+    marker = f"/{version}/" if version else None
+    if marker and marker in url:
+        return url.split(marker, 1)[1]
+    return url
 
 class JuceScraper:
-    def __init__(self, base_url="https://docs.juce.com/master/"):
-        self.base_url = base_url
+    def __init__(self, base_url=None, concurrency=1,
+                 requests_per_second=20.0, max_retries=3, backoff=0.5, timeout=30.0,
+                 cache_dir=None, parser_backend="auto", parse_workers=1,
+                 archive: Optional[HtmlArchive] = None, source=None, version=None):
+        # Optional offline page source (an archived Snapshot or LocalDocs): pages are read
+        # from it instead of the network. Anything with `base_url` and get(url) -> bytes works.
+        self.source = source
+        if source:
+            self.base_url = source.base_url
+        else:
+            self.base_url = base_url or DOCS_URL.format(version=version or DEFAULT_VERSION)
+        # Docs version stamped on every document (inferred from a docs.juce.com base URL)
+        self.version = version or docs_version(self.base_url)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Shared per-host budget for all crawl workers (replaces the old fixed sleep between pages)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+
         self.session = requests.Session()
+        # Size the connection pool to the worker count so threads don't queue on sockets
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, self.concurrency))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Optional conditional-request cache (ETag / Last-Modified / body hash)
+        self.page_cache = PageCache(cache_dir) if cache_dir else None
+        # Pages that could not be fetched/parsed (their indexed chunks are kept on rebuild)
+        self.failed_urls = []
+
+        # HTML parsing: backend from src/html_parsing.py, optionally in a process pool
+        self.parser_backend = resolve_backend(parser_backend)
+        self.parse_workers = max(1, parse_workers)
+        self.parse_pool = None
+        self.parse_pool_lock = threading.Lock()
+
+        # Optional raw-HTML archive: this crawl is recorded as a replayable snapshot
+        self.archive = archive if not source else None
+        self.snapshot = self.archive.begin_snapshot(self.base_url) if self.archive else None
+
+    def _get(self, url: str, headers: Optional[Dict] = None) -> requests.Response:
+        """Rate-limited GET with retry and exponential backoff."""
+        return fetch_with_retry(
+            self.session, url, headers=headers,
+            rate_limiter=self.rate_limiter,
+            max_retries=self.max_retries,
+            backoff=self.backoff,
+            timeout=self.timeout
+        )
+
+    def _fetch_cached(self, url: str, parse):
+        """
+        Fetches `url` and returns parse(body) as a JSON-serializable payload.
+        With a page cache, the request is conditional: a 304 (or an identical body hash
+        when the server ignores validators) reuses the cached payload without re-parsing.
+        With an offline source the body comes from it and is always parsed.
+        """
+        if self.source:
+            return parse(self.source.get(url))
+
+        cached = self.page_cache.get(url) if self.page_cache else None
+        if cached and self.snapshot and not self.archive.has(cached["sha256"]):
+            cached = None  # A 304 would leave nothing to archive; fetch the full body
+
+        response = self._get(url, headers=PageCache.conditional_headers(cached) or None)
+
+        if cached and response.status_code == 304:
+            self.page_cache.record("not_modified")
+            if self.snapshot:
+                self.snapshot.record(url, sha256=cached["sha256"])
+            return cached["data"]
+        response.raise_for_status()
+        if self.snapshot:
+            self.snapshot.record(url, content=response.content)
+
+        if not self.page_cache:
+            return parse(response.content)
+
+        body_hash = PageCache.body_hash(response.content)
+        if cached and cached["sha256"] == body_hash:
+            self.page_cache.record("unchanged")
+            data = cached["data"]
+        else:
+            self.page_cache.record("fetched")
+            data = parse(response.content)
+
+        self.page_cache.put(
+            url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            body_hash=body_hash,
+            data=data
+        )
+        return data
 
     def get_class_list(self) -> List[str]:
         """Fetches the list of class URLs."""
         print(f"Fetching class list from {self.base_url}classes.html...")
         try:
-            response = self.session.get(urljoin(self.base_url, "classes.html"))
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            links = []
-            for a in soup.find_all('a', href=True):
-                href = a['href']
-                if 'class' in href or 'struct' in href:
-                     if href.endswith('.html') and ('juce_' in href or 'classjuce' in href or 'structjuce' in href):
-                         links.append(urljoin(self.base_url, href))
-            
-            if len(links) < 100:
-                print("Refining link search...")
-                content = soup.find('div', class_='contents') or soup.find('div', id='content')
-                if content:
-                    for a in content.find_all('a', href=True):
-                         href = a['href']
-                         if href.endswith('.html') and 'index' not in href:
-                             links.append(urljoin(self.base_url, href))
-            
-            unique_links = sorted(list(set(links)))
+            data = self._fetch_cached(urljoin(self.base_url, "classes.html"), self.parse_class_list)
+            unique_links = data["links"]
             print(f"Found {len(unique_links)} potential class links.")
             return unique_links
         except Exception as e:
             print(f"Error fetching class list: {e}")
             return []
 
+    def parse_class_list(self, content: bytes) -> Dict:
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        links = []
+        for a in soup.find_all('a', href=True):
+            href = a['href']
+            if 'class' in href or 'struct' in href:
+                 if href.endswith('.html') and ('juce_' in href or 'classjuce' in href or 'structjuce' in href):
+                     links.append(urljoin(self.base_url, href))
+        
+        if len(links) < 100:
+            print("Refining link search...")
+            content_div = soup.find('div', class_='contents') or soup.find('div', id='content')
+            if content_div:
+                for a in content_div.find_all('a', href=True):
+                     href = a['href']
+                     if href.endswith('.html') and 'index' not in href:
+                         links.append(urljoin(self.base_url, href))
+        
+        return {"links": sorted(list(set(links)))}
+
     def scrape_content(self, url: str) -> ScrapedDocument:
         """Fetches and parses a single documentation page using semantic blocking."""
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            title_tag = soup.find('title')
-            title = title_tag.get_text().strip() if title_tag else url.split('/')[-1]
-            
-            items = []
-            
-            # 1. Try to find semantic Member Items (functions, variables)
-            memitems = soup.find_all('div', class_='memitem')
-            
-            if memitems:
-                for item in memitems:
-                    proto = item.find('div', class_='memproto')
-                    doc = item.find('div', class_='memdoc')
-                    
-                    text_parts = []
-                    if proto:
-                        text_parts.append(proto.get_text(" ", strip=True))
-                    if doc:
-                        text_parts.append(doc.get_text(" ", strip=True))
-                        
-                    full_text = "\n".join(text_parts)
-                    
-                    # Try to extract a specific name/ID
-                    # Often the memitem has an ID anchor just before it or inside.
-                    # <a id="a123..."></a><div class="memitem">...
-                    # But text extraction is primary here.
-                    
-                    if full_text.strip():
-                        items.append(ScrapedItem(text=full_text, metadata={"type": "method"}))
-            
-            # 2. Also capture the Detailed Description (usually at top)
-            textblock = soup.find('div', class_='textblock')
-            if textblock:
-                description_parts = []
-                for element in textblock.children:
-                    # Stop if we hit a header indicating members
-                    if element.name in ['h2', 'h3'] and ('Documentation' in element.get_text() or 'Member' in element.get_text()):
-                        break
-                    # Skip div.memitem etc if they are direct children (rare but possible)
-                    if element.name == 'div' and 'memitem' in element.get('class', []):
-                         continue
-                    
-                    text = element.get_text(" ", strip=True)
-                    if text:
-                        description_parts.append(text)
-                
-                full_desc = "\n".join(description_parts).strip()
-                if full_desc:
-                    # Add as the FIRST item
-                    items.insert(0, ScrapedItem(text=full_desc, metadata={"type": "class_description"}))
-            
-            # If no items found (e.g. simple page or main index), fallback to full text
-            if not items:
-                content_div = soup.find('div', class_='contents') or soup.find('div', id='content')
-                text = content_div.get_text(separator='\n', strip=True) if content_div else soup.get_text(separator='\n', strip=True)
-                items.append(ScrapedItem(text=text, metadata={"type": "overview"}))
-            
-            return ScrapedDocument(url=url, title=title, items=items)
+            data = self._fetch_cached(url, lambda content: self.parse_page(url, content))
+            return ScrapedDocument(
+                url=url,
+                title=data["title"],
+                items=[ScrapedItem(text=item["text"], metadata=item["metadata"]) for item in data["items"]],
+                version=self.version
+            )
         except Exception as e:
             print(f"Error scraping {url}: {e}")
-            return ScrapedDocument(url=url, title="Error", items=[])
-
-    def crawl(self) -> Iterator[ScrapedDocument]:
-        links = self.get_class_list()
-        for i, link in enumerate(links):
-            if i % 10 == 0:
-                print(f"Scraping {i}/{len(links)}: {link}")
-            doc = self.scrape_content(link)
-            if doc.items:
-                yield doc
-            time.sleep(0.05)
+            self.failed_urls.append(url)
+            return ScrapedDocument(url=url, title="Error", items=[], version=self.version)
+
+    def parse_page(self, url: str, content: bytes) -> Dict:
+        """Parses a documentation page into {"title", "items"} (the cacheable form of a ScrapedDocument)."""
+        if self.parse_workers <= 1:
+            return parse_page(url, content, self.parser_backend)
+        # CPU-bound parsing runs in worker processes; the crawl thread only waits on the result
+        return self._get_parse_pool().submit(parse_page, url, content, self.parser_backend).result()
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        with self.parse_pool_lock:
+            if self.parse_pool is None:
+                self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            return self.parse_pool
+
+    def close(self):
+        """Shuts down the parser process pool and commits the archive snapshot (if any)."""
+        with self.parse_pool_lock:
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown(cancel_futures=True)
+                self.parse_pool = None
+        if self.snapshot:
+            if self.snapshot.pages:
+                self.snapshot.commit()
+            else:
+                self.snapshot.abort()
+
+    def crawl(self, links: Optional[List[str]] = None, concurrency: Optional[int] = None) -> Iterator[ScrapedDocument]:
+        """
+        Streams scraped pages as they complete.
+        With concurrency > 1 pages are fetched by a bounded thread pool, so documents
+        arrive in completion order rather than link order.
+        """
+        if links is None:
+            links = self.get_class_list()
+        workers = max(1, concurrency or self.concurrency)
+
+        if workers == 1:
+            for i, link in enumerate(links):
+                if i % 10 == 0:
+                    print(f"Scraping {i}/{len(links)}: {link}")
+                doc = self.scrape_content(link)
+                if doc.items:
+                    yield doc
+            return
+
+        # Only keep a couple of pages per worker in flight so a slow consumer
+        # (chunking/embedding) applies backpressure instead of buffering the whole site.
+        max_in_flight = workers * 2
+        link_iter = iter(links)
+        pending = set()
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="juce-crawl") as pool:
+            def submit_next():
+                link = next(link_iter, None)
+                if link is None:
+                    return False
+                pending.add(pool.submit(self.scrape_content, link))
+                return True
+
+            while len(pending) < max_in_flight and submit_next():
+                pass
+
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.discard(future)
+                        doc = future.result()
+                        if completed % 10 == 0:
+                            print(f"Scraped {completed}/{len(links)}: {doc.url}")
+                        completed += 1
+                        submit_next()
+                        if doc.items:
+                            yield doc
+            finally:
+                # Consumer stopped early: drop work that hasn't started yet
+                for future in pending:
+                    future.cancel()
 
 class JuceProcessor:
     def __init__(self):
@@ -163,118 +349,75 @@ class JuceProcessor:
             chunk_overlap=0 # No overlap for clean splits if we must split
         )
 
+    @staticmethod
+    def chunk_id(path: str, text: str, occurrence: int = 0) -> str:
+        """
+        Chunk IDs are derived from the version-relative page path and the chunk text, so a
+        chunk that is identical in several docs versions is stored (and embedded) once.
+        `occurrence` tells repeated identical text on the same page apart.
+        """
+        key = f"{path}|{hashlib.sha1(text.encode()).hexdigest()}"
+        if occurrence:
+            key += f"|{occurrence}"
+        return hashlib.md5(key.encode()).hexdigest()
+
     def chunk_document(self, doc: ScrapedDocument) -> List[Dict]:
         result_chunks = []
+        path = version_path(doc.url, doc.version)
+        seen_texts = {}
+
+        def make_chunk(text, item, chunk_index):
+            occurrence = seen_texts.get(text, 0)
+            seen_texts[text] = occurrence + 1
+            metadata = {
+                "url": doc.url,
+                "title": doc.title,
+                "type": item.metadata.get("type", "unknown"),
+                "chunk_index": chunk_index,
+                "path": path,
+            }
+            if doc.version:
+                metadata["version"] = doc.version
+            return {"id": self.chunk_id(path, text, occurrence), "text": text, "metadata": metadata}
         
         for i, item in enumerate(doc.items):
             # If item text is huge > 4000 chars, split it.
             if len(item.text) > 4000:
                 sub_chunks = self.fallback_splitter.create_documents([item.text])
                 for j, sub in enumerate(sub_chunks):
-                    chunk_id = hashlib.md5(f"{doc.url}_{i}_{j}".encode()).hexdigest()
-                    result_chunks.append({
-                        "id": chunk_id,
-                        "text": sub.page_content,
-                        "metadata": {
-                            "url": doc.url,
-                            "title": doc.title,
-                            "type": item.metadata.get("type", "unknown"),
-                            "chunk_index": f"{i}_{j}"
-                        }
-                    })
+                    result_chunks.append(make_chunk(sub.page_content, item, f"{i}_{j}"))
             else:
-                chunk_id = hashlib.md5(f"{doc.url}_{i}".encode()).hexdigest()
-                result_chunks.append({
-                    "id": chunk_id,
-                    "text": item.text,
-                    "metadata": {
-                        "url": doc.url,
-                        "title": doc.title,
-                        "type": item.metadata.get("type", "unknown"),
-                        "chunk_index": i
-                    }
-                })
+                result_chunks.append(make_chunk(item.text, item, i))
                 
         return result_chunks
 
-class OllamaEmbeddingFunction:
-    def __init__(self, base_url: str, model_name: str):
-        self.api_url = f"{base_url}/api/embeddings"
-        self.model_name = model_name
-        self.session = requests.Session()
-    
-    def name(self) -> str:
-        return "ollama_embedding_function"
-
-    def __call__(self, input: List[str]) -> List[List[float]]:
-        embeddings = []
-        # Ollama API typically takes one prompt at a time for embeddings or supports batch depending on version.
-        # We'll stick to serial for safety unless batch is confirmed.
-        for text in input:
-            try:
-                response = self.session.post(self.api_url, json={"model": self.model_name, "prompt": text})
-                response.raise_for_status()
-                embeddings.append(response.json()["embedding"])
-            except Exception as e:
-                print(f"Error getting embedding from Ollama: {e}")
-                # Fallback or empty? Better to crash in dev than produce garbage.
-                # But for robustness, we might retry.
-                # Returning empty list will crash Chroma.
-                raise e
-        return embeddings
-
-    def embed_query(self, input: List[str]) -> List[List[float]]:
-        return self(input)
-
-    def embed_documents(self, input: List[str]) -> List[List[float]]:
-        return self(input)
+def default_db_path() -> str:
+    # Use data/juce_chroma_db relative to PROJECT ROOT
+    # __file__ is src/build_rag.py -> dirname is src/ -> dirname is root
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(src_dir)
+    return os.path.join(project_root, "data", "juce_chroma_db")
 
 class VectorStore:
-    def __init__(self, db_path=None, collection_name="juce_docs"):
-        print("Initializing ChromaDB with Ollama Embeddings...")
-        
+    def __init__(self, db_path=None, collection_name="juce_docs", query_cache_size=1024, persist_query_cache=True,
+                 vector_timeout: Optional[float] = None, embedding_backend: Optional[str] = None,
+                 wake_host: bool = True):
         # Configuration
         default_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
         self.ollama_url = os.getenv("OLLAMA_URL", default_url)
 
-        # --- Lazy Wake-on-LAN ---
-        if TURBO_WoL:
-            # Parse host/port from URL for robustness
-            from urllib.parse import urlparse
-            try:
-                parsed = urlparse(self.ollama_url)
-                host = parsed.hostname
-                port = parsed.port or 11434
-            except:
-                host = os.getenv("OLLAMA_HOST_IP", "localhost")
-                port = 11434
-            is_up = False
-            try:
-                # Fast check (500ms)
-                with socket.create_connection((host, port), timeout=0.5):
-                    is_up = True
-            except OSError:
-                pass
-            
-            if not is_up:
-                print("[RAG] Ollama unreachable. Triggering Wake-on-LAN...")
-                TURBO_WoL.wake_device()
-                TURBO_WoL.wait_for_ollama(host, port)
-        # ------------------------
-        self.ollama_model = "embeddinggemma:latest"
-        
-        self.embedding_fn = OllamaEmbeddingFunction(
-            base_url=self.ollama_url, 
-            model_name=self.ollama_model
-        )
+        # Embeddings from Ollama (default) or an in-process CPU model (EMBEDDING_BACKEND=onnx /
+        # sentence-transformers with EMBEDDING_MODEL_PATH), which needs no server to be awake
+        self.embedding_fn = create_embedding_backend(embedding_backend, ollama_url=self.ollama_url)
+        self.embedding_model = self.embedding_fn.model_id
+        print(f"Initializing ChromaDB with {self.embedding_fn.name()} ({self.embedding_model})...")
+        # wake_host=False when something else manages the host (the MCP server's HostKeepAlive)
+        if self.embedding_fn.needs_wake and wake_host:
+            self.wake_embedding_host()
         
         # Resolve absolute path for database
         if db_path is None:
-            # Use data/juce_chroma_db relative to PROJECT ROOT
-            # __file__ is src/build_rag.py -> dirname is src/ -> dirname is root
-            src_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(src_dir)
-            self.db_path = os.path.join(project_root, "data", "juce_chroma_db")
+            self.db_path = default_db_path()
         else:
             self.db_path = db_path
             
@@ -290,15 +433,85 @@ class VectorStore:
         # BM25 State
         self.bm25 = None
         self.bm25_mapping = [] # List of chunk IDs corresponding to BM25 indices
-        self.bm25_index_path = os.path.join(self.db_path, "bm25_index.pkl")
-        self.bm25_mapping_path = os.path.join(self.db_path, "bm25_mapping.pkl")
+        self.bm25_index_path = os.path.join(self.db_path, "bm25_index.bin")
+        # Exact class/member name lookup, built with (and numbered like) the BM25 index
+        self.symbols = None
+        self.symbols_path = os.path.join(self.db_path, "symbols.json")
+        # Chunk ID -> stored document/metadata, so results are materialized without a Chroma get
+        self.doc_store = None
+        self.doc_store_path = os.path.join(self.db_path, "doc_store.bin")
+        self.legacy_bm25_index_path = os.path.join(self.db_path, "bm25_index.pkl")
         
         # Accumulator for building phase
         self.build_corpus_tokens = []
         self.build_corpus_ids = []
+        self.build_corpus_attributes = {name: [] for name in BM25_ATTRIBUTES}
+        self.build_corpus_symbols = []
         
         self.load_bm25()
 
+        # Chunk manifest: chunk ID -> content hashes, so rebuilds only re-embed what changed
+        self.manifest_path = os.path.join(self.db_path, f"{collection_name}.manifest.json")
+        self.manifest = {}
+        self.version_bases = {}  # docs version -> base URL, to rebuild per-version result URLs
+        self.seen_ids = set()
+        self.built_versions = set()
+        self.build_stats = {"embedded": 0, "metadata_updated": 0, "unchanged": 0, "deleted": 0,
+                            "duplicates": 0, "reused": 0}
+        # Text hash -> a chunk ID storing that text, to reuse its embedding for identical chunks
+        self.text_index = {}
+        # Text hash -> Future of its embedding while an embed worker owns it and the writer
+        # hasn't stored it yet, so concurrent batches sharing new text embed it once
+        self.pending_embeddings = {}
+        self.pending_lock = threading.Lock()
+        self.load_manifest()
+
+        # Query embedding cache (memory LRU + optional SQLite tier next to the DB)
+        self.query_cache = QueryEmbeddingCache(
+            max_entries=query_cache_size,
+            disk_path=os.path.join(self.db_path, "query_embedding_cache.sqlite3") if persist_query_cache else None
+        )
+
+        # hybrid_query runs its vector leg here, concurrently with BM25. A leg still running
+        # after vector_timeout seconds (Ollama slow or asleep) is dropped from the fusion; <= 0 waits forever
+        if vector_timeout is None:
+            vector_timeout = float(os.getenv("JUCE_VECTOR_TIMEOUT", "5"))
+        self.vector_timeout = vector_timeout
+        # Query embedding requests get twice the leg's budget: a late answer still fills the query
+        # cache, but calls to a hung host are cut off instead of piling up on the pool
+        self.embedding_fn.query_timeout = 2 * vector_timeout if vector_timeout > 0 else None
+        # Query embeddings (cache misses) go through a circuit breaker: once the backend keeps
+        # failing or is too slow, queries stop waiting on it and are served from BM25 and the
+        # symbol index, while a background probe detects recovery
+        self.embedding_breaker = CircuitBreaker(
+            probe=lambda: self.embedding_fn.embed_query(["ping"]),
+            failure_threshold=int(os.getenv("JUCE_BREAKER_FAILURES", "3")),
+            slow_call_seconds=vector_timeout if vector_timeout > 0 else None,
+            probe_interval=float(os.getenv("JUCE_BREAKER_PROBE_SECONDS", "5")),
+            name="Embedding backend"
+        )
+        self.retrieval_pool = ThreadPoolExecutor(max_workers=int(os.getenv("JUCE_RETRIEVAL_WORKERS", "8")),
+                                                 thread_name_prefix="juce-retrieval")
+
+    def wake_embedding_host(self):
+        """Lazy Wake-on-LAN: wakes the Ollama machine if it doesn't answer (needs WoL configured)."""
+        if not WoL or WoL.missing_config():
+            return
+        # Parse host/port from URL for robustness
+        from urllib.parse import urlparse
+        try:
+            parsed = urlparse(self.ollama_url)
+            host = parsed.hostname
+            port = parsed.port or 11434
+        except:
+            host = os.getenv("OLLAMA_HOST_IP", "localhost")
+            port = 11434
+        # Fast check (500ms)
+        if not WoL.is_up(host, port, timeout=0.5):
+            print("[RAG] Ollama unreachable. Triggering Wake-on-LAN...")
+            WoL.wake_device()
+            WoL.wait_for_ollama(host, port)
+
     def simple_tokenize(self, text: str) -> List[str]:
         import re
         # Split on any non-word character (like ::, ., etc)
@@ -306,69 +519,391 @@ class VectorStore:
         return re.findall(r'\w+', text.lower())
 
     def load_bm25(self):
-        """Loads BM25 index and mapping from disk if available."""
-        if os.path.exists(self.bm25_index_path) and os.path.exists(self.bm25_mapping_path):
+        """Memory-maps the BM25 index (including its chunk ID mapping) if available."""
+        if os.path.exists(self.bm25_index_path):
             try:
                 print("Loading BM25 index from disk...")
-                with open(self.bm25_index_path, 'rb') as f:
-                    self.bm25 = pickle.load(f)
-                with open(self.bm25_mapping_path, 'rb') as f:
-                    self.bm25_mapping = pickle.load(f)
+                self.bm25 = InvertedBM25Index.open(self.bm25_index_path)
+                self.bm25_mapping = self.bm25.doc_ids
                 print(f"BM25 loaded with {len(self.bm25_mapping)} documents.")
             except Exception as e:
                 print(f"Failed to load BM25 index: {e}")
+            self.load_symbols()
+            self.load_doc_store()
+        elif os.path.exists(self.legacy_bm25_index_path):
+            # Pickled indexes are no longer loaded (unpickling runs arbitrary code)
+            print("Found legacy pickled BM25 index; run build_rag.py to rebuild it in the binary format.")
         else:
             print("No BM25 index found on disk.")
 
+    def load_symbols(self):
+        """Loads the symbol index if it belongs to the loaded BM25 index."""
+        self.symbols = None
+        if not self.bm25 or not os.path.exists(self.symbols_path):
+            return
+        try:
+            symbols = SymbolIndex.open(self.symbols_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Failed to load symbol index: {e}")
+            return
+        if symbols.corpus_size != self.bm25.corpus_size:
+            print("Symbol index doesn't match the BM25 index; ignoring it until the next build.")
+            return
+        self.symbols = symbols
+        print(f"Symbol index loaded with {len(symbols)} symbols.")
+
+    def load_doc_store(self):
+        """Memory-maps the document store if it belongs to the loaded BM25 index."""
+        self.doc_store = None
+        if not self.bm25 or not os.path.exists(self.doc_store_path):
+            return
+        try:
+            doc_store = DocStore.open(self.doc_store_path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load doc store: {e}")
+            return
+        if doc_store.corpus_size != self.bm25.corpus_size:
+            print("Doc store doesn't match the BM25 index; fetching results from Chroma until the next build.")
+            return
+        self.doc_store = doc_store
+
+    def load_manifest(self):
+        """Loads the chunk manifest, discarding it if it can't be trusted."""
+        manifest = None
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Failed to load chunk manifest: {e}")
+
+        # Vectors of another model (or backend) live in another space, maybe another dimension
+        self.model_changed = bool(manifest) and manifest.get("embedding_model") != self.embedding_model
+        if self.model_changed:
+            print(f"Index was embedded with {manifest.get('embedding_model')}, not {self.embedding_model}; "
+                  "vector search needs the same model. A build re-embeds all chunks.")
+            manifest = None
+        if manifest and manifest["chunks"] and self.collection.count() == 0:
+            # Collection was wiped but the manifest survived
+            manifest = None
+
+        self.manifest = manifest["chunks"] if manifest else {}
+        self.version_bases = manifest.get("versions", {}) if manifest else {}
+        self.text_index = {entry["text"]: id_ for id_, entry in self.manifest.items()}
+
+    def reset_collection(self):
+        """Drops every stored chunk (build only: before re-embedding with another model)."""
+        name, embedding_function = self.collection.name, self.embedding_fn
+        self.client.delete_collection(name)
+        self.collection = self.client.get_or_create_collection(name=name, embedding_function=embedding_function)
+        self.manifest = {}
+        self.version_bases = {}
+        self.text_index = {}
+        self.model_changed = False
+
+    def save_manifest(self):
+        os.makedirs(self.db_path, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 2, "embedding_model": self.embedding_model, "versions": self.version_bases,
+                       "chunks": self.manifest}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def version_flag(version: str) -> str:
+        # Records carry one boolean key per docs version they belong to, so a version
+        # filter is a plain {"version:8.0.3": True} where clause
+        return f"version:{version}"
+
+    @staticmethod
+    def entry_versions(entry: Dict) -> List[str]:
+        # Entries written before multi-version builds belong to the default version
+        return entry.get("versions") or [DEFAULT_VERSION]
+
+    @staticmethod
+    def content_hashes(chunk: Dict) -> Dict[str, str]:
+        # url, version and chunk_index differ between versions sharing a chunk; leave them
+        # out so an unchanged chunk seen in another version doesn't count as modified
+        shared_meta = {k: v for k, v in chunk['metadata'].items() if k not in VERSION_FIELDS}
+        return {
+            "text": hashlib.sha256(chunk['text'].encode()).hexdigest(),
+            "meta": hashlib.sha256(json.dumps(shared_meta, sort_keys=True).encode()).hexdigest()
+        }
+
     def add_documents(self, chunks: List[Dict]):
+        """
+        Incrementally syncs chunks into Chroma using the manifest:
+        new or changed text is upserted (and embedded), metadata-only changes are
+        updated without re-embedding, and unchanged chunks are skipped.
+        A chunk already stored for another docs version only gains this version's flag.
+        Every chunk is still accumulated for the BM25 build.
+        """
         if not chunks:
             return
-        
-        ids = [c['id'] for c in chunks]
-        documents = [c['text'] for c in chunks]
-        metadatas = [c['metadata'] for c in chunks]
-        
+        self.write_documents(self.embed_plan(self.plan_documents(chunks)))
+
+    def plan_documents(self, chunks: List[Dict]) -> Dict:
+        """
+        Diffs chunks against the manifest without writing anything, so the pipelined
+        build can plan and embed batches on other threads than the Chroma writer.
+        """
+        plan = {"chunks": chunks, "changed": [], "metadata_only": [], "entries": {}, "embeddings": None}
+        for c in chunks:
+            hashes = self.content_hashes(c)
+            version = c['metadata'].get('version') or DEFAULT_VERSION
+            entry = self.manifest.get(c['id'])
+            versions = set(entry.get("versions", [])) if entry else set()
+            if entry is None or entry["text"] != hashes["text"]:
+                versions = {version}  # New text: other versions' copies have different IDs
+                target = plan["changed"]
+            elif entry["meta"] != hashes["meta"] or version not in versions:
+                versions.add(version)
+                target = plan["metadata_only"]
+            else:
+                continue
+            metadata = dict(c['metadata'], **{self.version_flag(v): True for v in versions})
+            target.append(dict(c, metadata=metadata))
+            plan["entries"][c['id']] = dict(hashes, url=c['metadata'].get('url'),
+                                            path=c['metadata'].get('path'), versions=sorted(versions))
+        return plan
+
+    def embed_plan(self, plan: Dict) -> Dict:
+        """
+        Embeds the changed chunks of a plan up front. Each distinct text (by hash) is sent
+        to the embedding model once: duplicates within the batch share its vector, text
+        already stored under another chunk ID (inherited members, boilerplate macros and
+        operators repeat across classes) reuses that record's embedding, and text another
+        embed worker is already embedding is waited for rather than embedded again.
+        """
+        changed = plan["changed"]
+        if not changed:
+            return plan
+        hashes = [plan["entries"][c['id']]["text"] for c in changed]
+        vectors = self.stored_embeddings(set(hashes))
+
+        missing, waiting = {}, {}
+        with self.pending_lock:
+            for c, text_hash in zip(changed, hashes):
+                if text_hash in vectors or text_hash in missing or text_hash in waiting:
+                    continue
+                if text_hash in self.pending_embeddings:
+                    waiting[text_hash] = self.pending_embeddings[text_hash]
+                else:
+                    missing[text_hash] = c['text']
+                    self.pending_embeddings[text_hash] = Future()
+        if missing:
+            try:
+                embedded = dict(zip(missing, self.embedding_fn(list(missing.values()))))
+            except BaseException as e:
+                with self.pending_lock:
+                    for text_hash in missing:
+                        self.pending_embeddings.pop(text_hash).set_exception(e)
+                raise
+            with self.pending_lock:
+                for text_hash, vector in embedded.items():
+                    # Stays pending until write_documents() has stored it
+                    self.pending_embeddings[text_hash].set_result(vector)
+            vectors.update(embedded)
+        for text_hash, future in waiting.items():
+            vectors[text_hash] = future.result()
+
+        plan["embeddings"] = [vectors[h] for h in hashes]
+        # Tallied by the writer thread, embed workers only record them on the plan
+        plan["reused"] = sum(1 for h in hashes if h in vectors and h not in missing)
+        plan["duplicates"] = len(changed) - plan["reused"] - len(missing)
+        return plan
+
+    def stored_embeddings(self, text_hashes) -> Dict[str, List[float]]:
+        """Embeddings of already stored chunks whose text hash is in `text_hashes`."""
+        ids = {self.text_index[h]: h for h in text_hashes if h in self.text_index}
+        vectors = {}
+        id_list = list(ids)
+        for i in range(0, len(id_list), 500):
+            existing = self.collection.get(ids=id_list[i:i + 500], include=["embeddings", "documents"])
+            for id_, doc, embedding in zip(existing['ids'], existing['documents'], existing['embeddings']):
+                # The record may have been rewritten since the index entry was made
+                if hashlib.sha256(doc.encode()).hexdigest() == ids[id_]:
+                    vectors[ids[id_]] = list(embedding)
+        return vectors
+
+    def write_documents(self, plan: Dict):
+        """Applies a plan from plan_documents() to Chroma and the manifest. Call from one thread."""
+        changed = plan["changed"]
+        metadata_only = plan["metadata_only"]
+        self.build_stats["unchanged"] += len(plan["chunks"]) - len(changed) - len(metadata_only)
+
         # Add to Chroma
-        self.collection.upsert(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas
-        )
+        if changed:
+            upsert = dict(
+                ids=[c['id'] for c in changed],
+                documents=[c['text'] for c in changed],
+                metadatas=[c['metadata'] for c in changed]
+            )
+            if plan["embeddings"] is not None:
+                upsert["embeddings"] = plan["embeddings"]
+            self.collection.upsert(**upsert)
+            self.build_stats["embedded"] += len(changed)
+            self.build_stats["duplicates"] += plan.get("duplicates", 0)
+            self.build_stats["reused"] += plan.get("reused", 0)
+        if metadata_only:
+            self.collection.update(
+                ids=[c['id'] for c in metadata_only],
+                metadatas=[c['metadata'] for c in metadata_only]
+            )
+            self.build_stats["metadata_updated"] += len(metadata_only)
+        
+        # Only record hashes once Chroma has accepted the write
+        self.manifest.update(plan["entries"])
+        with self.pending_lock:
+            for c in changed:
+                text_hash = plan["entries"][c['id']]["text"]
+                self.text_index[text_hash] = c['id']
+                self.pending_embeddings.pop(text_hash, None)
         
         # Accumulate for BM25
-        for c in chunks:
+        for c in plan["chunks"]:
             tokens = self.simple_tokenize(c['text'])
             self.build_corpus_tokens.append(tokens)
             self.build_corpus_ids.append(c['id'])
+            self.accumulate_attributes(c['metadata'], c['text'])
+            self.seen_ids.add(c['id'])
+            version = c['metadata'].get('version') or DEFAULT_VERSION
+            self.built_versions.add(version)
+            url, path = c['metadata'].get('url'), c['metadata'].get('path')
+            if url and path and path != url and url.endswith(path):
+                self.version_bases[version] = url[:-len(path)]
+
+    def accumulate_attributes(self, metadata: Dict, text: str):
+        """Records the filterable attributes and the symbols of the next BM25 document."""
+        attributes = self.build_corpus_attributes
+        chunk_type = metadata.get("type", "unknown")
+        attributes["type"].append(chunk_type)
+        attributes["page"].append(metadata.get("path") or metadata.get("url", ""))
+        attributes["title"].append(metadata.get("title", ""))
+        member = member_symbol(text) if chunk_type == "method" else None
+        self.build_corpus_symbols.append((class_name(metadata.get("title", "")), member,
+                                          chunk_type == "class_description"))
+
+    def prune_stale_chunks(self, keep_urls=None) -> int:
+        """
+        Call after a FULL build of one or more docs versions: chunks recorded in the
+        manifest that were not added during this build are dropped from the built
+        versions, and deleted once no version references them. Chunks of other versions
+        are left alone, as are chunks from `keep_urls` (e.g. pages that failed to download).
+        Returns the number of deleted chunks.
+        """
+        if not self.seen_ids:
+            print("No chunks added in this build; skipping stale chunk pruning.")
+            return 0
+
+        keep_urls = set(keep_urls or [])
+        keep_paths = {version_path(url, v) for url in keep_urls for v in self.built_versions}
+        stale, narrowed, kept = [], [], 0
+        for id_, entry in self.manifest.items():
+            if id_ in self.seen_ids:
+                continue
+            versions = set(self.entry_versions(entry))
+            dropped = versions & self.built_versions
+            if not dropped:
+                continue  # Only in versions this build didn't touch
+            if entry.get("url") in keep_urls or entry.get("path", entry.get("url")) in keep_paths:
+                kept += 1
+            elif dropped == versions:
+                stale.append(id_)
+            else:
+                narrowed.append((id_, sorted(versions - dropped), dropped))
+
+        batch_size = 500
+        for i in range(0, len(stale), batch_size):
+            self.collection.delete(ids=stale[i:i + batch_size])
+        for id_ in stale:
+            entry = self.manifest.pop(id_)
+            if self.text_index.get(entry["text"]) == id_:
+                del self.text_index[entry["text"]]
+        self.build_stats["deleted"] += len(stale)
+
+        for i in range(0, len(narrowed), batch_size):
+            batch = narrowed[i:i + batch_size]
+            # A None value removes the key from the record's metadata
+            self.collection.update(
+                ids=[id_ for id_, _, _ in batch],
+                metadatas=[{self.version_flag(v): None for v in dropped} for _, _, dropped in batch]
+            )
+            for id_, versions, _ in batch:
+                self.manifest[id_]["versions"] = versions
+
+        self.save_manifest()
+        print(f"Pruned {len(stale)} stale chunks, removed {len(narrowed)} from other versions' "
+              f"share (kept {kept} from unavailable pages).")
+        return len(stale)
 
     def build_and_save_bm25(self):
-        """Builds the BM25 index from accumulated documents and saves to disk."""
+        """
+        Builds the BM25 index and saves to disk. It covers every stored chunk: the ones
+        accumulated in this build plus those of other docs versions (or failed pages),
+        which are read back from Chroma. Each chunk is one document however many
+        versions share it; a per-document version bitmask serves version filters.
+        The doc store and symbol index are written alongside.
+        """
         if not self.build_corpus_tokens:
             print("No documents accumulated for BM25 build.")
             return
 
+        # Every record as Chroma stores it (metadata updates merge, so the chunks written
+        # in this build don't tell the final metadata), for the doc store
+        others = [id_ for id_ in self.manifest if id_ not in self.seen_ids]
+        all_ids = list(dict.fromkeys(self.build_corpus_ids)) + others
+        stored = {}
+        for i in range(0, len(all_ids), 500):
+            existing = self.collection.get(ids=all_ids[i:i + 500], include=["documents", "metadatas"])
+            for id_, doc, meta in zip(existing['ids'], existing['documents'], existing['metadatas']):
+                stored[id_] = (doc, meta)
+        for id_ in others:
+            if id_ in stored:
+                doc, meta = stored[id_]
+                self.build_corpus_tokens.append(self.simple_tokenize(doc))
+                self.build_corpus_ids.append(id_)
+                self.accumulate_attributes(meta, doc)
+
+        doc_versions = [self.entry_versions(self.manifest[id_]) if id_ in self.manifest else [DEFAULT_VERSION]
+                        for id_ in self.build_corpus_ids]
         print(f"Building BM25 index for {len(self.build_corpus_tokens)} chunks...")
-        self.bm25 = BM25Okapi(self.build_corpus_tokens)
-        self.bm25_mapping = self.build_corpus_ids
+        self.bm25 = InvertedBM25Index.build(self.build_corpus_tokens, doc_ids=self.build_corpus_ids,
+                                            doc_versions=doc_versions, doc_attributes=self.build_corpus_attributes)
+        self.bm25_mapping = self.bm25.doc_ids
         
         # Ensure db directory exists
         os.makedirs(self.db_path, exist_ok=True)
         
         print("Saving BM25 index to disk...")
-        with open(self.bm25_index_path, 'wb') as f:
-            pickle.dump(self.bm25, f)
-        with open(self.bm25_mapping_path, 'wb') as f:
-            pickle.dump(self.bm25_mapping, f)
+        self.bm25.save(self.bm25_index_path)
+        for legacy_path in (self.legacy_bm25_index_path, os.path.join(self.db_path, "bm25_mapping.pkl")):
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
         print("BM25 index saved.")
+        self.symbols = SymbolIndex.build(self.build_corpus_symbols)
+        self.symbols.save(self.symbols_path)
+        print(f"Symbol index saved with {len(self.symbols)} symbols.")
+        self.doc_store = DocStore.build({id_: stored[id_] for id_ in self.build_corpus_ids if id_ in stored})
+        self.doc_store.save(self.doc_store_path)
+        if len(self.doc_store) != self.bm25.corpus_size:
+            print(f"Warning: doc store covers {len(self.doc_store)} of {self.bm25.corpus_size} BM25 documents; "
+                  "results will be fetched from Chroma.")
+        self.save_manifest()
         
         # Clear memory
         self.build_corpus_tokens = []
         self.build_corpus_ids = []
+        self.build_corpus_attributes = {name: [] for name in BM25_ATTRIBUTES}
+        self.build_corpus_symbols = []
+        self.seen_ids = set()
+        self.built_versions = set()
 
     def reciprocal_rank_fusion(self, results: Dict[str, Dict[str, float]], k=60):
         """
         Combines ranked results using Reciprocal Rank Fusion.
-        results: Dict mapping doc_id to {'bm25_rank': int, 'chroma_rank': int}
+        results: Dict mapping doc_id to {'bm25_rank': int, 'chroma_rank': int, 'member': bool}
+        A 'member' hit (declares the bare member name the query is) adds a top-rank share.
         """
         fused_scores = {}
         for doc_id, ranks in results.items():
@@ -379,46 +914,380 @@ class VectorStore:
                 bm25_score = 1 / (k + ranks['bm25_rank'])
             if 'chroma_rank' in ranks:
                 chroma_score = 1 / (k + ranks['chroma_rank'])
+            member_score = 1 / (k + 1) if ranks.get('member') else 0
                 
-            fused_scores[doc_id] = bm25_score + chroma_score
+            fused_scores[doc_id] = bm25_score + chroma_score + member_score
             
         # Sort by score descending
         sorted_results = sorted(fused_scores.items(), key=lambda x: x[1], reverse=True)
         return sorted_results
 
-    def hybrid_query(self, query_text: str, top_k=5):
+    def resolve_filters(self, filters: Optional[Dict] = None, version: Optional[str] = None):
+        """
+        Turns `filters` and `version` into a Chroma where clause and a BM25 doc mask, so
+        both retrievers only consider matching chunks (nothing is post-filtered).
+        Filter keys: "type" and "title" (a value or a list of values), "class" (class or
+        struct name(s), e.g. "Slider" or "juce::AudioBuffer") and "url_prefix" (a page
+        URL prefix, or a path prefix relative to the version root).
+        Returns (where, doc_mask, version) - None entries mean unrestricted - or None
+        when no chunk can match. A url_prefix under a version's base URL implies that version.
+        """
+        filters = dict(filters or {})
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filter keys {sorted(unknown)}; expected some of {FILTER_KEYS}")
+        clauses, masks = [], []
+
+        prefix = filters.get("url_prefix")
+        if prefix:
+            for base_version, base in self.version_bases.items():
+                if prefix.startswith(base):
+                    if version and version != base_version:
+                        return None
+                    version, prefix = base_version, prefix[len(base):]
+                    break
+        if version:
+            clauses.append({self.version_flag(version): True})
+            if self.bm25:
+                masks.append(self.bm25_version_mask(version))
+
+        for key in ("type", "title"):
+            if key in filters:
+                values = as_list(filters[key])
+                if not values:
+                    return None
+                clauses.append({key: {"$in": values}})
+                masks.append(self.bm25_attribute_mask(key, values))
+
+        if filters.get("class"):
+            wanted = {normalize_class_name(name) for name in as_list(filters["class"])}
+            titles = [title for title in self.require_attribute("title") if class_name(title) in wanted]
+            if not titles:
+                return None
+            clauses.append({"title": {"$in": titles}})
+            masks.append(self.bm25.attribute_mask("title", titles))
+
+        if prefix:
+            pages = self.require_attribute("page")
+            lo, hi = self.bm25.attribute_prefix_range("page", prefix)
+            if lo == hi:
+                return None
+            if hi - lo < len(pages):
+                clauses.append({"path": {"$in": pages[lo:hi]}})
+                masks.append(self.bm25.attribute_prefix_mask("page", prefix))
+
+        where = None
+        if len(clauses) == 1:
+            where = clauses[0]
+        elif clauses:
+            where = {"$and": clauses}
+        doc_mask = None
+        for mask in masks:
+            if mask is not None:
+                doc_mask = mask if doc_mask is None else doc_mask & mask
+        return where, doc_mask, version
+
+    def require_attribute(self, name: str):
+        values = self.bm25.attribute_values(name) if self.bm25 else None
+        if values is None:
+            raise ValueError("class and url_prefix filters need a BM25 index with filter data; "
+                             "run build_rag.py to rebuild the index")
+        return values
+
+    def bm25_attribute_mask(self, name: str, values: List[str]):
+        if not self.bm25:
+            return None
+        mask = self.bm25.attribute_mask(name, values)
+        if mask is None:
+            # Index built before filters existed: can't tell which documents match, so the
+            # BM25 leg contributes nothing rather than unfiltered hits
+            print(f"Warning: BM25 index has no '{name}' data; rebuild it to filter keyword results.")
+            return np.zeros(self.bm25.corpus_size, dtype=bool)
+        return mask
+
+    @staticmethod
+    def empty_result(bm25_threshold=None, legs: Optional[Dict[str, str]] = None) -> Dict:
+        return {'ids': [[]], 'metadatas': [[]], 'documents': [[]], 'scores': [[]],
+                'bm25_scores': [[]], 'bm25_threshold': [bm25_threshold], 'symbol': [None], 'legs': [legs]}
+
+    def bm25_version_mask(self, version: Optional[str]):
+        """BM25 doc mask for `version`; None means no restriction."""
+        if not version:
+            return None
+        mask = self.bm25.version_mask(version)
+        if mask is None and version != DEFAULT_VERSION:
+            # Index built before multi-version support: everything in it is the default version
+            return np.zeros(self.bm25.corpus_size, dtype=bool)
+        return mask
+
+    def present_metadata(self, metadata: Dict, version: Optional[str]) -> Dict:
+        """Drops the version flags; for a version filter, points url/version at that version's page."""
+        metadata = {k: v for k, v in metadata.items() if not k.startswith("version:")}
+        base = self.version_bases.get(version) if version else None
+        if base and metadata.get("path"):
+            metadata["url"] = base + metadata["path"]
+            metadata["version"] = version
+        return metadata
+
+    def hybrid_query(self, query_text: str, top_k=5, min_bm25_score=None, version: Optional[str] = None,
+                     filters: Optional[Dict] = None, symbol_lookup: bool = True):
         """
         Performs Hybrid Search (BM25 + Chroma) with RRF.
+        `version` restricts both retrievers to one docs version ("master", "7.0.12", ...),
+        `filters` to chunks matching type / title / class / url_prefix (see resolve_filters).
+        BM25 hits scoring below `min_bm25_score` are dropped before fusion. Besides the
+        Chroma-style ids/metadatas/documents, the result carries the fused RRF 'scores',
+        each hit's 'bm25_scores' (None if it only came from the vector leg) and the
+        'bm25_threshold' (lowest BM25 score that made the BM25 top k).
+        The BM25 and vector legs run concurrently, so latency is the slower leg's rather
+        than their sum. A vector leg exceeding `vector_timeout` or failing degrades the
+        query to BM25 results; 'legs' reports each leg's status ("ok", "timeout",
+        "error", "circuit_open" or "skipped"), e.g. [{"bm25": "ok", "vector": "timeout"}].
+        "circuit_open" means the embedding backend kept failing and is skipped until a
+        background probe sees it recover (see embedding_breaker).
+        A query that is just an identifier naming a known class or qualified member ("Slider",
+        "juce::Slider::setRange") is answered by symbol_query() instead, without an
+        embedding call; 'symbol' then holds the matched name. A bare member name ("clear")
+        may mean any class's member, so it runs both legs and only boosts the members
+        named so in fusion. Pass symbol_lookup=False to skip both.
         """
         if not self.bm25:
             print("Warning: BM25 not initialized, falling back to vector search.")
-            return self.query(query_text, n_results=top_k)
+            return self.query(query_text, n_results=top_k, version=version, filters=filters)
+
+        resolved = self.resolve_filters(filters, version)
+        if resolved is None:
+            return self.empty_result()
+        where, doc_mask, version = resolved
+
+        symbol_docs = self.symbol_hits(query_text, doc_mask) if symbol_lookup else None
+        if symbol_docs:
+            return self.symbol_query(query_text, symbol_docs, top_k, min_bm25_score, doc_mask, version)
+
+        # Both legs run at once: the vector leg (embedding call + Chroma query) on the
+        # retrieval pool, BM25 on this thread meanwhile
+        dispatched = time.monotonic()
+        attempt = CallAttempt()
+        vector_future = self.retrieval_pool.submit(self.vector_search, [query_text], top_k, where, attempt)
 
         # 1. BM25 Search
         tokenized_query = self.simple_tokenize(query_text)
-        # rank_bm25 doesn't give indices directly easily with scores, using get_scores
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        # Get top N indices
-        top_n_bm25_indices = sorted(range(len(bm25_scores)), key=lambda i: bm25_scores[i], reverse=True)[:top_k]
-        
+        # Only documents containing a query term are scored (inverted index postings),
+        # then top-k is selected with a vectorized partition instead of a full sort
+        top_n_bm25 = self.bm25.top_k(tokenized_query, top_k, min_score=min_bm25_score, doc_mask=doc_mask)
+
+        # 2. Chroma Search (waits at most vector_timeout from dispatch, else BM25 only)
+        chroma_ids, vector_status = self.vector_leg_result(vector_future, dispatched, attempt)
+        legs = {"bm25": "ok", "vector": vector_status}
+
+        # 3. Fusion
+        member_docs = self.member_hits(query_text, doc_mask) if symbol_lookup else None
+        ranked, bm25_scores, bm25_threshold = self.fuse(top_n_bm25, chroma_ids, top_k, member_docs)
+
+        # 4. Fetch Documents for Final Output (from the local doc store, no database call)
+        return self.materialize(ranked, bm25_scores, bm25_threshold, version, legs=legs)
+
+    async def ahybrid_query(self, query_text: str, top_k=5, min_bm25_score=None, version: Optional[str] = None,
+                            filters: Optional[Dict] = None, symbol_lookup: bool = True):
+        """
+        hybrid_query for event-loop servers (the MCP server): same arguments and result.
+        The query embedding goes over a pooled async HTTP connection to Ollama, and the
+        blocking work (BM25 scoring, Chroma calls, document reads) runs on the bounded
+        retrieval pool, so one process serves many concurrent sessions.
+        """
+        if not self.bm25:
+            return await self.offload(self.hybrid_query, query_text, top_k=top_k, version=version, filters=filters)
+
+        resolved = await self.offload(self.resolve_filters, filters, version)
+        if resolved is None:
+            return self.empty_result()
+        where, doc_mask, version = resolved
+
+        symbol_docs = self.symbol_hits(query_text, doc_mask) if symbol_lookup else None
+        if symbol_docs:
+            return await self.offload(self.symbol_query, query_text, symbol_docs, top_k, min_bm25_score,
+                                      doc_mask, version)
+
+        dispatched = time.monotonic()
+        attempt = CallAttempt()
+        vector_task = asyncio.ensure_future(self.avector_search([query_text], top_k, where, attempt))
+        top_n_bm25 = await self.offload(self.bm25.top_k, self.simple_tokenize(query_text), top_k,
+                                        min_score=min_bm25_score, doc_mask=doc_mask)
+        chroma_ids, vector_status = await self.avector_leg_result(vector_task, dispatched, attempt)
+
+        member_docs = self.member_hits(query_text, doc_mask) if symbol_lookup else None
+        ranked, bm25_scores, bm25_threshold = self.fuse(top_n_bm25, chroma_ids, top_k, member_docs)
+        return await self.offload(self.materialize, ranked, bm25_scores, bm25_threshold, version,
+                                  legs={"bm25": "ok", "vector": vector_status})
+
+    async def offload(self, fn, *args, **kwargs):
+        """Runs blocking work on the retrieval pool without holding the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self.retrieval_pool,
+                                                                functools.partial(fn, *args, **kwargs))
+
+    def symbol_hits(self, query_text: str, doc_mask) -> Optional[List[int]]:
+        """BM25 documents of the class/member `query_text` names exactly (within `doc_mask`), or None."""
+        if not self.symbols or not looks_like_symbol(query_text):
+            return None
+        symbol_docs = self.symbols.lookup(query_text)
+        if doc_mask is not None:
+            symbol_docs = [doc for doc in symbol_docs if doc_mask[doc]]
+        return symbol_docs or None
+
+    def member_hits(self, query_text: str, doc_mask) -> Optional[List[int]]:
+        """
+        BM25 documents of members of any class named `query_text` ("clear"). Ambiguous,
+        so they are boosted in fusion rather than answering the query like symbol_hits.
+        """
+        if not self.symbols or not looks_like_symbol(query_text):
+            return None
+        member_docs = self.symbols.members_named(query_text)
+        if doc_mask is not None:
+            member_docs = [doc for doc in member_docs if doc_mask[doc]]
+        return member_docs or None
+
+    def vector_search(self, query_texts: List[str], top_k: int, where: Optional[Dict],
+                      attempt: Optional[CallAttempt] = None) -> List[List[str]]:
+        """Chunk IDs of the nearest neighbours of each query (only the IDs; documents come from the doc store)."""
+        return self.nearest_ids(self.embed_queries(query_texts, attempt), top_k, where)
+
+    async def avector_search(self, query_texts: List[str], top_k: int, where: Optional[Dict],
+                             attempt: Optional[CallAttempt] = None) -> List[List[str]]:
+        embeddings = await self.aembed_queries(query_texts, attempt)
+        return await self.offload(self.nearest_ids, embeddings, top_k, where)
+
+    def nearest_ids(self, embeddings: List[List[float]], top_k: int, where: Optional[Dict]) -> List[List[str]]:
+        chroma_res = self.collection.query(
+            query_embeddings=embeddings,
+            n_results=top_k,
+            where=where,
+            include=[]
+        )
+        return chroma_res['ids'] or [[] for _ in embeddings]
+
+    def vector_leg_result(self, future, dispatched: float, attempt: Optional[CallAttempt] = None):
+        """
+        (chunk IDs, leg status) of a vector leg submitted at `dispatched`. A leg that is
+        late ("timeout") or failed ("error") contributes no IDs; a late one keeps running
+        and still fills the query embedding cache for the next identical query. If it is
+        late because its embedding call (`attempt`) hasn't answered, the call counts as a
+        failure for embedding_breaker.
+        """
+        timeout = None
+        if self.vector_timeout > 0:
+            timeout = max(0.0, dispatched + self.vector_timeout - time.monotonic())
+        try:
+            return future.result(timeout=timeout)[0], "ok"
+        except FuturesTimeoutError:
+            return self.vector_leg_failed("timeout", attempt=attempt)
+        except CircuitOpenError:
+            return [], "circuit_open"
+        except Exception as e:
+            return self.vector_leg_failed("error", e)
+
+    async def avector_leg_result(self, task, dispatched: float, attempt: Optional[CallAttempt] = None):
+        """vector_leg_result() for an asyncio task; a late task is shielded, so it still completes."""
+        timeout = None
+        if self.vector_timeout > 0:
+            timeout = max(0.0, dispatched + self.vector_timeout - time.monotonic())
+        try:
+            return (await asyncio.wait_for(asyncio.shield(task), timeout))[0], "ok"
+        except asyncio.TimeoutError:
+            # Nobody awaits the task any more; retrieve its outcome so a late failure isn't reported as unhandled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return self.vector_leg_failed("timeout", attempt=attempt)
+        except CircuitOpenError:
+            return [], "circuit_open"
+        except Exception as e:
+            return self.vector_leg_failed("error", e)
+
+    def vector_leg_failed(self, status: str, error: Optional[Exception] = None,
+                          attempt: Optional[CallAttempt] = None):
+        if attempt is not None:
+            self.embedding_breaker.abandon(attempt)
+        if status == "timeout":
+            print(f"Warning: vector search took over {self.vector_timeout:g}s; returning BM25 results only.")
+        else:
+            print(f"Warning: vector search failed ({error}); returning BM25 results only.")
+        return [], status
+
+    def hybrid_query_batch(self, queries: List[str], top_k=5, min_bm25_score=None, version: Optional[str] = None,
+                           filters: Optional[Dict] = None, symbol_lookup: bool = True) -> List[Dict]:
+        """
+        hybrid_query for many queries at once (evaluation sets, agent fan-out); returns one
+        result per query, identical to calling hybrid_query on each. Instead of per-query
+        round trips it makes one batched embedding request (for query cache misses), one
+        multi-query Chroma call, one BM25 pass scoring all queries as a sparse matrix, and
+        one fetch_records for every result document.
+        """
+        if not queries:
+            return []
+        if not self.bm25:
+            return [self.hybrid_query(q, top_k=top_k, version=version, filters=filters) for q in queries]
+
+        resolved = self.resolve_filters(filters, version)
+        if resolved is None:
+            return [self.empty_result() for _ in queries]
+        where, doc_mask, version = resolved
+
+        # Exact symbol queries are answered without the vector leg, as in hybrid_query
+        symbol_docs = [self.symbol_hits(q, doc_mask) if symbol_lookup else None for q in queries]
+
+        # 1. BM25 for all queries in one pass
+        bm25_tops = self.bm25.top_k_batch([self.simple_tokenize(q) for q in queries], top_k,
+                                          min_score=min_bm25_score, doc_mask=doc_mask)
+
+        # 2. One embedding batch and one Chroma call for the queries that need the vector leg
+        vector_queries = [i for i, docs in enumerate(symbol_docs) if docs is None]
+        chroma_ids = {}
+        vector_status = "ok"
+        if vector_queries:
+            try:
+                found = self.vector_search([queries[i] for i in vector_queries], top_k, where)
+                chroma_ids = dict(zip(vector_queries, found))
+            except CircuitOpenError:
+                vector_status = "circuit_open"
+            except Exception as e:
+                _, vector_status = self.vector_leg_failed("error", e)
+
+        # 3. Fusion per query
+        fused = []
+        for i, query_text in enumerate(queries):
+            if symbol_docs[i] is not None:
+                fused.append(self.symbol_ranking(symbol_docs[i], bm25_tops[i], top_k)
+                             + (self.symbols.name(query_text), {"bm25": "ok", "vector": "skipped"}))
+            else:
+                member_docs = self.member_hits(query_text, doc_mask) if symbol_lookup else None
+                fused.append(self.fuse(bm25_tops[i], chroma_ids.get(i, []), top_k, member_docs)
+                             + (None, {"bm25": "ok", "vector": vector_status}))
+
+        # 4. One fetch for every result document
+        records = self.fetch_records(list({doc_id for ranked, *_ in fused for doc_id, _ in ranked}))
+        return [self.materialize(ranked, bm25_scores, bm25_threshold, version, symbol=symbol, records=records,
+                                 legs=legs)
+                for ranked, bm25_scores, bm25_threshold, symbol, legs in fused]
+
+    def fuse(self, top_n_bm25: List, chroma_ids: List[str], top_k: int, member_docs: Optional[List[int]] = None):
+        """
+        RRF over the BM25 top (doc number, score) pairs and the Chroma ID ranking, with
+        `member_docs` (BM25 doc numbers of members named like the query) boosted.
+        Returns (top k (chunk ID, fused score) pairs, BM25 score per chunk ID, BM25 threshold).
+        """
         bm25_results = {}
-        for rank, idx in enumerate(top_n_bm25_indices):
+        bm25_scores = {}
+        for rank, (idx, score) in enumerate(top_n_bm25):
             doc_id = self.bm25_mapping[idx]
             bm25_results[doc_id] = rank + 1 # 1-based rank
+            bm25_scores[doc_id] = score
+        bm25_threshold = top_n_bm25[-1][1] if top_n_bm25 else None
 
-        # 2. Chroma Search
-        chroma_res = self.collection.query(
-            query_texts=[query_text],
-            n_results=top_k
-        )
-        
         chroma_results = {}
-        if chroma_res['ids'] and chroma_res['ids'][0]:
-            for rank, doc_id in enumerate(chroma_res['ids'][0]):
-                chroma_results[doc_id] = rank + 1
+        for rank, doc_id in enumerate(chroma_ids):
+            chroma_results[doc_id] = rank + 1
 
-        # 3. Fusion
-        all_ids = set(bm25_results.keys()) | set(chroma_results.keys())
+        member_ids = {self.bm25_mapping[idx] for idx in member_docs or []}
+
+        all_ids = set(bm25_results.keys()) | set(chroma_results.keys()) | member_ids
         fusion_input = {}
         for doc_id in all_ids:
             fusion_input[doc_id] = {}
@@ -426,27 +1295,70 @@ class VectorStore:
                 fusion_input[doc_id]['bm25_rank'] = bm25_results[doc_id]
             if doc_id in chroma_results:
                 fusion_input[doc_id]['chroma_rank'] = chroma_results[doc_id]
-        
-        fused_ranked = self.reciprocal_rank_fusion(fusion_input)
-        
-        # 4. Fetch Documents for Final Output
-        # We need to get details for the top k fused results
-        top_fused_ids = [doc_id for doc_id, score in fused_ranked[:top_k]]
-        
+            if doc_id in member_ids:
+                fusion_input[doc_id]['member'] = True
+
+        return self.reciprocal_rank_fusion(fusion_input)[:top_k], bm25_scores, bm25_threshold
+
+    def symbol_query(self, query_text: str, symbol_docs: List[int], top_k: int, min_bm25_score,
+                     doc_mask, version: Optional[str]) -> Dict:
+        """
+        Exact symbol hits (class description first, then its members; or the member's
+        overloads) in index order, remaining slots filled from BM25. No vector leg: the
+        query costs a dict lookup plus BM25 scoring, and Ollama is never contacted.
+        """
+        top_n_bm25 = self.bm25.top_k(self.simple_tokenize(query_text), top_k, min_score=min_bm25_score,
+                                     doc_mask=doc_mask)
+        ranked, bm25_scores, bm25_threshold = self.symbol_ranking(symbol_docs, top_n_bm25, top_k)
+        return self.materialize(ranked, bm25_scores, bm25_threshold, version, symbol=self.symbols.name(query_text),
+                                legs={"bm25": "ok", "vector": "skipped"})
+
+    def symbol_ranking(self, symbol_docs: List[int], top_n_bm25: List, top_k: int):
+        """Like fuse(): symbol hits score as if ranked equally by both legs, BM25 fills by their BM25 rank."""
+        bm25_scores = {self.bm25_mapping[idx]: score for idx, score in top_n_bm25}
+        bm25_threshold = top_n_bm25[-1][1] if top_n_bm25 else None
+
+        ranked = []
+        for rank, idx in enumerate(symbol_docs[:top_k]):
+            ranked.append((self.bm25_mapping[idx], 2 / (60 + rank + 1)))
+        seen = {doc_id for doc_id, _ in ranked}
+        for rank, (idx, _) in enumerate(top_n_bm25):
+            doc_id = self.bm25_mapping[idx]
+            if len(ranked) >= top_k:
+                break
+            if doc_id not in seen:
+                ranked.append((doc_id, 1 / (60 + rank + 1)))
+        return ranked, bm25_scores, bm25_threshold
+
+    def fetch_records(self, ids: List[str]) -> Dict[str, Dict]:
+        """
+        Chunk ID -> {'metadata', 'document'} for the given IDs. Read from the doc store;
+        only IDs missing from it (no doc store, or an older index) cost a Chroma get.
+        """
+        records = self.doc_store.records(ids) if self.doc_store else {}
+        missing = [id_ for id_ in ids if id_ not in records]
+        if missing:
+            final_docs = self.collection.get(ids=missing)
+            for id_, meta, doc in zip(final_docs['ids'], final_docs['metadatas'], final_docs['documents']):
+                records[id_] = {'metadata': meta, 'document': doc}
+        return records
+
+    def materialize(self, ranked: List, bm25_scores: Dict[str, float], bm25_threshold, version: Optional[str],
+                    symbol: Optional[str] = None, records: Optional[Dict[str, Dict]] = None,
+                    legs: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Builds the result for ranked (chunk ID, score) pairs, keeping their order. Documents
+        and metadata come from `records` (see fetch_records) or are fetched from Chroma.
+        `legs` records which retrieval legs contributed (see hybrid_query).
+        """
+        top_fused_ids = [doc_id for doc_id, score in ranked]
+        fused_scores = dict(ranked)
+
         if not top_fused_ids:
-            return {'ids': [[]], 'metadatas': [[]], 'documents': [[]]}
+            return self.empty_result(bm25_threshold, legs)
 
-        # Fetch from Chroma by ID
-        final_docs = self.collection.get(ids=top_fused_ids)
-        
-        # Chroma .get() returns lists not necessarily in order of request ids? 
-        # We should align them to the fused order.
-        
-        # Map ID to its data
-        id_to_data = {
-            id_: {'metadata': meta, 'document': doc} 
-            for id_, meta, doc in zip(final_docs['ids'], final_docs['metadatas'], final_docs['documents'])
-        }
+        # Look up by ID (doc store, else Chroma), then align to the fused order
+        id_to_data = records if records is not None else self.fetch_records(top_fused_ids)
         
         ordered_ids = []
         ordered_metas = []
@@ -455,69 +1367,314 @@ class VectorStore:
         for id_ in top_fused_ids:
             if id_ in id_to_data:
                 ordered_ids.append(id_)
-                ordered_metas.append(id_to_data[id_]['metadata'])
+                ordered_metas.append(self.present_metadata(id_to_data[id_]['metadata'], version))
                 ordered_docs.append(id_to_data[id_]['document'])
                 
         return {
             'ids': [ordered_ids],
             'metadatas': [ordered_metas],
-            'documents': [ordered_docs]
+            'documents': [ordered_docs],
+            'scores': [[fused_scores[id_] for id_ in ordered_ids]],
+            'bm25_scores': [[bm25_scores.get(id_) for id_ in ordered_ids]],
+            'bm25_threshold': [bm25_threshold],
+            'symbol': [symbol],
+            'legs': [legs]
         }
 
-    def query(self, query_text: str, n_results=3):
-        # Let Chroma handle query embedding
+    def embed_queries(self, query_texts: List[str], attempt: Optional[CallAttempt] = None) -> List[List[float]]:
+        """Embeds queries through the query cache; only misses reach the embedding function."""
+        return self.query_cache.get_or_compute(
+            self.embedding_model, query_texts,
+            lambda texts: self.embedding_breaker.call(self.embedding_fn.embed_query, texts, attempt=attempt)
+        )
+
+    async def aembed_queries(self, query_texts: List[str],
+                             attempt: Optional[CallAttempt] = None) -> List[List[float]]:
+        """embed_queries() over the embedding function's async client."""
+        return await self.query_cache.aget_or_compute(
+            self.embedding_model, query_texts,
+            lambda texts: self.embedding_breaker.acall(self.embedding_fn.aembed_query, texts, attempt=attempt)
+        )
+
+    def query(self, query_text: str, n_results=3, version: Optional[str] = None, filters: Optional[Dict] = None):
+        resolved = self.resolve_filters(filters, version)
+        if resolved is None:
+            return {'ids': [[]], 'metadatas': [[]], 'documents': [[]], 'distances': [[]]}
+        where, _, version = resolved
+        # Embed via the query cache instead of letting Chroma call Ollama every time
         results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results
+            query_embeddings=self.embed_queries([query_text]),
+            n_results=n_results,
+            where=where
         )
+        if results.get('metadatas'):
+            results['metadatas'] = [[self.present_metadata(m, version) for m in metas]
+                                    for metas in results['metadatas']]
         return results
 
-def main():
+    def close(self):
+        """Releases file handles and threads held by this store (called when a snapshot is retired)."""
+        self.embedding_breaker.stop()
+        self.embedding_fn.close()
+        self.retrieval_pool.shutdown(wait=False)
+        self.query_cache.close()
+
+class StoreRegistry:
+    """
+    Process-wide cache of VectorStore instances keyed by (db_path, collection).
+    A store is built once (Chroma client, BM25 mmap, Ollama probe, HTTP session) and
+    shared by all callers. At most every `check_interval` seconds, a get() compares
+    the index files' mtimes/sizes and swaps in a fresh store after a rebuild.
+    Replaced stores, and stores of deleted generations, are closed once no query
+    pinned with acquire() still uses them (like SnapshotManager).
+    """
+
+    # Files rewritten by build_rag.py; query-time caches are deliberately excluded
+    WATCHED_FILES = ("bm25_index.bin", "chroma.sqlite3")
+
+    def __init__(self, factory=None, check_interval: float = 1.0):
+        self.factory = factory or VectorStore
+        self.check_interval = check_interval
+        self.entries = {}
+        self.retired = []  # Replaced snapshots still pinned by in-flight queries
+        self.lock = threading.Lock()
+
+    def index_signature(self, db_path: str, collection_name: str):
+        files = self.WATCHED_FILES + (f"{collection_name}.manifest.json",)
+        signature = []
+        for name in files:
+            try:
+                st = os.stat(os.path.join(db_path, name))
+                signature.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    def get(self, db_path: Optional[str] = None, collection_name: str = "juce_docs") -> "VectorStore":
+        """The current store; queries should use acquire() so a reload can't close it mid-query."""
+        return self._current(db_path, collection_name, pin=False).store
+
+    @contextmanager
+    def acquire(self, db_path: Optional[str] = None, collection_name: str = "juce_docs"):
+        """Pins the current store for the duration of one query and yields it."""
+        snapshot = self._current(db_path, collection_name, pin=True)
+        try:
+            yield snapshot.store
+        finally:
+            with self.lock:
+                snapshot.refs -= 1
+                if snapshot.retired and snapshot.refs == 0 and snapshot in self.retired:
+                    self.retired.remove(snapshot)
+                    self._close(snapshot)
+
+    def _current(self, db_path: Optional[str], collection_name: str, pin: bool) -> Snapshot:
+        db_path = os.path.abspath(db_path or default_db_path())
+        key = (db_path, collection_name)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = {"lock": threading.Lock(), "store": None, "signature": None, "checked": 0.0}
+                self.entries[key] = entry
+
+        # Per-key lock: loading one index never blocks lookups of another
+        with entry["lock"]:
+            now = time.monotonic()
+            if entry["store"] is None or now - entry["checked"] >= self.check_interval:
+                entry["checked"] = now
+                signature = self.index_signature(db_path, collection_name)
+                if entry["store"] is None or signature != entry["signature"]:
+                    if entry["store"] is not None:
+                        print(f"[RAG] Index at {db_path} changed on disk; reloading store.")
+                    previous = entry["store"]
+                    entry["store"] = Snapshot(db_path, self.factory(db_path=db_path, collection_name=collection_name))
+                    # Re-read after loading, in case the store itself created files
+                    entry["signature"] = self.index_signature(db_path, collection_name)
+                    with self.lock:
+                        if previous is not None:
+                            self._retire(previous)
+                    self._drop_deleted(keep=key)
+            snapshot = entry["store"]
+            if pin:
+                with self.lock:
+                    snapshot.refs += 1
+            return snapshot
+
+    def _drop_deleted(self, keep):
+        # Index generations get pruned after a rebuild; forget (and close) stores whose directory is gone
+        with self.lock:
+            for key in [key for key in self.entries if key != keep and not os.path.isdir(key[0])]:
+                entry = self.entries.pop(key)
+                if entry["store"] is not None:
+                    self._retire(entry["store"])
+
+    def _retire(self, snapshot: Snapshot):
+        # Called with self.lock held: close now, or when its last pinned query finishes
+        snapshot.retired = True
+        if snapshot.refs == 0:
+            self._close(snapshot)
+        else:
+            self.retired.append(snapshot)
+
+    @staticmethod
+    def _close(snapshot: Snapshot):
+        close = getattr(snapshot.store, "close", None)
+        if close:
+            close()
+
+    def clear(self):
+        with self.lock:
+            for entry in self.entries.values():
+                if entry["store"] is not None:
+                    self._retire(entry["store"])
+            self.entries = {}
+
+_store_registry = StoreRegistry()
+
+def get_store(db_path: Optional[str] = None, collection_name: str = "juce_docs") -> "VectorStore":
+    """Returns the shared, thread-safe VectorStore for (db_path, collection_name)."""
+    return _store_registry.get(db_path=db_path, collection_name=collection_name)
+
+def acquire_store(db_path: Optional[str] = None, collection_name: str = "juce_docs"):
+    """Context manager pinning the shared VectorStore for one query (see StoreRegistry.acquire)."""
+    return _store_registry.acquire(db_path=db_path, collection_name=collection_name)
+
+def current_db_path(index_root: Optional[str] = None) -> str:
+    """Path of the live index generation, or the legacy in-place DB if none was published."""
+    generations = IndexGenerations(index_root or os.getenv("JUCE_INDEX_ROOT", default_index_root()))
+    return generations.current_path() or default_db_path()
+
+def build_pipeline(scraper: JuceScraper, processor: JuceProcessor, vector_store: VectorStore,
+                   links: Optional[List[str]] = None, batch_size: int = 100,
+                   chunk_workers: int = 2, embed_workers: int = 2, progress_interval: Optional[float] = 30.0) -> Pipeline:
+    """
+    Staged build: the crawl (its own fetch workers) feeds chunking, chunks are batched,
+    batches are diffed and embedded by `embed_workers` threads, and a single writer
+    upserts into Chroma. Queues are bounded, so a slow embedder throttles the crawl.
+    """
+    batcher = Batcher(batch_size)
+    return Pipeline(
+        scraper.crawl(links),
+        [
+            Stage("chunk", processor.chunk_document, workers=chunk_workers, queue_size=32),
+            Stage("batch", batcher.add, flush=batcher.flush, queue_size=batch_size * 4),
+            Stage("embed", lambda batch: [vector_store.embed_plan(vector_store.plan_documents(batch))],
+                  workers=embed_workers, queue_size=4),
+            # Chroma writes, manifest and BM25 accumulation stay on one thread
+            Stage("write", vector_store.write_documents, queue_size=max(2, embed_workers)),
+        ],
+        source_name="crawl",
+        progress_interval=progress_interval
+    )
+
+def main(concurrency=None, cache_dir=None, index_root=None, keep_generations=3,
+         archive_dir=None, replay=None, local_docs=None, version=None):
+    """
+    Crawls docs.juce.com and publishes a new index generation.
+    `version` selects the docs version (default: master). Versions share one index: a new
+    generation keeps the other versions' chunks, and text identical across versions is stored once.
+    `replay` (a snapshot name or "latest") rebuilds from the HTML archive without any network access.
+    `local_docs` (a Doxygen HTML directory or tarball) ingests a locally generated documentation tree.
+    """
     print("Starting JUCE RAG System Builder...")
     
-    scraper = JuceScraper()
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if concurrency is None:
+        concurrency = int(os.getenv("JUCE_CRAWL_CONCURRENCY", "8"))
+    if cache_dir is None:
+        # Page cache lives next to the database so nightly rebuilds only revalidate pages
+        cache_dir = os.getenv("JUCE_PAGE_CACHE", os.path.join(project_root, "data", "page_cache"))
+    if archive_dir is None:
+        # Raw HTML of every crawl, for replay builds; set JUCE_HTML_ARCHIVE="" to disable
+        archive_dir = os.getenv("JUCE_HTML_ARCHIVE", os.path.join(project_root, "data", "html_archive"))
+    archive = HtmlArchive(archive_dir) if archive_dir else None
+
+    parse_workers = int(os.getenv("JUCE_PARSE_WORKERS", str(os.cpu_count() or 1)))
+    source = None
+    if replay:
+        if archive is None:
+            print("Replay needs an HTML archive (JUCE_HTML_ARCHIVE). Exiting.")
+            return
+        source = archive.open_snapshot(replay)
+        print(f"Replaying snapshot {source.name} ({len(source)} pages), no network access.")
+    elif local_docs:
+        source = LocalDocs(local_docs, base_url=DOCS_URL.format(version=version or DEFAULT_VERSION))
+        print(f"Ingesting local Doxygen output from {source.root}, no network access.")
+    if source:
+        # Reads are local: enough threads to keep every parser process busy
+        concurrency = max(concurrency, parse_workers * 2)
+
+    scraper = JuceScraper(
+        concurrency=concurrency,
+        cache_dir=None if source else cache_dir,
+        parser_backend=os.getenv("JUCE_HTML_PARSER", "auto"),
+        parse_workers=parse_workers,
+        archive=archive,
+        source=source,
+        version=version
+    )
     processor = JuceProcessor()
-    vector_store = VectorStore()
-    
+
     # 1. Scrape and Process
     links = scraper.get_class_list()
     if not links:
         print("No links found. Exiting.")
+        scraper.close()
+        if isinstance(source, LocalDocs):
+            source.close()
         return
 
-    # For demonstration/testing purposes, limit to first 50 or verify if we should run all
-    # The PRP implies running widely ("Iterate through the Class List"). 
-    # I'll implement batching.
-    
-    batch_size = 100
-    current_batch = []
-    
-    total_processed = 0
-    
-    for i, link in enumerate(links):
-        doc = scraper.scrape_content(link)
-        if not doc.items:
-            continue
-            
-        chunks = processor.chunk_document(doc)
-        current_batch.extend(chunks)
-        
-        if len(current_batch) >= batch_size:
-            print(f"Upserting batch of {len(current_batch)} chunks...")
-            vector_store.add_documents(current_batch)
-            total_processed += len(current_batch)
-            current_batch = []
-            
-    # Final batch
-    if current_batch:
-        print(f"Upserting final batch of {len(current_batch)} chunks...")
-        vector_store.add_documents(current_batch)
-        total_processed += len(current_batch)
+    # Build into a fresh generation (a copy of the live one) so running servers keep
+    # reading an untouched index until the new one is published
+    generations = IndexGenerations(index_root or os.getenv("JUCE_INDEX_ROOT", default_index_root()))
+    generation, db_path = generations.prepare(seed_path=default_db_path())
+    vector_store = VectorStore(db_path=db_path)
+    if vector_store.model_changed:
+        # One collection can't mix two models' vectors, so every docs version goes
+        print("Embedding model changed: dropping the whole collection (all docs versions). "
+              f"Only {version or DEFAULT_VERSION} is rebuilt now; rebuild the others with --docs-version.")
+        vector_store.reset_collection()
+
+    # Stages overlap: crawl -> chunk -> batch -> embed -> write, with bounded queues between
+    pipeline = build_pipeline(scraper, processor, vector_store, links,
+                              embed_workers=int(os.getenv("JUCE_EMBED_WORKERS", "2")))
+    try:
+        report = pipeline.run()
+    finally:
+        scraper.close()
+        if isinstance(source, LocalDocs):
+            source.close()  # Removes the unpacked tarball
+    pipeline.print_report()
+    total_processed = report["batch"]["items_in"]
         
+    # Drop chunks for pages/members that no longer exist
+    vector_store.prune_stale_chunks(keep_urls=scraper.failed_urls)
+
     print("Building BM25 Index...")
     vector_store.build_and_save_bm25()
+    
+    stats = vector_store.build_stats
+    print(f"Incremental build: {stats['embedded']} embedded, {stats['metadata_updated']} metadata-only, "
+          f"{stats['unchanged']} unchanged, {stats['deleted']} deleted.")
+    print(f"Content dedup: {stats['duplicates'] + stats['reused']} embedding calls saved "
+          f"({stats['duplicates']} duplicate texts in a batch, {stats['reused']} reused from stored chunks).")
         
+    if scraper.page_cache:
+        stats = scraper.page_cache.stats
+        print(f"Page cache: {stats['not_modified']} not modified, {stats['unchanged']} unchanged, {stats['fetched']} fetched.")
+
+    vector_store.close()
+    generations.publish(generation, chunks=total_processed)
+    generations.prune(keep=keep_generations)
     print(f"Finished. Total chunks stored: {total_processed}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the JUCE documentation index.")
+    parser.add_argument("--replay", nargs="?", const="latest", default=None, metavar="SNAPSHOT",
+                        help="rebuild from an archived HTML snapshot (default: the latest) instead of crawling")
+    parser.add_argument("--local", metavar="PATH", default=None,
+                        help="ingest a local Doxygen HTML directory or .tar.gz/.zip archive instead of crawling")
+    parser.add_argument("--docs-version", metavar="VERSION", default=None,
+                        help=f"JUCE docs version to index, e.g. 7.0.12 (default: {DEFAULT_VERSION})")
+    args = parser.parse_args()
+    main(replay=args.replay, local_docs=args.local, version=args.docs_version)
@@ -0,0 +1,147 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit is open."""
+
+
+class CallAttempt:
+    """One guarded call, so a caller that stops waiting for it can count it as failed (see abandon())."""
+
+    def __init__(self):
+        self.started = None
+        self.finished = False
+        self.counted = False  # Already counted as a failure by abandon()
+
+
+class CircuitBreaker:
+    """
+    Guards calls to a flaky backend (the embedding server). After `failure_threshold`
+    consecutive failures - errors, or calls slower than `slow_call_seconds` - the
+    circuit opens: calls fail fast with CircuitOpenError instead of waiting on the
+    backend. While open, a background thread runs `probe` every `probe_interval`
+    seconds and closes the circuit on the first fast success, so recovery is noticed
+    without any user request paying for a probe.
+    """
+
+    def __init__(self, probe: Callable[[], object], failure_threshold: int = 3,
+                 slow_call_seconds: Optional[float] = None, probe_interval: float = 5.0, name: str = "backend"):
+        self.probe = probe
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_call_seconds = slow_call_seconds
+        self.probe_interval = probe_interval
+        self.name = name
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.opened_at = None
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0, "probes": 0}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.probing = False  # Cleared under the lock when a probe closes the circuit
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "open":
+                self.stats["rejected"] += 1
+                return False
+            self.stats["calls"] += 1
+            return True
+
+    def call(self, fn: Callable, *args, attempt: Optional[CallAttempt] = None, **kwargs):
+        attempt = attempt or CallAttempt()
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open: {self.last_error}")
+        attempt.started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.finish(attempt, e)
+            raise
+        self.finish(attempt)
+        return result
+
+    async def acall(self, fn: Callable, *args, attempt: Optional[CallAttempt] = None, **kwargs):
+        """call() for a coroutine function."""
+        attempt = attempt or CallAttempt()
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open: {self.last_error}")
+        attempt.started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self.finish(attempt, e)
+            raise
+        self.finish(attempt)
+        return result
+
+    def finish(self, attempt: CallAttempt, error: Optional[Exception] = None):
+        with self.lock:
+            attempt.finished = True
+            if attempt.counted:
+                return  # The caller gave up on it and abandon() already counted the failure
+        if error is not None:
+            self.record_failure(error)
+        else:
+            self.record_latency(time.monotonic() - attempt.started)
+
+    def abandon(self, attempt: CallAttempt):
+        """
+        The caller stopped waiting for `attempt` (a query timeout). If the call is still
+        running it counts as a failure now, not when (or if) the hung backend answers,
+        so a host that stopped responding opens the circuit after `failure_threshold` queries.
+        """
+        with self.lock:
+            if attempt.started is None or attempt.finished or attempt.counted:
+                return
+            attempt.counted = True
+            waited = time.monotonic() - attempt.started
+        self.record_failure(TimeoutError(f"no answer after {waited:.1f}s"))
+
+    def record_latency(self, seconds: float):
+        if self.slow_call_seconds and seconds > self.slow_call_seconds:
+            self.record_failure(TimeoutError(f"call took {seconds:.1f}s"))
+            return
+        with self.lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self, error: Exception):
+        with self.lock:
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == "open" or self.consecutive_failures < self.failure_threshold:
+                return
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.stats["opened"] += 1
+            print(f"[RAG] {self.name} unavailable after {self.consecutive_failures} failures ({error}); "
+                  f"failing fast and probing every {self.probe_interval:g}s.")
+            if not self.probing:
+                self.probing = True
+                threading.Thread(target=self._probe_until_closed, name=f"{self.name}-probe", daemon=True).start()
+
+    def _probe_until_closed(self):
+        while not self.stop_event.wait(self.probe_interval):
+            self.stats["probes"] += 1
+            start = time.monotonic()
+            try:
+                self.probe()
+            except Exception as e:
+                self.last_error = e
+                continue
+            if self.slow_call_seconds and time.monotonic() - start > self.slow_call_seconds:
+                continue
+            with self.lock:
+                self.state = "closed"
+                self.consecutive_failures = 0
+                self.probing = False
+                downtime = time.monotonic() - self.opened_at
+            print(f"[RAG] {self.name} recovered after {downtime:.1f}s.")
+            return
+
+    def stop(self):
+        """Stops background probing (the circuit stays in its current state)."""
+        self.stop_event.set()
@@ -0,0 +1,104 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+# Statuses worth retrying: throttling and transient server-side failures.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens/second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Blocks until `tokens` are available, then consumes them."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Keeps one TokenBucket per host so concurrent workers share a request budget."""
+
+    def __init__(self, requests_per_second: Optional[float], burst: Optional[float] = None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str):
+        if not self.requests_per_second:
+            return  # Unlimited
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.requests_per_second, self.burst)
+                self.buckets[host] = bucket
+        bucket.acquire()
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parses a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_with_retry(session: requests.Session, url: str, headers: Optional[Dict] = None,
+                     rate_limiter: Optional[HostRateLimiter] = None, max_retries: int = 3,
+                     backoff: float = 0.5, max_backoff: float = 30.0, timeout: float = 30.0) -> requests.Response:
+    """
+    GETs `url`, retrying connection errors and RETRY_STATUSES with exponential backoff.
+    A Retry-After header from the server takes precedence over the computed delay.
+    The last response is returned once retries are exhausted so the caller's
+    raise_for_status() reports the real status; connection errors are re-raised.
+    """
+    attempt = 0
+    while True:
+        if rate_limiter:
+            rate_limiter.acquire(url)
+
+        delay = None
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return response
+            delay = _retry_after_seconds(response)
+            response.close()
+
+        if delay is None:
+            # Full exponential backoff with a little jitter so workers don't retry in lockstep
+            delay = backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+        time.sleep(min(delay, max_backoff))
+        attempt += 1
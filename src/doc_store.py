@@ -0,0 +1,99 @@
+import json
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from src.section_file import BlobStrings, map_file, read_sections, write_sections
+except ImportError:
+    from section_file import BlobStrings, map_file, read_sections, write_sections
+
+# On-disk layout (little-endian), see DocStore.save():
+#   header: magic, format version, n_docs, then (offset, length) in bytes per section,
+#   laid out as in src/section_file.py (shared with the BM25 index).
+#   Records are sorted by chunk ID, so a lookup is a binary search over the mapped ID
+#   blob and opening the file costs the same for any corpus size.
+MAGIC = b"JUCEDOCS"
+FORMAT_VERSION = 1
+SECTIONS = [
+    ("id_offsets", np.uint64),    # n_docs + 1 byte offsets into id_blob
+    ("id_blob", np.uint8),        # UTF-8 chunk IDs, sorted
+    ("text_offsets", np.uint64),
+    ("text_blob", np.uint8),      # UTF-8 chunk texts, in ID order
+    ("meta_offsets", np.uint64),
+    ("meta_blob", np.uint8),      # JSON metadata, in ID order
+]
+HEADER = struct.Struct("<8sI4xQ" + "QQ" * len(SECTIONS))
+
+
+class DocStore:
+    """
+    Read-only chunk ID -> (document, metadata) table, written next to the BM25 index
+    from the records as stored in Chroma. hybrid_query materializes fused results from
+    it instead of a collection.get round trip.
+    """
+
+    def __init__(self, ids: BlobStrings, texts: BlobStrings, metas: BlobStrings):
+        self.ids = ids
+        self.texts = texts
+        self.metas = metas
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, records: Dict[str, Tuple[str, Dict]]) -> "DocStore":
+        """`records` maps chunk ID -> (document, metadata)."""
+        ids = sorted(records)
+        blobs = [BlobStrings.pack(ids),
+                 BlobStrings.pack([records[id_][0] for id_ in ids]),
+                 BlobStrings.pack([json.dumps(records[id_][1], ensure_ascii=False) for id_ in ids])]
+        return cls(*(BlobStrings(offsets, np.frombuffer(blob, dtype=np.uint8)) for offsets, blob in blobs))
+
+    def get(self, id_: str) -> Optional[Dict]:
+        """{'metadata', 'document'} of a chunk, or None if it isn't stored."""
+        i = self.ids.find(id_)
+        if i is None:
+            return None
+        return {'metadata': json.loads(self.metas[i]), 'document': self.texts[i]}
+
+    def records(self, ids: List[str]) -> Dict[str, Dict]:
+        """Like get() for several IDs; missing IDs are left out."""
+        found = {}
+        for id_ in ids:
+            record = self.get(id_)
+            if record is not None:
+                found[id_] = record
+        return found
+
+    def save(self, path: str):
+        """Writes the table atomically (readers holding the old mapping are unaffected)."""
+        arrays = {
+            "id_offsets": self.ids.offsets, "id_blob": self.ids.blob,
+            "text_offsets": self.texts.offsets, "text_blob": self.texts.blob,
+            "meta_offsets": self.metas.offsets, "meta_blob": self.metas.blob,
+        }
+        write_sections(path, HEADER, (MAGIC, FORMAT_VERSION, len(self)), SECTIONS, arrays)
+
+    @classmethod
+    def open(cls, path: str) -> "DocStore":
+        """Memory-maps a table written by save()."""
+        buffer = map_file(path, HEADER.size, "doc store")
+
+        fields = HEADER.unpack_from(buffer, 0)
+        magic, version, n_docs = fields[:3]
+        if magic != MAGIC:
+            raise ValueError(f"Not a doc store: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported doc store version {version} in {path}; rebuild the index")
+        sections = read_sections(buffer, SECTIONS, fields[3:], path, "doc store")
+
+        strings = [BlobStrings(sections[f"{name}_offsets"], sections[f"{name}_blob"]) for name in ("id", "text", "meta")]
+        if any(len(s) != n_docs for s in strings):
+            raise ValueError(f"Corrupt doc store: {path}")
+        return cls(*strings)
@@ -0,0 +1,319 @@
+import abc
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import httpx
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# Values of EMBEDDING_BACKEND
+EMBEDDING_BACKENDS = ("ollama", "onnx", "sentence-transformers")
+DEFAULT_OLLAMA_MODEL = "embeddinggemma:latest"
+
+
+class EmbeddingBackend(abc.ABC):
+    """
+    What VectorStore needs from an embedding model: __call__(texts) -> vectors (Chroma's
+    embedding function interface), embed_query/embed_documents, an async aembed_query,
+    and `model_id`, which keys the query cache and the manifest (a different model
+    means a different vector space, so the index must be re-embedded).
+    """
+    model_id = ""
+    # True if the model is served by a remote machine that may need waking (Wake-on-LAN)
+    needs_wake = False
+    # Seconds a query embedding request may take before it is abandoned (None: no limit).
+    # VectorStore sets it to its vector_timeout; document embedding during builds is not limited
+    query_timeout = None
+
+    def name(self) -> str:
+        return f"{type(self).__name__}"
+
+    @abc.abstractmethod
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        """Embeds `input`, one vector per text."""
+
+    def embed_query(self, input: List[str]) -> List[List[float]]:
+        return self(input)
+
+    def embed_documents(self, input: List[str]) -> List[List[float]]:
+        return self(input)
+
+    async def aembed_query(self, input: List[str]) -> List[List[float]]:
+        """In-process backends are CPU-bound: run them on a worker thread, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self, input)
+
+    def close(self):
+        """Releases connections held for the backend (VectorStore.close() calls it)."""
+
+
+class OllamaEmbeddingFunction(EmbeddingBackend):
+    """Embeddings from an Ollama server (possibly on another machine, woken on demand)."""
+    needs_wake = True
+
+    # Statuses meaning "this server has no /api/embed" (Ollama < 0.3.4)
+    BATCH_UNSUPPORTED_STATUSES = {404, 405, 501}
+
+    def __init__(self, base_url: str, model_name: str, batch_size: int = 64, max_in_flight: int = 4):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api/embeddings"
+        self.batch_api_url = f"{base_url}/api/embed"
+        self.model_name = model_name
+        # /api/embed returns L2-normalized vectors (the legacy endpoint's are normalized here to
+        # match); the suffix makes the manifest re-embed indexes built from raw /api/embeddings vectors
+        self.model_id = f"{model_name}@embed"
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        # None = not probed yet, False = server rejected batching, use per-item calls
+        self.batch_supported = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(10, self.max_in_flight))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Pooled async client for aembed_query(): one at a time, created on the event loop that uses it
+        self.async_client = None
+        self.async_loop = None
+    
+    def name(self) -> str:
+        return "ollama_embedding_function"
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self._embed(input)
+
+    def embed_query(self, input: List[str]) -> List[List[float]]:
+        # A hung host fails the request after query_timeout instead of holding a query thread
+        return self._embed(input, timeout=self.query_timeout)
+
+    def _embed(self, input: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        if not input:
+            return []
+        batches = [input[i:i + self.batch_size] for i in range(0, len(input), self.batch_size)]
+        if len(batches) == 1 or self.max_in_flight == 1:
+            results = [self._embed_batch(batch, timeout) for batch in batches]
+        else:
+            # Bounded number of batches in flight; map() keeps results in input order
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+                results = list(pool.map(lambda batch: self._embed_batch(batch, timeout), batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def _embed_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        if self.batch_size > 1 and self.batch_supported is not False:
+            embeddings = self._post_batch(texts, timeout)
+            if embeddings is not None:
+                return embeddings
+        return [self._embed_one(text, timeout) for text in texts]
+
+    def _post_batch(self, texts: List[str], timeout: Optional[float] = None) -> Optional[List[List[float]]]:
+        """Embeds texts with one /api/embed call. Returns None if the server rejected batching."""
+        try:
+            response = self.session.post(self.batch_api_url, json={"model": self.model_name, "input": texts},
+                                         timeout=timeout)
+        except Exception as e:
+            print(f"Error getting embedding from Ollama: {e}")
+            raise e
+        return self._batch_embeddings(response, texts)
+
+    def _batch_embeddings(self, response, texts: List[str]) -> Optional[List[List[float]]]:
+        """Reads an /api/embed response (requests or httpx); None means retry item by item."""
+        if response.status_code in self.BATCH_UNSUPPORTED_STATUSES:
+            if self.batch_supported is not False:
+                print("Ollama server does not support /api/embed; falling back to per-item embedding requests.")
+            self.batch_supported = False
+            return None
+        if response.status_code == 400:
+            # Rejected this particular batch (e.g. one oversized input); retry it item by item
+            return None
+        response.raise_for_status()
+
+        embeddings = response.json().get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            return None
+        self.batch_supported = True
+        return embeddings
+
+    @staticmethod
+    def normalize(embedding: List[float]) -> List[float]:
+        """L2-normalizes an /api/embeddings vector, so it lives in the same space as /api/embed's."""
+        vector = np.asarray(embedding, dtype=np.float64)
+        return (vector / max(float(np.linalg.norm(vector)), 1e-12)).tolist()
+
+    def _embed_one(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        try:
+            response = self.session.post(self.api_url, json={"model": self.model_name, "prompt": text},
+                                         timeout=timeout)
+            response.raise_for_status()
+            return self.normalize(response.json()["embedding"])
+        except Exception as e:
+            print(f"Error getting embedding from Ollama: {e}")
+            # Fallback or empty? Better to crash in dev than produce garbage.
+            # But for robustness, we might retry.
+            # Returning empty list will crash Chroma.
+            raise e
+
+    async def aembed_query(self, input: List[str]) -> List[List[float]]:
+        """Async __call__: same batching and fallbacks, over a pooled httpx connection."""
+        if not input:
+            return []
+        batches = [input[i:i + self.batch_size] for i in range(0, len(input), self.batch_size)]
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async def embed(batch):
+            async with in_flight:
+                return await self._aembed_batch(batch)
+
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # An AsyncClient is bound to the loop it was first used on; a new loop replaces (and closes) it
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self.async_loop is not loop:
+            self.close_async_client()
+            self.async_client = httpx.AsyncClient(
+                timeout=None,  # Per request: query_timeout
+                limits=httpx.Limits(max_connections=max(10, self.max_in_flight))
+            )
+            self.async_loop = loop
+        return self.async_client
+
+    def close_async_client(self):
+        """Closes the async client from any thread, on its own loop while that still runs."""
+        client, loop = self.async_client, self.async_loop
+        self.async_client = self.async_loop = None
+        if client is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is not running and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        elif running is not None:
+            task = running.create_task(client.aclose())
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            try:
+                asyncio.run(client.aclose())
+            except Exception:
+                pass  # Connections of a finished loop; the client is marked closed regardless
+
+    async def aclose(self):
+        client = self.async_client
+        self.async_client = self.async_loop = None
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        self.close_async_client()
+        self.session.close()
+
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self.batch_size > 1 and self.batch_supported is not False:
+            try:
+                response = await self._async_client().post(self.batch_api_url,
+                                                           json={"model": self.model_name, "input": texts},
+                                                           timeout=self.query_timeout)
+            except Exception as e:
+                print(f"Error getting embedding from Ollama: {e}")
+                raise e
+            embeddings = self._batch_embeddings(response, texts)
+            if embeddings is not None:
+                return embeddings
+        return [await self._aembed_one(text) for text in texts]
+
+    async def _aembed_one(self, text: str) -> List[float]:
+        try:
+            response = await self._async_client().post(self.api_url, json={"model": self.model_name, "prompt": text},
+                                                       timeout=self.query_timeout)
+            response.raise_for_status()
+            return self.normalize(response.json()["embedding"])
+        except Exception as e:
+            print(f"Error getting embedding from Ollama: {e}")
+            raise e
+
+
+class OnnxEmbeddingFunction(EmbeddingBackend):
+    """
+    In-process CPU embeddings with ONNX Runtime: a sentence-embedding model exported to
+    ONNX (an int8-quantized export works as is) and its Hugging Face tokenizer.json.
+    Token states are mean-pooled over the attention mask and L2-normalized, like
+    sentence-transformers does; models that already output one vector per text are only normalized.
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 32, max_length: int = 256, threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        # A model directory (model.onnx + tokenizer.json) or the .onnx file itself
+        if os.path.isdir(model_path):
+            model_dir, model_file = model_path, os.path.join(model_path, "model.onnx")
+        else:
+            model_dir, model_file = os.path.dirname(model_path), model_path
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_file, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = max(1, batch_size)
+        self.model_id = "onnx:" + os.path.basename(os.path.normpath(model_dir)) + "/" + os.path.basename(model_file)
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        embeddings = []
+        for i in range(0, len(input), self.batch_size):
+            encodings = self.tokenizer.encode_batch(list(input[i:i + self.batch_size]))
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": np.zeros_like(ids)}
+            output = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            if output.ndim == 3:
+                weights = mask[:, :, None].astype(output.dtype)
+                output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            output = output / np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+            embeddings.extend(output.astype(np.float64).tolist())
+        return embeddings
+
+
+class SentenceTransformerEmbeddingFunction(EmbeddingBackend):
+    """In-process CPU embeddings with sentence-transformers, from a local model directory or hub name."""
+
+    def __init__(self, model_path: str, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.batch_size = batch_size
+        self.model_id = "sentence-transformers:" + os.path.basename(os.path.normpath(model_path))
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        if not input:
+            return []
+        vectors = self.model.encode(list(input), batch_size=self.batch_size, normalize_embeddings=True,
+                                    convert_to_numpy=True)
+        return vectors.astype(np.float64).tolist()
+
+
+def create_embedding_backend(backend: Optional[str] = None, ollama_url: Optional[str] = None,
+                             model_path: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Embedding backend named by `backend` or EMBEDDING_BACKEND (default "ollama").
+    Local backends load EMBEDDING_MODEL_PATH (or `model_path`); Ollama uses OLLAMA_URL.
+    """
+    backend = (backend or os.getenv("EMBEDDING_BACKEND") or "ollama").lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+    if backend == "ollama":
+        return OllamaEmbeddingFunction(base_url=ollama_url or os.getenv("OLLAMA_URL", "http://localhost:11434"),
+                                       model_name=DEFAULT_OLLAMA_MODEL)
+
+    model_path = model_path or os.getenv("EMBEDDING_MODEL_PATH")
+    if not model_path:
+        raise ValueError(f"The {backend} embedding backend needs EMBEDDING_MODEL_PATH (a local model)")
+    threads = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+    if backend == "onnx":
+        return OnnxEmbeddingFunction(model_path, threads=threads)
+    return SentenceTransformerEmbeddingFunction(model_path)
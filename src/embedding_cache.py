@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache of query embeddings keyed by (model, normalized query text).
+    Tier 1 is an in-memory LRU; the optional tier 2 is a SQLite file, so repeated
+    questions survive server restarts without another round-trip to Ollama.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_path: Optional[str] = None, max_disk_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.db = None
+        self.disk_writes = 0
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, embedding BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, text))"
+            )
+            self.db.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Queries differing only in Unicode form or whitespace share an entry."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, self.normalize(text))
+        with self.lock:
+            embedding = self.entries.get(key)
+            if embedding is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return embedding
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT embedding FROM query_embeddings WHERE model = ? AND text = ?", key
+                ).fetchone()
+                if row is not None:
+                    embedding = array('d', row[0]).tolist()
+                    self.db.execute(
+                        "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                        (time.time(),) + key
+                    )
+                    self.db.commit()
+                    self._remember(key, embedding)
+                    self.stats["disk_hits"] += 1
+                    return embedding
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        key = (model, self.normalize(text))
+        with self.lock:
+            self._remember(key, list(embedding))
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, text, embedding, last_used) VALUES (?, ?, ?, ?)",
+                    key + (array('d', embedding).tobytes(), time.time())
+                )
+                self.disk_writes += 1
+                if self.disk_writes % 1000 == 0:
+                    self._prune_disk()
+                self.db.commit()
+
+    def get_or_compute(self, model: str, texts: List[str], compute: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Returns embeddings for texts, calling `compute` once for all cache misses."""
+        results, unique_texts = self._lookup(model, texts)
+        if unique_texts:
+            self._fill(model, texts, results, dict(zip(unique_texts, compute(unique_texts))))
+        return results
+
+    async def aget_or_compute(self, model: str, texts: List[str],
+                              compute: Callable[[List[str]], Awaitable[List[List[float]]]]) -> List[List[float]]:
+        """get_or_compute() with an async `compute`, so the event loop isn't held during the embedding call."""
+        results, unique_texts = self._lookup(model, texts)
+        if unique_texts:
+            self._fill(model, texts, results, dict(zip(unique_texts, await compute(unique_texts))))
+        return results
+
+    def _lookup(self, model: str, texts: List[str]):
+        """Cached embeddings (None for misses) and the distinct normalized texts still to compute."""
+        results = [self.get(model, text) for text in texts]
+        # Deduplicate within the request too
+        unique_texts = list(dict.fromkeys(self.normalize(t) for t, embedding in zip(texts, results) if embedding is None))
+        return results, unique_texts
+
+    def _fill(self, model: str, texts: List[str], results: List, computed: Dict[str, List[float]]):
+        for text, embedding in computed.items():
+            self.put(model, text, embedding)
+        for i, embedding in enumerate(results):
+            if embedding is None:
+                results[i] = computed[self.normalize(texts[i])]
+
+    def _remember(self, key, embedding):
+        self.entries[key] = embedding
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _prune_disk(self):
+        self.db.execute(
+            "DELETE FROM query_embeddings WHERE rowid IN ("
+            "SELECT rowid FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
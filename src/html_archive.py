@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+
+class HtmlArchive:
+    """
+    Compressed, content-addressed store of raw HTML written during crawls:
+
+        <root>/objects/ab/<sha256>.gz       one gzip blob per distinct page body
+        <root>/snapshots/<snapshot>.jsonl   header line, then {"url", "sha256"} per page
+        <root>/LATEST                       name of the last completed snapshot
+
+    Identical bodies are stored once across all snapshots. A snapshot becomes visible
+    only after commit(), so an interrupted crawl never replaces the last good one.
+    """
+
+    def __init__(self, root: str, compresslevel: int = 6):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.snapshots_dir = os.path.join(self.root, "snapshots")
+        self.latest_path = os.path.join(self.root, "LATEST")
+        self.compresslevel = compresslevel
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        # Same digest as PageCache.body_hash, so cached validators point at archived bodies
+        return hashlib.sha256(content).hexdigest()
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + ".gz")
+
+    def has(self, sha256: str) -> bool:
+        return os.path.exists(self.object_path(sha256))
+
+    def put(self, content: bytes) -> str:
+        """Stores a page body (once) and returns its SHA-256."""
+        sha256 = self.content_hash(content)
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(content, compresslevel=self.compresslevel, mtime=0))
+            os.replace(tmp_path, path)
+        return sha256
+
+    def get(self, sha256: str) -> bytes:
+        with open(self.object_path(sha256), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def begin_snapshot(self, base_url: str) -> "SnapshotWriter":
+        # UTC timestamp names sort in crawl order
+        name = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + uuid.uuid4().hex[:6]
+        return SnapshotWriter(self, name, base_url)
+
+    def snapshots(self) -> List[str]:
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(self.snapshots_dir) if name.endswith(".jsonl"))
+
+    def latest(self) -> Optional[str]:
+        try:
+            with open(self.latest_path, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def open_snapshot(self, name: Optional[str] = "latest") -> "Snapshot":
+        if name in (None, "latest"):
+            name = self.latest()
+            if name is None:
+                raise FileNotFoundError(f"No completed snapshot in {self.root}")
+        return Snapshot(self, name)
+
+
+class SnapshotWriter:
+    """Records the pages of one crawl. Thread-safe; call commit() when the crawl finished."""
+
+    def __init__(self, archive: HtmlArchive, name: str, base_url: str):
+        self.archive = archive
+        self.name = name
+        self.base_url = base_url
+        self.path = os.path.join(archive.snapshots_dir, name + ".jsonl")
+        self.partial_path = self.path + ".partial"
+        self.lock = threading.Lock()
+        self.pages = 0
+        self.file = open(self.partial_path, "w", encoding="utf-8")
+        self.file.write(json.dumps({"snapshot": name, "base_url": base_url, "created_at": time.time()}) + "\n")
+
+    def record(self, url: str, content: Optional[bytes] = None, sha256: Optional[str] = None) -> str:
+        """Adds a page by body (stored in the archive) or by the hash of an already archived body."""
+        if content is not None:
+            sha256 = self.archive.put(content)
+        elif sha256 is None or not self.archive.has(sha256):
+            raise ValueError(f"No archived body for {url}")
+        with self.lock:
+            self.file.write(json.dumps({"url": url, "sha256": sha256}) + "\n")
+            self.pages += 1
+        return sha256
+
+    def commit(self):
+        """Publishes the snapshot and points LATEST at it."""
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.close()
+            os.replace(self.partial_path, self.path)
+            tmp_path = f"{self.archive.latest_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.name)
+            os.replace(tmp_path, self.archive.latest_path)
+        print(f"Archived {self.pages} pages as snapshot {self.name}.")
+
+    def abort(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                os.remove(self.partial_path)
+
+
+class Snapshot:
+    """Read-only view of a completed snapshot: the raw HTML of every crawled URL."""
+
+    def __init__(self, archive: HtmlArchive, name: str):
+        self.archive = archive
+        self.name = name
+        self.pages: Dict[str, str] = {}
+        with open(os.path.join(archive.snapshots_dir, name + ".jsonl"), "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            for line in f:
+                entry = json.loads(line)
+                self.pages[entry["url"]] = entry["sha256"]
+        self.base_url = header["base_url"]
+        self.created_at = header.get("created_at")
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.pages
+
+    def urls(self) -> Iterator[str]:
+        return iter(self.pages)
+
+    def get(self, url: str) -> bytes:
+        """Raw HTML of `url`; KeyError if it was not part of the crawl."""
+        return self.archive.get(self.pages[url])
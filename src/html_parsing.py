@@ -0,0 +1,196 @@
+"""
+Parsing of JUCE Doxygen pages, kept apart from fetching so it can run in a process pool.
+
+parse_page() is a module-level function (picklable for ProcessPoolExecutor) with
+interchangeable backends that all produce the same {"title", "items"} payload:
+
+- "html.parser": BeautifulSoup with Python's built-in parser (always available)
+- "lxml":        BeautifulSoup on top of the lxml tokenizer (pip install lxml)
+- "selectolax":  direct walk of a Lexbor tree, the fastest (pip install selectolax)
+- "auto":        the fastest one that is installed
+"""
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+BACKENDS = ("selectolax", "lxml", "html.parser")
+
+
+def available_backends() -> List[str]:
+    backends = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    backends.append("html.parser")
+    return backends
+
+
+def resolve_backend(backend: Optional[str] = "auto") -> str:
+    if backend in (None, "auto"):
+        return available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend {backend!r}; expected one of {BACKENDS} or 'auto'")
+    return backend
+
+
+def parse_page(url: str, content: bytes, backend: str = "html.parser") -> Dict:
+    """Parses a documentation page into {"title", "items"} (the cacheable form of a ScrapedDocument)."""
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        return _parse_selectolax(url, content)
+    return _parse_soup(url, BeautifulSoup(content, backend))
+
+
+def _parse_soup(url: str, soup: BeautifulSoup) -> Dict:
+    title_tag = soup.find('title')
+    title = title_tag.get_text().strip() if title_tag else url.split('/')[-1]
+
+    items = []
+
+    # 1. Try to find semantic Member Items (functions, variables)
+    memitems = soup.find_all('div', class_='memitem')
+
+    if memitems:
+        for item in memitems:
+            proto = item.find('div', class_='memproto')
+            doc = item.find('div', class_='memdoc')
+
+            text_parts = []
+            if proto:
+                text_parts.append(proto.get_text(" ", strip=True))
+            if doc:
+                text_parts.append(doc.get_text(" ", strip=True))
+
+            full_text = "\n".join(text_parts)
+
+            # Try to extract a specific name/ID
+            # Often the memitem has an ID anchor just before it or inside.
+            # <a id="a123..."></a><div class="memitem">...
+            # But text extraction is primary here.
+
+            if full_text.strip():
+                items.append({"text": full_text, "metadata": {"type": "method"}})
+
+    # 2. Also capture the Detailed Description (usually at top)
+    textblock = soup.find('div', class_='textblock')
+    if textblock:
+        description_parts = []
+        for element in textblock.children:
+            # Stop if we hit a header indicating members
+            if element.name in ['h2', 'h3'] and ('Documentation' in element.get_text() or 'Member' in element.get_text()):
+                break
+            # Skip div.memitem etc if they are direct children (rare but possible)
+            if element.name == 'div' and 'memitem' in element.get('class', []):
+                continue
+
+            text = element.get_text(" ", strip=True)
+            if text:
+                description_parts.append(text)
+
+        full_desc = "\n".join(description_parts).strip()
+        if full_desc:
+            # Add as the FIRST item
+            items.insert(0, {"text": full_desc, "metadata": {"type": "class_description"}})
+
+    # If no items found (e.g. simple page or main index), fallback to full text
+    if not items:
+        content_div = soup.find('div', class_='contents') or soup.find('div', id='content')
+        text = content_div.get_text(separator='\n', strip=True) if content_div else soup.get_text(separator='\n', strip=True)
+        items.append({"text": text, "metadata": {"type": "overview"}})
+
+    return {"title": title, "items": items}
+
+
+# --- selectolax backend -------------------------------------------------------
+# Mirrors the BeautifulSoup traversal above. BeautifulSoup's get_text() skips
+# comments, and skips script/style/template text unless called on that very tag.
+
+_TEXT = "-text"
+_RAW_TEXT_TAGS = {"script", "style", "template"}
+
+
+def _has_class(node, name: str) -> bool:
+    return name in (node.attributes.get("class") or "").split()
+
+
+def _strings(node):
+    if node.tag == _TEXT:
+        yield node.text_content or ""
+        return
+    skip_raw = node.tag not in _RAW_TEXT_TAGS
+    for child in node.traverse(include_text=True):
+        if child.tag == _TEXT:
+            parent = child.parent
+            if skip_raw and parent is not None and parent.tag in _RAW_TEXT_TAGS:
+                continue
+            yield child.text_content or ""
+
+
+def _get_text(node, separator: str = "", strip: bool = False) -> str:
+    strings = _strings(node)
+    if strip:
+        strings = (s.strip() for s in strings)
+        strings = (s for s in strings if s)
+    return separator.join(strings)
+
+
+def _parse_selectolax(url: str, content: bytes) -> Dict:
+    from selectolax.lexbor import LexborHTMLParser
+
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    tree = LexborHTMLParser(content)
+
+    title_tag = tree.css_first("title")
+    title = _get_text(title_tag).strip() if title_tag else url.split('/')[-1]
+
+    items = []
+    for item in tree.css("div.memitem"):
+        proto = item.css_first("div.memproto")
+        doc = item.css_first("div.memdoc")
+
+        text_parts = []
+        if proto:
+            text_parts.append(_get_text(proto, " ", strip=True))
+        if doc:
+            text_parts.append(_get_text(doc, " ", strip=True))
+
+        full_text = "\n".join(text_parts)
+        if full_text.strip():
+            items.append({"text": full_text, "metadata": {"type": "method"}})
+
+    textblock = tree.css_first("div.textblock")
+    if textblock:
+        description_parts = []
+        for element in textblock.iter(include_text=True):
+            if element.tag == "-comment":
+                continue
+            if element.tag in ("h2", "h3"):
+                heading = _get_text(element)
+                if "Documentation" in heading or "Member" in heading:
+                    break
+            if element.tag == "div" and _has_class(element, "memitem"):
+                continue
+
+            text = _get_text(element, " ", strip=True)
+            if text:
+                description_parts.append(text)
+
+        full_desc = "\n".join(description_parts).strip()
+        if full_desc:
+            items.insert(0, {"text": full_desc, "metadata": {"type": "class_description"}})
+
+    if not items:
+        content_div = tree.css_first("div.contents") or tree.css_first("div#content")
+        root = content_div if content_div else tree.root
+        text = _get_text(root, "\n", strip=True) if root else ""
+        items.append({"text": text, "metadata": {"type": "overview"}})
+
+    return {"title": title, "items": items}
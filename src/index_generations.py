@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+
+def default_index_root() -> str:
+    # data/juce_index relative to PROJECT ROOT (__file__ is src/index_generations.py)
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "data", "juce_index")
+
+
+class IndexGenerations:
+    """
+    Immutable index generations under one root:
+
+        <root>/generations/<generation>/   complete database (Chroma + BM25 + manifest)
+        <root>/CURRENT.json                {"generation": ..., "path": ...} of the live one
+
+    A build writes a new generation directory (seeded with a copy of the live one so
+    the incremental build only embeds what changed), then publish() swaps CURRENT.json
+    with os.replace, which is atomic: readers see either the old or the new generation.
+    """
+
+    MANIFEST = "CURRENT.json"
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.generations_dir = os.path.join(self.root, "generations")
+        self.manifest_path = os.path.join(self.root, self.MANIFEST)
+
+    def current(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        manifest["path"] = os.path.join(self.generations_dir, manifest["generation"])
+        return manifest
+
+    def current_path(self) -> Optional[str]:
+        manifest = self.current()
+        return manifest["path"] if manifest else None
+
+    def prepare(self, seed_path: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Creates the directory for a new generation and returns (generation, path).
+        It starts as a copy of the live generation (or `seed_path` if nothing is live yet).
+        """
+        # UTC timestamp down to the nanosecond: names sort in build order (prune relies on it)
+        now_ns = time.time_ns()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now_ns // 10**9))
+        generation = f"{stamp}.{now_ns % 10**9:09d}-{uuid.uuid4().hex[:6]}"
+        path = os.path.join(self.generations_dir, generation)
+        source = self.current_path() or seed_path
+        if source and os.path.isdir(source):
+            print(f"Seeding generation {generation} from {source}...")
+            shutil.copytree(source, path)
+        else:
+            os.makedirs(path)
+        return generation, path
+
+    def publish(self, generation: str, **info):
+        """Atomically makes `generation` the live one."""
+        os.makedirs(self.root, exist_ok=True)
+        manifest = dict(info, generation=generation, published_at=time.time())
+        tmp_path = f"{self.manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        print(f"Published index generation {generation}.")
+
+    def prune(self, keep: int = 3):
+        """Deletes all but the newest `keep` generations (never the live one)."""
+        if not os.path.isdir(self.generations_dir):
+            return
+        live = (self.current() or {}).get("generation")
+        generations = sorted(os.listdir(self.generations_dir), reverse=True)
+        for generation in generations[keep:]:
+            if generation != live:
+                shutil.rmtree(os.path.join(self.generations_dir, generation), ignore_errors=True)
+
+
+class Snapshot:
+    """One loaded generation plus the number of queries currently using it."""
+
+    def __init__(self, generation: str, store):
+        self.generation = generation
+        self.store = store
+        self.refs = 0
+        self.retired = False
+
+
+class SnapshotManager:
+    """
+    Serves queries from the live index generation and hot-swaps to new ones.
+    A watcher thread polls CURRENT.json. A new generation is loaded in the
+    background and switched in atomically. The previous snapshot stays open
+    until its last in-flight query releases it.
+
+    Without a published generation it serves `fallback_db_path` (the legacy in-place DB).
+    """
+
+    def __init__(self, root: Optional[str] = None, collection_name: str = "juce_docs",
+                 factory: Optional[Callable] = None, poll_interval: float = 2.0,
+                 fallback_db_path: Optional[str] = None):
+        self.generations = IndexGenerations(root or default_index_root())
+        self.collection_name = collection_name
+        self.factory = factory
+        self.poll_interval = poll_interval
+        self.fallback_db_path = fallback_db_path
+        self.current: Optional[Snapshot] = None
+        self.retired = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.watcher = None
+
+    def _target(self) -> Tuple[str, Optional[str]]:
+        manifest = self.generations.current()
+        if manifest:
+            return manifest["generation"], manifest["path"]
+        return "legacy", self.fallback_db_path
+
+    def _load(self, generation: str, db_path: Optional[str]) -> Snapshot:
+        factory = self.factory
+        if factory is None:
+            try:
+                from src.build_rag import VectorStore
+            except ImportError:
+                from build_rag import VectorStore
+            factory = VectorStore
+        print(f"[RAG] Loading index generation {generation}...")
+        return Snapshot(generation, factory(db_path=db_path, collection_name=self.collection_name))
+
+    def start(self):
+        """Loads the live generation synchronously, then starts watching for new ones."""
+        if self.current is None:
+            self.current = self._load(*self._target())
+        if self.watcher is None and self.poll_interval:
+            self.watcher = threading.Thread(target=self._watch, name="index-snapshot-watcher", daemon=True)
+            self.watcher.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.watcher is not None:
+            self.watcher.join()
+            self.watcher = None
+
+    def _watch(self):
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the old generation; retry on the next poll
+                print(f"[RAG] Failed to load new index generation: {e}")
+
+    def refresh(self) -> bool:
+        """Switches to the live generation if it changed. Returns True if a swap happened."""
+        generation, db_path = self._target()
+        if self.current is not None and generation == self.current.generation:
+            return False
+        # Load outside the lock: queries keep using the old snapshot meanwhile
+        snapshot = self._load(generation, db_path)
+        with self.lock:
+            previous, self.current = self.current, snapshot
+            if previous is not None:
+                previous.retired = True
+                if previous.refs == 0:
+                    self._close(previous)
+                else:
+                    self.retired.append(previous)
+        print(f"[RAG] Now serving index generation {generation}.")
+        return True
+
+    @contextmanager
+    def acquire(self):
+        """Pins the current snapshot for the duration of one query and yields its store."""
+        with self.lock:
+            if self.current is None:
+                raise RuntimeError("SnapshotManager.start() has not been called")
+            snapshot = self.current
+            snapshot.refs += 1
+        try:
+            yield snapshot.store
+        finally:
+            with self.lock:
+                snapshot.refs -= 1
+                if snapshot.retired and snapshot.refs == 0 and snapshot in self.retired:
+                    self.retired.remove(snapshot)
+                    self._close(snapshot)
+
+    def _close(self, snapshot: Snapshot):
+        close = getattr(snapshot.store, "close", None)
+        if close:
+            close()
+
+    def status(self) -> Dict:
+        with self.lock:
+            return {
+                "generation": self.current.generation if self.current else None,
+                "in_flight": self.current.refs if self.current else 0,
+                "draining": {s.generation: s.refs for s in self.retired},
+            }
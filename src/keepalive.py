@@ -0,0 +1,206 @@
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# WoL.py lives in the project root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+try:
+    import WoL
+except ImportError:
+    WoL = None
+
+
+class HostKeepAlive:
+    """
+    Keeps the Wake-on-LAN Ollama host awake and its embedding model loaded while the
+    RAG server is in use, so queries don't pay the wake + model-load latency.
+
+    A background thread checks the host's port every `check_interval` seconds and
+    tracks its state ("unknown", "up", "asleep", "waking"). Wake packets go out ahead
+    of predicted use: at start(), when touch() reports the first query after an idle
+    period, and when the host is found asleep while still in use. While the server was
+    used within the last `keep_warm_seconds`, a tiny embed every `keepalive_interval`
+    seconds keeps the model loaded (Ollama unloads idle models after 5 minutes by
+    default); after that the host is left alone to sleep.
+
+    status() reports the state and the cold-start latency measured on the last wake
+    (wake packet -> first embedding) and the last model load (first embedding once up).
+    """
+
+    def __init__(self, host: str, port: int, embed: Callable[[List[str]], object],
+                 wake: Optional[Callable[[], object]] = None, keepalive_interval: float = 240.0,
+                 keep_warm_seconds: float = 1800.0, check_interval: float = 30.0, wake_timeout: float = 120.0,
+                 connect_timeout: float = 0.5):
+        self.host = host
+        self.port = port
+        self.embed = embed
+        self.wake = wake
+        self.keepalive_interval = keepalive_interval
+        self.keep_warm_seconds = keep_warm_seconds
+        self.check_interval = check_interval
+        self.wake_timeout = wake_timeout
+        self.connect_timeout = connect_timeout
+
+        self.state = "unknown"
+        self.model_loaded = False
+        self.last_used = None       # monotonic time of the last touch()
+        self.last_embed = None      # monotonic time of the last successful embed
+        self.cold_start_seconds = None
+        self.model_load_seconds = None
+        self.stats = {"checks": 0, "wakes": 0, "keepalives": 0, "failures": 0}
+        self.lock = threading.Lock()
+        self.prewarm_requested = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self, prewarm: bool = True) -> "HostKeepAlive":
+        """Starts the background thread; by default pre-warms right away (server start predicts use)."""
+        if prewarm:
+            self.touch()
+            self.prewarm_requested.set()
+        self.thread = threading.Thread(target=self._run, name="ollama-keepalive", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.prewarm_requested.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def touch(self):
+        """Records a query. The first one after an idle period pre-warms the host in the background."""
+        now = time.monotonic()
+        with self.lock:
+            idle = self.last_used is None or now - self.last_used > self.keep_warm_seconds
+            self.last_used = now
+        if idle or self.state != "up" or not self.model_loaded:
+            self.prewarm_requested.set()
+
+    def in_use(self) -> bool:
+        return self.last_used is not None and time.monotonic() - self.last_used <= self.keep_warm_seconds
+
+    def check_host(self) -> bool:
+        self.stats["checks"] += 1
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.connect_timeout):
+                up = True
+        except OSError:
+            up = False
+        if not up:
+            self.model_loaded = False
+            if self.state != "waking":
+                self.state = "asleep"
+        else:
+            self.state = "up"
+        return up
+
+    def prewarm(self) -> bool:
+        """Wakes the host if needed and loads the model. Returns True once an embedding succeeded."""
+        woke_at = None
+        if not self.check_host():
+            if not self.wake:
+                return False
+            print(f"[RAG] Ollama host {self.host}:{self.port} is asleep; waking it ahead of use...")
+            self.state = "waking"
+            woke_at = time.monotonic()
+            try:
+                self.wake()
+            except Exception as e:
+                print(f"[RAG] Wake-on-LAN failed: {e}")
+                self.state = "asleep"
+                return False
+            self.stats["wakes"] += 1
+            while not self.check_host():
+                if time.monotonic() - woke_at > self.wake_timeout or self.stop_event.wait(self.connect_timeout):
+                    self.state = "asleep"
+                    return False
+        if not self.model_loaded:
+            load_start = time.monotonic()
+            if not self.send_embed():
+                return False
+            done = time.monotonic()
+            self.model_load_seconds = done - load_start
+            if woke_at is not None:
+                self.cold_start_seconds = done - woke_at
+                print(f"[RAG] Ollama host warm after a {self.cold_start_seconds:.1f}s cold start "
+                      f"(model load {self.model_load_seconds:.1f}s).")
+        return True
+
+    def send_embed(self) -> bool:
+        try:
+            self.embed(["keep-alive"])
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.model_loaded = False
+            print(f"[RAG] Keep-alive embedding failed: {e}")
+            return False
+        self.model_loaded = True
+        self.last_embed = time.monotonic()
+        return True
+
+    def tick(self):
+        """One scheduler step: track the host, re-wake it if it slept while in use, keep the model loaded."""
+        if self.prewarm_requested.is_set():
+            self.prewarm_requested.clear()
+            self.prewarm()
+            return
+        if not self.in_use():
+            self.check_host()  # Only track the state: an unused host may sleep
+            return
+        if not self.check_host() or not self.model_loaded:
+            self.prewarm()
+        elif time.monotonic() - self.last_embed >= self.keepalive_interval:
+            if self.send_embed():
+                self.stats["keepalives"] += 1
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[RAG] Keep-alive check failed: {e}")
+            # Sleep until the next check, a keep-alive due sooner, or a pre-warm request
+            interval = self.check_interval
+            if self.model_loaded and self.in_use():
+                interval = min(interval, max(0.0, self.last_embed + self.keepalive_interval - time.monotonic()))
+            self.prewarm_requested.wait(interval)
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "host": f"{self.host}:{self.port}",
+            "state": self.state,
+            "model_loaded": self.model_loaded,
+            "in_use": self.in_use(),
+            "idle_seconds": None if self.last_used is None else now - self.last_used,
+            "cold_start_seconds": self.cold_start_seconds,
+            "model_load_seconds": self.model_load_seconds,
+            **self.stats
+        }
+
+
+def create_keepalive(embedding_fn, embed: Optional[Callable[[List[str]], object]] = None) -> Optional[HostKeepAlive]:
+    """
+    A HostKeepAlive for `embedding_fn`'s Ollama host, or None for backends that need no
+    waking (in-process models). Keep-alive embeddings go through `embed` (default: the
+    backend itself, without the query timeout, as a cold model load can take a while).
+    Wake packets are only sent if WoL.py is configured (WOL_MAC / WOL_BROADCAST_ADDR).
+    Intervals come from JUCE_KEEPALIVE_SECONDS (240), JUCE_KEEP_WARM_SECONDS (1800)
+    and JUCE_HOST_CHECK_SECONDS (30).
+    """
+    if not embedding_fn.needs_wake:
+        return None
+    url = getattr(embedding_fn, "base_url", None) or os.getenv("OLLAMA_URL", "http://localhost:11434")
+    from urllib.parse import urlparse
+    parsed = urlparse(url)
+    wake = WoL.wake_device if WoL and not WoL.missing_config() else None
+    return HostKeepAlive(
+        parsed.hostname or "localhost", parsed.port or 11434, embed=embed or embedding_fn, wake=wake,
+        keepalive_interval=float(os.getenv("JUCE_KEEPALIVE_SECONDS", "240")),
+        keep_warm_seconds=float(os.getenv("JUCE_KEEP_WARM_SECONDS", "1800")),
+        check_interval=float(os.getenv("JUCE_HOST_CHECK_SECONDS", "30"))
+    )
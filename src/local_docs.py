@@ -0,0 +1,103 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import Iterator, Optional
+from urllib.parse import unquote, urldefrag
+
+DEFAULT_BASE_URL = "https://docs.juce.com/master/"
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz", ".zip")
+
+
+class LocalDocs:
+    """
+    Page source backed by a local Doxygen HTML output directory or an archive of one
+    (.tar[.gz|.bz2|.xz], .tgz, .zip). Pages are addressed by their docs.juce.com URL
+    (`base_url` + relative path), so chunk IDs and result URLs match an HTTP crawl.
+
+    Archives are unpacked once into a temporary directory (sequential reads are far
+    cheaper than random access into a compressed tarball); close() removes it.
+    Like an archived Snapshot, it can be passed to JuceScraper(source=...).
+    """
+
+    def __init__(self, path: str, base_url: str = DEFAULT_BASE_URL):
+        self.path = os.path.abspath(path)
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.tmp_dir = None
+
+        if os.path.isdir(self.path):
+            top = self.path
+        elif self.path.lower().endswith(ARCHIVE_SUFFIXES):
+            self.tmp_dir = tempfile.mkdtemp(prefix="juce-docs-")
+            self._extract(self.tmp_dir)
+            top = self.tmp_dir
+        else:
+            raise ValueError(f"{path} is neither a directory nor a supported archive {ARCHIVE_SUFFIXES}")
+        self.root = self._find_html_root(top)
+
+    def _extract(self, target: str):
+        print(f"Extracting {self.path}...")
+        if self.path.lower().endswith(".zip"):
+            with zipfile.ZipFile(self.path) as zf:
+                # ZipFile.extract sanitizes absolute and ".." member paths
+                for name in zf.namelist():
+                    if name.lower().endswith(".html"):
+                        zf.extract(name, target)
+            return
+        with tarfile.open(self.path) as tf:
+            members = (m for m in tf if m.isfile() and m.name.lower().endswith(".html"))
+            # The "data" filter rejects absolute paths, ".." and links outside the target
+            tf.extractall(target, members=members, filter="data")
+
+    @staticmethod
+    def _find_html_root(top: str) -> str:
+        """Doxygen writes into <OUTPUT_DIRECTORY>/html/; find the directory holding classes.html."""
+        if os.path.exists(os.path.join(top, "classes.html")):
+            return top
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames.sort()
+            if "classes.html" in filenames:
+                return dirpath
+        return top
+
+    def _file_path(self, url: str) -> Optional[str]:
+        url, _ = urldefrag(url)
+        if not url.startswith(self.base_url):
+            return None
+        relative = unquote(url[len(self.base_url):])
+        path = os.path.normpath(os.path.join(self.root, relative))
+        if os.path.commonpath([path, self.root]) != self.root:
+            return None  # Outside the docs tree
+        return path
+
+    def __contains__(self, url: str) -> bool:
+        path = self._file_path(url)
+        return path is not None and os.path.isfile(path)
+
+    def get(self, url: str) -> bytes:
+        """Raw HTML of `url`; KeyError if the page is not in the local tree."""
+        path = self._file_path(url)
+        if path is None or not os.path.isfile(path):
+            raise KeyError(url)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def urls(self) -> Iterator[str]:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith(".html"):
+                    relative = os.path.relpath(os.path.join(dirpath, name), self.root)
+                    yield self.base_url + relative.replace(os.sep, "/")
+
+    def close(self):
+        if self.tmp_dir:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            self.tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+
+class PageCache:
+    """
+    On-disk cache of documentation pages keyed by URL.
+    Each entry stores the HTTP validators (ETag / Last-Modified), the SHA-256 of the
+    raw body and the *parsed* payload, so an unchanged page costs one conditional
+    request and no parsing. Entries written by a different parser version are ignored.
+    """
+
+    def __init__(self, cache_dir: str, parser_version: str = "1"):
+        self.cache_dir = cache_dir
+        self.parser_version = parser_version
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.stats = {"not_modified": 0, "unchanged": 0, "fetched": 0}
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[Dict]:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or entry.get("parser_version") != self.parser_version:
+            return None
+        return entry
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body_hash: str, data: Dict):
+        entry = {
+            "url": url,
+            "parser_version": self.parser_version,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": body_hash,
+            "data": data
+        }
+        path = self._path(url)
+        # Write-then-rename so concurrent crawl workers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def body_hash(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def record(self, outcome: str):
+        with self.lock:
+            self.stats[outcome] += 1
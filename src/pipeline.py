@@ -0,0 +1,229 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline stage: `workers` threads take items from a bounded input queue and
+    call `fn(item)`, which returns an iterable of outputs (or None for a sink).
+    Outputs go to the next stage's queue; a full queue blocks the producer (backpressure).
+    `flush()`, if given, runs once after the last item, e.g. to emit a partial batch.
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, queue_size: int = 16,
+                 flush: Optional[Callable[[], Iterable]] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.flush = flush
+        self.input = queue.Queue(maxsize=max(1, queue_size))
+        self.lock = threading.Lock()
+        self.stats = {"items_in": 0, "items_out": 0, "busy_seconds": 0.0,
+                      "queue_size": self.input.maxsize, "max_queue_depth": 0, "depth_total": 0}
+        self.running = 0
+
+    def record(self, depth: int, busy: float, outputs: int):
+        with self.lock:
+            self.stats["items_in"] += 1
+            self.stats["items_out"] += outputs
+            self.stats["busy_seconds"] += busy
+            self.stats["depth_total"] += depth
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], depth)
+
+
+class Batcher:
+    """Groups single items into lists of `size` for a downstream stage (use with workers=1)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.items = []
+
+    def add(self, item) -> List[List]:
+        self.items.append(item)
+        if len(self.items) < self.size:
+            return []
+        batch, self.items = self.items, []
+        return [batch]
+
+    def flush(self) -> List[List]:
+        batch, self.items = self.items, []
+        return [batch] if batch else []
+
+
+class Pipeline:
+    """
+    Runs `source` (any iterator, e.g. JuceScraper.crawl) through a chain of Stages,
+    each on its own threads with bounded queues in between, so network, CPU and
+    embedding work overlap and total time approaches that of the slowest stage.
+    """
+
+    def __init__(self, source: Iterable, stages: List[Stage], source_name: str = "source",
+                 progress_interval: Optional[float] = None):
+        self.source = source
+        self.stages = stages
+        self.source_name = source_name
+        self.progress_interval = progress_interval
+        self.source_stats = {"items_out": 0, "blocked_seconds": 0.0}
+        self.abort = threading.Event()
+        self.errors = []
+        self.elapsed = 0.0
+
+    def _put(self, stage: Stage, item) -> bool:
+        # Blocking put that gives up once another thread has failed
+        while not self.abort.is_set():
+            try:
+                stage.input.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage: Stage):
+        while not self.abort.is_set():
+            try:
+                return stage.input.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _emit(self, index: int, outputs) -> int:
+        """Hands outputs of stage `index` to the next stage; returns how many there were."""
+        if outputs is None:
+            return 0
+        count = 0
+        for out in outputs:
+            count += 1
+            if index + 1 < len(self.stages) and not self._put(self.stages[index + 1], out):
+                break
+        return count
+
+    def _fail(self, error: BaseException):
+        self.errors.append(error)
+        self.abort.set()
+
+    def _finish(self, index: int):
+        # Forward end-of-stream once per downstream worker
+        if index + 1 < len(self.stages):
+            downstream = self.stages[index + 1]
+            for _ in range(downstream.workers):
+                self._put(downstream, _DONE)
+
+    def _run_source(self):
+        first = self.stages[0]
+        try:
+            iterator = iter(self.source)
+            while not self.abort.is_set():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                start = time.perf_counter()
+                if not self._put(first, item):
+                    break
+                self.source_stats["blocked_seconds"] += time.perf_counter() - start
+                self.source_stats["items_out"] += 1
+            if self.abort.is_set():
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()  # Aborted: stop the crawl's outstanding work
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(first.workers):
+                self._put(first, _DONE)
+
+    def _run_worker(self, index: int):
+        stage = self.stages[index]
+        try:
+            while True:
+                depth = stage.input.qsize()
+                item = self._get(stage)
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                outputs = stage.fn(item)
+                # Materialize here so busy time covers lazy outputs, not downstream waits
+                outputs = list(outputs) if outputs is not None else None
+                busy = time.perf_counter() - start
+                stage.record(depth, busy, self._emit(index, outputs))
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            with stage.lock:
+                stage.running -= 1
+                last = stage.running == 0
+            if last:
+                try:
+                    if stage.flush and not self.abort.is_set():
+                        flushed = self._emit(index, stage.flush())
+                        with stage.lock:
+                            stage.stats["items_out"] += flushed
+                except BaseException as e:
+                    self._fail(e)
+                self._finish(index)
+
+    def _print_progress(self, done: threading.Event):
+        while not done.wait(self.progress_interval):
+            depths = ", ".join(f"{s.name}={s.input.qsize()}/{s.input.maxsize}" for s in self.stages)
+            print(f"[Pipeline] {self.source_stats['items_out']} from {self.source_name}; queues: {depths}")
+
+    def run(self) -> Dict[str, Dict]:
+        """Runs until the source is exhausted and every stage has drained. Re-raises the first error."""
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._run_source, name=f"pipeline-{self.source_name}", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            stage.running = stage.workers
+            threads += [threading.Thread(target=self._run_worker, args=(index,), name=f"pipeline-{stage.name}-{i}", daemon=True)
+                        for i in range(stage.workers)]
+
+        done = threading.Event()
+        if self.progress_interval:
+            threading.Thread(target=self._print_progress, args=(done,), daemon=True).start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        done.set()
+        self.elapsed = time.perf_counter() - start
+
+        if self.errors:
+            raise self.errors[0]
+        return self.report()
+
+    def report(self) -> Dict[str, Dict]:
+        """Per-stage throughput (items/s), utilization of its workers and queue depth."""
+        elapsed = self.elapsed or 1e-9
+        report = {self.source_name: {
+            "items_out": self.source_stats["items_out"],
+            "throughput": self.source_stats["items_out"] / elapsed,
+            "blocked_seconds": self.source_stats["blocked_seconds"],
+        }}
+        for stage in self.stages:
+            stats = stage.stats
+            report[stage.name] = {
+                "workers": stage.workers,
+                "items_in": stats["items_in"],
+                "items_out": stats["items_out"],
+                "throughput": stats["items_in"] / elapsed,
+                "utilization": stats["busy_seconds"] / (elapsed * stage.workers),
+                "queue_size": stats["queue_size"],
+                "max_queue_depth": stats["max_queue_depth"],
+                "avg_queue_depth": stats["depth_total"] / stats["items_in"] if stats["items_in"] else 0.0,
+            }
+        return report
+
+    def print_report(self):
+        print(f"Pipeline finished in {self.elapsed:.1f}s:")
+        for name, stats in self.report().items():
+            if "workers" not in stats:
+                print(f"  {name:<8} {stats['items_out']:>7} items  {stats['throughput']:8.1f}/s  "
+                      f"blocked {stats['blocked_seconds']:.1f}s on downstream")
+                continue
+            print(f"  {name:<8} {stats['items_in']:>7} items  {stats['throughput']:8.1f}/s  "
+                  f"x{stats['workers']} busy {stats['utilization']:.0%}  "
+                  f"queue avg {stats['avg_queue_depth']:.1f} / max {stats['max_queue_depth']} of {stats['queue_size']}")
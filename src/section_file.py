@@ -0,0 +1,101 @@
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Shared binary layout of the BM25 index and the doc store (little-endian):
+#   header: a format-specific struct whose trailing fields are (offset, length) in
+#           bytes for each section, in the format's section order.
+#   Sections are 8-byte aligned raw arrays, so a reader maps them with np.frombuffer
+#   over an mmap and never deserializes anything.
+ALIGNMENT = 8
+
+
+class BlobStrings(Sequence):
+    """Read-only list of strings backed by an offsets array and a UTF-8 byte blob."""
+
+    def __init__(self, offsets: np.ndarray, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def pack(cls, strings: List[str]) -> Tuple[np.ndarray, bytes]:
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return offsets, b"".join(encoded)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _bytes(self, i: int) -> bytes:
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._bytes(i).decode("utf-8")
+
+    def find(self, s: str) -> Optional[int]:
+        """Binary search; only valid when the strings are sorted (UTF-8 byte order == code point order)."""
+        target = s.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._bytes(lo) == target:
+            return lo
+        return None
+
+
+def write_sections(path: str, header: struct.Struct, fields: tuple, sections, arrays: Dict[str, np.ndarray]):
+    """
+    Writes `header` (packed from `fields` followed by the section table) and the
+    `sections` arrays atomically: readers holding the old mapping are unaffected.
+    """
+    table = []
+    payload = []
+    position = header.size
+    for name, dtype in sections:
+        data = np.ascontiguousarray(arrays[name], dtype=dtype).tobytes()
+        padding = (-position) % ALIGNMENT
+        payload.append(b"\0" * padding)
+        position += padding
+        table.extend([position, len(data)])
+        payload.append(data)
+        position += len(data)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.pack(*fields, *table))
+        for chunk in payload:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def map_file(path: str, min_size: int, kind: str) -> mmap.mmap:
+    """Read-only mapping of `path`; ValueError if it is shorter than `min_size` bytes."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < min_size:
+            raise ValueError(f"Truncated {kind}: {path}")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_sections(buffer, sections, table: Sequence[int], path: str, kind: str) -> Dict[str, np.ndarray]:
+    """Zero-copy views of the `sections` listed in a header's (offset, length) `table`."""
+    arrays = {}
+    for i, (name, dtype) in enumerate(sections):
+        offset, length = table[2 * i], table[2 * i + 1]
+        if offset + length > len(buffer):
+            raise ValueError(f"Truncated {kind}: {path}")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+    return arrays
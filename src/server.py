@@ -1,24 +1,67 @@
 from mcp.server.fastmcp import FastMCP
+import json
 import sys
 import os
+from typing import Optional
 
 # Import your existing VectorStore logic
 # We assume build_rag.py is in the same directory or properly referenced
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from build_rag import VectorStore 
+from build_rag import VectorStore, default_db_path
+from index_generations import SnapshotManager, default_index_root
+from keepalive import create_keepalive
 
-# Initialize Store once
-store = VectorStore()
+def load_store(db_path, collection_name):
+    # Loading doesn't block on waking the Ollama host: the keep-alive below does that
+    return VectorStore(db_path=db_path, collection_name=collection_name, wake_host=False)
+
+# Serve the live index generation; a watcher hot-swaps to new ones published by build_rag.py
+snapshots = SnapshotManager(
+    root=os.getenv("JUCE_INDEX_ROOT", default_index_root()),
+    poll_interval=float(os.getenv("JUCE_INDEX_POLL_SECONDS", "2")),
+    factory=load_store,
+    fallback_db_path=default_db_path()
+).start()
+
+def keepalive_embed(texts):
+    # Through whichever store is live, so keep-alives follow generation swaps
+    with snapshots.acquire() as store:
+        return store.embedding_fn(texts)
+
+# Server start predicts queries: wake the Ollama host now and keep its model loaded while
+# the server is in use (None for in-process embedding backends)
+with snapshots.acquire() as store:
+    embedding_host = create_keepalive(store.embedding_fn, embed=keepalive_embed)
+if embedding_host:
+    embedding_host.start()
 mcp = FastMCP("juce-data-library")
 
 @mcp.tool()
-def search_juce_docs(query: str) -> str:
+async def search_juce_docs(query: str, version: Optional[str] = None, doc_type: Optional[str] = None,
+                           class_name: Optional[str] = None, url_prefix: Optional[str] = None) -> str:
     """
     Retrieves raw text chunks from the local JUCE documentation database.
     Does NOT interpret. Just returns data.
+    `version` limits results to one JUCE docs version (e.g. "7.0.12"); default: all indexed versions.
+    `doc_type` ("method", "class_description", "overview"), `class_name` (e.g. "Slider") and
+    `url_prefix` narrow the search to matching chunks.
     """
-    results = store.hybrid_query(query)
-    
+    filters = {key: value for key, value in
+               (("type", doc_type), ("class", class_name), ("url_prefix", url_prefix)) if value}
+    if embedding_host:
+        embedding_host.touch()
+    # Pin the snapshot so a swap mid-query can't close it underneath us. The async query
+    # never blocks the event loop, so concurrent sessions don't queue behind each other
+    with snapshots.acquire() as store:
+        results = await store.ahybrid_query(query, version=version, filters=filters)
+    return format_results(results)
+
+@mcp.resource("juce://embedding-host")
+def embedding_host_status() -> str:
+    """State of the Ollama embedding host (up/asleep/waking, model loaded) and the measured cold-start latency."""
+    return json.dumps(embedding_host.status() if embedding_host else {"state": "local backend"})
+
+def format_results(results) -> str:
     if not results or not results.get('documents') or not results['documents'][0]:
         return "No relevant documentation found."
         
@@ -35,6 +78,10 @@ def search_juce_docs(query: str) -> str:
             f"Content:\n{doc_text}\n"
         )
         output.append(snippet)
+
+    legs = (results.get('legs') or [None])[0] or {}
+    if legs.get('vector') in ("timeout", "error", "circuit_open"):
+        output.append("Note: semantic search was unavailable; these are keyword matches only.")
         
     return "\n".join(output)
 
@@ -0,0 +1,131 @@
+import bisect
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Qualified member in a memproto line: "void juce::Slider::setRange ( double ..." -> "Slider::setRange"
+MEMBER_RE = re.compile(r"juce::((?:\w+\s*::\s*)+(?:operator\s*[^\s(]+|~?\w+))")
+# A query that is nothing but a (possibly qualified) identifier, optionally with "()"
+IDENTIFIER_RE = re.compile(r"^(?:juce::)?[A-Za-z_]\w*(?:::(?:~?[A-Za-z_]\w*|operator\S+))*(?:\(\))?$")
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Lookup key: no juce:: prefix, no call parens, no spaces around ::, case-folded."""
+    symbol = re.sub(r"\s*::\s*", "::", symbol.strip())
+    if symbol.startswith("juce::"):
+        symbol = symbol[len("juce::"):]
+    if symbol.endswith("()"):
+        symbol = symbol[:-2]
+    return symbol.lower()
+
+
+def member_symbol(text: str) -> Optional[str]:
+    """Qualified member name declared by a method chunk (its first line is the memproto)."""
+    first_line = text.split("\n", 1)[0]
+    for match in MEMBER_RE.finditer(first_line):
+        # The first juce::Class::member is the declared name; later ones are parameter types
+        return re.sub(r"\s*::\s*", "::", match.group(1))
+    return None
+
+
+def looks_like_symbol(query: str) -> bool:
+    return bool(IDENTIFIER_RE.match(query.strip()))
+
+
+class SymbolIndex:
+    """
+    Exact-name lookup for juce:: classes and members, built next to the BM25 index.
+
+    `symbols` maps a normalized qualified name ("slider", "slider::setrange",
+    "slider::listener") to BM25 document numbers (chunk IDs via the BM25 mapping), so
+    version/type masks apply directly. Class entries list the class description first.
+    `members` maps a bare member name ("setrange") to the documents of every class
+    declaring it; such a name is ambiguous, so it only boosts ranking (see members_named).
+    Keys are kept sorted, so prefix lookups are a bisect over the keys.
+    """
+
+    def __init__(self, symbols: Dict[str, Tuple[str, List[int]]], members: Dict[str, List[int]], corpus_size: int):
+        self.symbols = symbols
+        self.members = members
+        self.corpus_size = corpus_size
+        self.keys = sorted(symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @classmethod
+    def build(cls, doc_symbols: Sequence[Tuple[Optional[str], Optional[str], bool]]) -> "SymbolIndex":
+        """
+        `doc_symbols` has one (class name, member name, is class description) entry per
+        BM25 document, in document order; either name may be None.
+        """
+        descriptions: Dict[str, List[int]] = {}
+        others: Dict[str, List[int]] = {}
+        names: Dict[str, str] = {}
+        members: Dict[str, List[int]] = {}
+        for doc, (class_name, member, is_description) in enumerate(doc_symbols):
+            if class_name:
+                key = normalize_symbol(class_name)
+                names.setdefault(key, class_name)
+                (descriptions if is_description else others).setdefault(key, []).append(doc)
+            if member:
+                key = normalize_symbol(member)
+                names.setdefault(key, member)
+                others.setdefault(key, []).append(doc)
+                members.setdefault(key.rsplit("::", 1)[-1], []).append(doc)
+
+        symbols = {}
+        for key, name in names.items():
+            docs = descriptions.get(key, []) + others.get(key, [])
+            symbols[key] = (name, list(dict.fromkeys(docs)))  # Dedupe, keep order
+        return cls(symbols, members, len(doc_symbols))
+
+    def lookup(self, query: str) -> List[int]:
+        """Documents of the exactly named class or qualified member ("Slider", "Slider::setRange")."""
+        entry = self.symbols.get(normalize_symbol(query))
+        return entry[1] if entry else []
+
+    def members_named(self, query: str) -> List[int]:
+        """Documents of members of any class with this bare name ("setRange"), unless it names a class."""
+        key = normalize_symbol(query)
+        if "::" in key or key in self.symbols:
+            return []
+        return self.members.get(key, [])
+
+    def name(self, query: str) -> Optional[str]:
+        """Symbol name as spelled in the docs, if `query` names a symbol exactly."""
+        entry = self.symbols.get(normalize_symbol(query))
+        return entry[0] if entry else None
+
+    def prefix(self, query: str, limit: int = 20) -> List[str]:
+        """Symbol names starting with `query` (completion-style), in key order."""
+        key = normalize_symbol(query)
+        start = bisect.bisect_left(self.keys, key)
+        result = []
+        for k in self.keys[start:]:
+            if not k.startswith(key) or len(result) >= limit:
+                break
+            result.append(self.symbols[k][0])
+        return result
+
+    def save(self, path: str):
+        data = {
+            "version": 1,
+            "corpus_size": self.corpus_size,
+            "symbols": [[key, name, docs] for key, (name, docs) in sorted(self.symbols.items())],
+            "members": sorted(self.members.items()),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> "SymbolIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != 1:
+            raise ValueError(f"Unsupported symbol index version in {path}")
+        symbols = {key: (name, docs) for key, name, docs in data["symbols"]}
+        return cls(symbols, dict((key, docs) for key, docs in data["members"]), data["corpus_size"])
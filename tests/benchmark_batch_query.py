@@ -0,0 +1,120 @@
+"""
+Throughput benchmark for hybrid_query_batch against per-query hybrid_query.
+
+    python tests/benchmark_batch_query.py [--queries 1000] [--chunks 2000] [--latency-ms 5] [--top-k 5]
+
+Builds a synthetic collection in a temporary directory, embedded by a local stub of
+the Ollama API that adds `--latency-ms` per request (a LAN Ollama round trip), then
+runs the same distinct queries through both paths with a cold query cache. The batch
+path makes one embedding request, one Chroma query and one Chroma get for the whole
+set; the sequential path pays all of them per query.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.build_rag import VectorStore
+
+
+def fake_embedding(text, dim=64):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(dim).tolist()
+
+
+def start_stub_ollama(latency):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if self.path == "/api/embed":
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                payload = {"embeddings": [fake_embedding(t) for t in texts]}
+            else:
+                payload = {"embedding": fake_embedding(body["prompt"])}
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def synthetic_chunks(n, vocab_size=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for i in range(n):
+        words = " ".join(f"w{t}" for t in (rng.zipf(1.3, size=rng.integers(8, 40)) - 1) % vocab_size)
+        chunks.append({
+            "id": f"chunk{i}",
+            "text": words,
+            "metadata": {"url": f"http://docs.test/page{i // 20}.html", "title": f"Page {i // 20}",
+                         "type": "method", "chunk_index": i % 20},
+        })
+    return chunks
+
+
+def synthetic_queries(n, vocab_size=3000, seed=1):
+    rng = np.random.default_rng(seed)
+    return [" ".join(f"w{t}" for t in (rng.zipf(1.3, size=3) - 1) % vocab_size) + f" q{i}" for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    server = start_stub_ollama(args.latency_ms / 1000)
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    queries = synthetic_queries(args.queries)
+
+    with tempfile.TemporaryDirectory() as db_path:
+        store = VectorStore(db_path=db_path, collection_name="benchmark", persist_query_cache=False)
+        store.add_documents(synthetic_chunks(args.chunks))
+        store.build_and_save_bm25()
+
+        def fresh_store():
+            return VectorStore(db_path=db_path, collection_name="benchmark", persist_query_cache=False)
+
+        sequential_store = fresh_store()
+        start = time.perf_counter()
+        sequential = [sequential_store.hybrid_query(q, top_k=args.top_k) for q in queries]
+        t_sequential = time.perf_counter() - start
+
+        batch_store = fresh_store()
+        start = time.perf_counter()
+        batch = batch_store.hybrid_query_batch(queries, top_k=args.top_k)
+        t_batch = time.perf_counter() - start
+
+        assert batch == sequential, "batch results differ from per-query results"
+
+    server.shutdown()
+    print(f"\n{args.queries} queries over {args.chunks} chunks, {args.latency_ms:g} ms per embedding request")
+    print(f"{'Path':<12} | {'total (s)':>9} | {'queries/s':>9}")
+    print("-" * 36)
+    print(f"{'sequential':<12} | {t_sequential:>9.2f} | {args.queries / t_sequential:>9.0f}")
+    print(f"{'batch':<12} | {t_batch:>9.2f} | {args.queries / t_batch:>9.0f}")
+    print(f"Speedup: {t_sequential / t_batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Microbenchmark for the BM25 stage of hybrid_query: per-query cost of top-k
+selection over synthetic corpora of 10k, 100k and 1M chunks.
+
+    python tests/benchmark_bm25_topk.py [--sizes 10000 100000 1000000] [--top-k 5]
+
+Compares:
+  * full sort   - dense scores + sorted(range(n)) (what hybrid_query used to do)
+  * heap        - postings-only scoring + heapq.nlargest
+  * argpartition - postings-only scoring + InvertedBM25Index.select_top_k (current)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import heapq
+import time
+
+import numpy as np
+
+from src.bm25_index import InvertedBM25Index
+
+
+def synthetic_index(n_docs, vocab_size=50_000, seed=0, k1=1.5, b=0.75, epsilon=0.25):
+    """Builds CSR arrays directly with NumPy (Zipf term distribution, 5-55 tokens per chunk)."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(5, 56, size=n_docs)
+    docs = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+    terms = (rng.zipf(1.15, size=len(docs)) - 1) % vocab_size
+
+    keys, tfs = np.unique(terms * n_docs + docs, return_counts=True)  # sorted by (term, doc)
+    postings_terms = keys // n_docs
+    postings_docs = (keys % n_docs).astype(np.int32)
+
+    df = np.bincount(postings_terms, minlength=vocab_size)
+    term_offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(df, out=term_offsets[1:])
+
+    idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+    idf[idf < 0] = epsilon * idf.mean()
+    doc_norms = k1 * (1 - b + b * lengths / lengths.mean())
+
+    vocabulary = [f"t{i}" for i in range(vocab_size)]
+    return InvertedBM25Index(vocabulary, term_offsets, postings_docs, tfs.astype(np.int32), idf, doc_norms,
+                             doc_ids=[], k1=k1, b=b), df
+
+
+def pick_queries(df):
+    """Queries mixing a very common, a mid-frequency and a rare term."""
+    order = np.argsort(-df)
+    present = order[df[order] > 0]
+    common, mid, rare = present[3], present[len(present) // 50], present[len(present) // 2]
+    return [
+        [f"t{common}"],
+        [f"t{mid}", f"t{rare}"],
+        [f"t{common}", f"t{mid}", f"t{rare}"],
+    ]
+
+
+def time_per_query(fn, queries, min_seconds=0.5, max_reps=200):
+    reps = 0
+    start = time.perf_counter()
+    while reps < max_reps:
+        for q in queries:
+            fn(q)
+        reps += 1
+        if time.perf_counter() - start > min_seconds:
+            break
+    return (time.perf_counter() - start) / (reps * len(queries)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    k = args.top_k
+
+    print(f"{'Chunks':>10} | {'full sort (ms)':>14} | {'heap (ms)':>10} | {'argpartition (ms)':>17} | {'speedup':>8}")
+    print("-" * 72)
+    for n in args.sizes:
+        index, df = synthetic_index(n)
+        queries = pick_queries(df)
+
+        def full_sort(q):
+            scores = index.get_scores(q)
+            return sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+
+        def heap(q):
+            matched, scores = index.score_matches(q)
+            return heapq.nlargest(k, range(len(matched)), key=scores.__getitem__)
+
+        def argpartition(q):
+            return index.top_k(q, k)
+
+        for q in queries:
+            expected = [d for d in full_sort(q) if index.get_scores(q)[d] > 0]
+            assert [d for d, _ in argpartition(q)] == expected[:len(argpartition(q))]
+
+        t_sort = time_per_query(full_sort, queries, max_reps=3 if n >= 1_000_000 else 50)
+        t_heap = time_per_query(heap, queries)
+        t_part = time_per_query(argpartition, queries)
+        print(f"{n:>10} | {t_sort:>14.2f} | {t_heap:>10.3f} | {t_part:>17.3f} | {t_sort / t_part:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
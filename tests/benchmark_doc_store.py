@@ -0,0 +1,77 @@
+"""
+Latency benchmark for materializing hybrid_query results: local doc store vs the
+collection.get round trip it replaced.
+
+    python tests/benchmark_doc_store.py [--chunks 20000] [--queries 200] [--top-k 5]
+
+Builds a synthetic collection in a temporary directory (stub embedding server, no
+latency), warms the query embedding cache, then times per query:
+  * fetch  - fetch_records() for the fused top-k IDs alone
+  * query  - a whole hybrid_query
+with the doc store loaded and with it switched off (every result read from Chroma).
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import tempfile
+import time
+
+from benchmark_batch_query import start_stub_ollama, synthetic_chunks, synthetic_queries
+from src.build_rag import VectorStore
+
+
+def ms_per_call(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    server = start_stub_ollama(0.0)
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    queries = synthetic_queries(args.queries)
+
+    with tempfile.TemporaryDirectory() as db_path:
+        builder = VectorStore(db_path=db_path, collection_name="benchmark", persist_query_cache=False)
+        chunks = synthetic_chunks(args.chunks)
+        for i in range(0, len(chunks), 1000):
+            builder.add_documents(chunks[i:i + 1000])
+        builder.build_and_save_bm25()
+
+        store = VectorStore(db_path=db_path, collection_name="benchmark", persist_query_cache=False)
+        store.embed_queries(queries)  # Warm the query cache: measure retrieval, not embedding
+        result_ids = [(store.hybrid_query(q, top_k=args.top_k)["ids"][0],) for q in queries]
+        doc_store = store.doc_store
+
+        timings = {}
+        for label, loaded in (("doc store", doc_store), ("chroma get", None)):
+            store.doc_store = loaded
+            ms_per_call(store.fetch_records, result_ids[:10])  # Warm-up
+            timings[label] = (ms_per_call(store.fetch_records, result_ids),
+                              ms_per_call(lambda q: store.hybrid_query(q, top_k=args.top_k), [(q,) for q in queries]))
+
+        from_chroma = [store.fetch_records(ids) for ids, in result_ids[:20]]
+        store.doc_store = doc_store
+        assert [store.fetch_records(ids) for ids, in result_ids[:20]] == from_chroma
+
+    server.shutdown()
+    print(f"\n{args.queries} queries over {args.chunks} chunks, top {args.top_k}")
+    print(f"{'Materialize':<12} | {'fetch (ms)':>10} | {'hybrid_query (ms)':>17}")
+    print("-" * 46)
+    for label, (fetch, query) in timings.items():
+        print(f"{label:<12} | {fetch:>10.3f} | {query:>17.3f}")
+    saving = timings["chroma get"][1] - timings["doc store"][1]
+    print(f"Saving per query: {saving:.3f} ms ({timings['chroma get'][0] / timings['doc store'][0]:.0f}x faster fetch)")
+
+
+if __name__ == "__main__":
+    main()
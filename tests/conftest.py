@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# Add project root to path so tests can import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def http_server():
+    """
+    Starts local HTTP fixture servers on ephemeral ports.
+    Call with a BaseHTTPRequestHandler subclass; returns the base URL (with trailing slash).
+    """
+    servers = []
+
+    def start(handler_cls):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fake_embedding(text, dim=16):
+    """Deterministic bag-of-words hashing vector, so similar texts get similar embeddings."""
+    import hashlib
+    import math
+    import re
+    vec = [0.0] * dim
+    for token in re.findall(r'\w+', text.lower()):
+        vec[int(hashlib.md5(token.encode()).hexdigest(), 16) % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+@pytest.fixture(name="fake_embedding")
+def fake_embedding_fixture():
+    """The stub Ollama server's embedding function, to compare returned vectors against."""
+    return fake_embedding
+
+
+@pytest.fixture
+def ollama_server(http_server, monkeypatch):
+    """
+    Local stub of the Ollama embeddings API. Points OLLAMA_URL at it and returns
+    the handler class, whose `prompts` list records every text that was embedded.
+    Set `batch_supported = False` to mimic an Ollama without /api/embed, and
+    `delay` to slow every request down.
+    """
+    import json
+    import time
+    from http.server import BaseHTTPRequestHandler
+
+    class OllamaHandler(BaseHTTPRequestHandler):
+        prompts = []
+        requests_seen = []
+        batch_supported = True
+        delay = 0.0
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            cls = OllamaHandler
+            with cls.lock:
+                cls.requests_seen.append((self.path, body))
+                cls.in_flight += 1
+                cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            try:
+                time.sleep(cls.delay)
+            finally:
+                with cls.lock:
+                    cls.in_flight -= 1
+
+            if self.path == "/api/embeddings":
+                cls.prompts.append(body["prompt"])
+                # Like Ollama's legacy endpoint: not L2-normalized
+                payload = {"embedding": [3.0 * v for v in fake_embedding(body["prompt"])]}
+            elif self.path == "/api/embed" and cls.batch_supported:
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                cls.prompts.extend(texts)
+                payload = {"model": body["model"], "embeddings": [fake_embedding(t) for t in texts]}
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    url = http_server(OllamaHandler).rstrip("/")
+    monkeypatch.setenv("OLLAMA_URL", url)
+    OllamaHandler.url = url
+    return OllamaHandler
@@ -95,14 +95,16 @@ def run_benchmark():
     results_table = []
     
     print("\n[PHASE 2] Running Evaluation Queries...")
+
+    # Hybrid results for the whole set in one batch (one embedding request, one Chroma query)
+    hybrid_results = store.hybrid_query_batch([query for query, _, _ in test_cases], top_k=5)
     
-    for query, expected, q_type in test_cases:
+    for (query, expected, q_type), hyb_res in zip(test_cases, hybrid_results):
         # Run Vector Only
         vec_res = store.query(query, n_results=5)
         vec_titles = [m['title'] for m in vec_res['metadatas'][0]]
         
-        # Run Hybrid
-        hyb_res = store.hybrid_query(query, top_k=5)
+        # Hybrid
         hyb_titles = [m['title'] for m in hyb_res['metadatas'][0]]
         
         # Check Ranks (1-based index of first match)
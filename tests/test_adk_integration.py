@@ -24,13 +24,13 @@ class TestAdkIntegration:
         else:
             pytest.skip("Cannot access underlying tool function for direct testing.")
 
-        with mock.patch("src.adk_tools.get_store") as mock_get_store:
+        with mock.patch("src.adk_tools.acquire_store") as mock_acquire_store:
             mock_store = mock.Mock()
             mock_store.hybrid_query.return_value = {
                 'documents': [['Sample Content']], 
                 'metadatas': [[{'title': 'Sample', 'url': 'http://sample'}]]
             }
-            mock_get_store.return_value = mock_store
+            mock_acquire_store.return_value.__enter__.return_value = mock_store
             
             result = tool_func("test query")
             
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from src.build_rag import JuceProcessor, OllamaEmbeddingFunction, ScrapedDocument, ScrapedItem, VectorStore
+from src.embedding_cache import QueryEmbeddingCache
+
+DOCS = [
+    ScrapedDocument(url="https://docs.juce.com/master/classjuce_1_1Slider.html",
+                    title="JUCE: juce::Slider Class Reference", items=[
+        ScrapedItem(text="A slider control for changing a value.", metadata={"type": "class_description"}),
+        ScrapedItem(text="void juce::Slider::setRange ( double newMinimum , double newMaximum )\nSets the limits.",
+                    metadata={"type": "method"}),
+    ], version="master"),
+    ScrapedDocument(url="https://docs.juce.com/master/classjuce_1_1AudioBuffer.html",
+                    title="JUCE: juce::AudioBuffer Class Reference", items=[
+        ScrapedItem(text="A multi-channel buffer containing floating point audio samples.",
+                    metadata={"type": "class_description"}),
+        ScrapedItem(text="void juce::AudioBuffer::clear ( )\nClears all the samples in all channels.",
+                    metadata={"type": "method"}),
+    ], version="master"),
+]
+
+
+@pytest.fixture
+def make_store(ollama_server, tmp_path):
+    builder = VectorStore(db_path=str(tmp_path), collection_name="async_test", persist_query_cache=False)
+    processor = JuceProcessor()
+    for doc in DOCS:
+        builder.add_documents(processor.chunk_document(doc))
+    builder.build_and_save_bm25()
+
+    def make(**kwargs):
+        return VectorStore(db_path=str(tmp_path), collection_name="async_test", persist_query_cache=False, **kwargs)
+    return make
+
+
+class TestAsyncHybridQuery:
+
+    def test_matches_sync_results(self, make_store):
+        queries = ["how do I set the slider range", "clear the samples", "Slider", "zzz"]
+        sync_results = [make_store().hybrid_query(q, top_k=3, version="master") for q in queries]
+
+        async def run():
+            store = make_store()
+            return [await store.ahybrid_query(q, top_k=3, version="master") for q in queries]
+
+        assert asyncio.run(run()) == sync_results
+
+    def test_concurrent_queries_share_the_loop(self, make_store, ollama_server):
+        store = make_store(vector_timeout=10)
+        ollama_server.delay = 0.3
+        queries = [f"audio samples question {i}" for i in range(10)]
+
+        async def run():
+            return await asyncio.gather(*(store.ahybrid_query(q, top_k=2) for q in queries))
+
+        start = time.monotonic()
+        results = asyncio.run(run())
+
+        assert time.monotonic() - start < 1.5  # Sequentially this is >= 3 s of Ollama time
+        assert ollama_server.max_in_flight > 1
+        assert all(r["legs"] == [{"bm25": "ok", "vector": "ok"}] for r in results)
+
+    def test_slow_vector_leg_degrades_to_bm25(self, make_store, ollama_server):
+        store = make_store(vector_timeout=0.2)
+        ollama_server.delay = 1.0
+
+        start = time.monotonic()
+        results = asyncio.run(store.ahybrid_query("clear the samples", top_k=2))
+
+        assert time.monotonic() - start < 0.8
+        assert results["legs"] == [{"bm25": "ok", "vector": "timeout"}]
+        assert results["ids"][0]
+
+
+class TestAsyncEmbedding:
+
+    def test_batches_and_falls_back_like_sync(self, ollama_server):
+        import os
+        fn = OllamaEmbeddingFunction(base_url=os.environ["OLLAMA_URL"], model_name="m", batch_size=2)
+        embeddings = asyncio.run(fn.aembed_query(["a", "b", "c"]))
+        assert embeddings == fn(["a", "b", "c"])
+        assert [path for path, _ in ollama_server.requests_seen[:2]] == ["/api/embed", "/api/embed"]
+
+        ollama_server.batch_supported = False
+        fallback = OllamaEmbeddingFunction(base_url=os.environ["OLLAMA_URL"], model_name="m")
+        assert asyncio.run(fallback.aembed_query(["a", "b"])) == embeddings[:2]
+        assert fallback.batch_supported is False
+
+    def test_async_cache_computes_misses_once(self):
+        cache = QueryEmbeddingCache()
+        cache.put("m", "cached", [0.0])
+        calls = []
+
+        async def compute(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        result = asyncio.run(cache.aget_or_compute("m", ["cached", "new one", "new  one"], compute))
+        assert calls == [["new one"]]
+        assert result == [[0.0], [7.0], [7.0]]
+
+    def test_one_async_client_closed_with_the_store(self, make_store):
+        store = make_store()
+
+        async def run():
+            await store.ahybrid_query("clear the samples", top_k=2)
+            client = store.embedding_fn.async_client
+            store.close()
+            await asyncio.sleep(0.05)
+            return client
+
+        assert asyncio.run(run()).is_closed
+        assert store.embedding_fn.async_client is None
+
+    def test_new_event_loop_replaces_the_client(self, ollama_server):
+        import os
+        fn = OllamaEmbeddingFunction(base_url=os.environ["OLLAMA_URL"], model_name="m")
+        asyncio.run(fn.aembed_query(["a"]))
+        first = fn.async_client
+        asyncio.run(fn.aembed_query(["b"]))
+        assert first.is_closed
+        assert fn.async_client is not first and not fn.async_client.is_closed
+        fn.close()
+        assert fn.async_client is None
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from src.bm25_index import InvertedBM25Index
+from src.build_rag import JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore
+
+BASE = "https://docs.juce.com/master/"
+
+DOCS = [
+    ScrapedDocument(url=BASE + "classjuce_1_1Slider.html", title="JUCE: juce::Slider Class Reference", items=[
+        ScrapedItem(text="A slider control for changing a value.", metadata={"type": "class_description"}),
+        ScrapedItem(text="void juce::Slider::setRange ( double newMinimum , double newMaximum )\nSets the limits.",
+                    metadata={"type": "method"}),
+        ScrapedItem(text="double juce::Slider::getValue ( ) const\nReturns the slider's current value.",
+                    metadata={"type": "method"}),
+    ], version="master"),
+    ScrapedDocument(url=BASE + "classjuce_1_1AudioBuffer.html", title="JUCE: juce::AudioBuffer Class Reference", items=[
+        ScrapedItem(text="A multi-channel buffer containing floating point audio samples.",
+                    metadata={"type": "class_description"}),
+        ScrapedItem(text="void juce::AudioBuffer::clear ( )\nClears all the samples in all channels.",
+                    metadata={"type": "method"}),
+    ], version="master"),
+]
+
+QUERIES = ["how do I set the slider range", "clear the audio samples", "Slider", "juce::Slider::setRange",
+           "buffer value", "nothing matches zzz"]
+
+
+@pytest.fixture
+def store(ollama_server, tmp_path):
+    store = VectorStore(db_path=str(tmp_path), collection_name="batch_test", persist_query_cache=False)
+    processor = JuceProcessor()
+    for doc in DOCS:
+        store.add_documents(processor.chunk_document(doc))
+    store.build_and_save_bm25()
+    return VectorStore(db_path=str(tmp_path), collection_name="batch_test", persist_query_cache=False)
+
+
+def count_calls(monkeypatch, collection, name):
+    calls = []
+    original = getattr(collection, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(kwargs)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(collection, name, wrapper)
+    return calls
+
+
+class TestHybridQueryBatch:
+
+    def test_matches_single_queries(self, store):
+        expected = [store.hybrid_query(q, top_k=3) for q in QUERIES]
+        assert store.hybrid_query_batch(QUERIES, top_k=3) == expected
+
+    def test_filters_and_version(self, store):
+        filters = {"type": "method"}
+        expected = [store.hybrid_query(q, top_k=2, filters=filters, version="master") for q in QUERIES]
+        assert store.hybrid_query_batch(QUERIES, top_k=2, filters=filters, version="master") == expected
+        assert store.hybrid_query_batch(QUERIES[:2], filters={"class": "Synthesiser"}) == [
+            {'ids': [[]], 'metadatas': [[]], 'documents': [[]], 'scores': [[]], 'bm25_scores': [[]],
+             'bm25_threshold': [None], 'symbol': [None], 'legs': [None]}] * 2
+
+    def test_one_round_trip_per_stage(self, store, ollama_server, monkeypatch):
+        queries = ["how do I set the slider range", "clear the audio samples", "Slider", "buffer value"]
+        requests_before = len(ollama_server.requests_seen)
+        queries_made = count_calls(monkeypatch, store.collection, "query")
+        gets_made = count_calls(monkeypatch, store.collection, "get")
+
+        results = store.hybrid_query_batch(queries, top_k=3)
+
+        # The symbol query needs no embedding; the other three share one request
+        new_requests = ollama_server.requests_seen[requests_before:]
+        assert [body["input"] for _, body in new_requests] == [
+            ["how do I set the slider range", "clear the audio samples", "buffer value"]]
+        assert len(queries_made) == 1
+        assert len(queries_made[0]["query_embeddings"]) == 3
+        assert gets_made == []  # Documents come from the doc store
+        assert results[2]["symbol"] == ["Slider"]
+        assert all(r["ids"][0] for r in results)
+
+    def test_empty_batch(self, store):
+        assert store.hybrid_query_batch([]) == []
+
+
+class TestBM25TopKBatch:
+
+    def test_matches_top_k(self):
+        rng = np.random.default_rng(3)
+        vocab = [f"t{i}" for i in range(40)]
+        corpus = [list(rng.choice(vocab, size=rng.integers(1, 12))) for _ in range(300)]
+        index = InvertedBM25Index.build(corpus)
+        queries = [list(rng.choice(vocab, size=3)) for _ in range(25)] + [[], ["unknown"]]
+        mask = rng.random(300) < 0.5
+
+        for kwargs in ({}, {"min_score": 2.0}, {"doc_mask": mask}):
+            batch = index.top_k_batch(queries, 7, **kwargs)
+            assert batch == [index.top_k(q, 7, **kwargs) for q in queries]
@@ -0,0 +1,188 @@
+import pickle
+import random
+import re
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from src.bm25_index import BlobStrings, InvertedBM25Index
+from src.build_rag import JuceProcessor, VectorStore, ScrapedDocument, ScrapedItem
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def reference_top_k(bm25, query, k):
+    """The ranking hybrid_query used with rank_bm25, restricted to matching documents."""
+    scores = bm25.get_scores(query)
+    matching = [i for i in range(len(scores)) if any(t in bm25.doc_freqs[i] for t in query)]
+    return sorted(matching, key=lambda i: scores[i], reverse=True)[:k]
+
+
+# Mirrors tests/test_rag.py test_E: exact class vs. longer class name, plus filler
+EXACT_MATCH_CORPUS = [
+    "The juce::Slider class is a component...",
+    "The juce::SliderAttachment class connects a slider to...",
+] + [f"This is unrelated content {i}" for i in range(10)]
+
+
+def synthetic_corpus(n_docs=400, seed=7):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(300)] + ["juce", "slider", "audio", "buffer"]
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]  # Zipf-ish, so some terms get negative IDF
+    return [rng.choices(vocab, weights=weights, k=rng.randint(0, 40)) for _ in range(n_docs)]
+
+
+class TestInvertedBM25Parity:
+
+    @pytest.mark.parametrize("query", ["Slider", "juce::Slider", "slider attachment", "unrelated content 3", "nothing"])
+    def test_exact_match_corpus(self, query):
+        corpus = [tokenize(t) for t in EXACT_MATCH_CORPUS]
+        reference = BM25Okapi(corpus)
+        index = InvertedBM25Index.build(corpus)
+        tokens = tokenize(query)
+
+        np.testing.assert_allclose(index.get_scores(tokens), reference.get_scores(tokens), rtol=1e-12, atol=1e-12)
+        assert [doc for doc, _ in index.top_k(tokens, 5)] == reference_top_k(reference, tokens, 5)
+
+    def test_slider_ranks_above_slider_attachment(self):
+        index = InvertedBM25Index.build([tokenize(t) for t in EXACT_MATCH_CORPUS])
+        assert [doc for doc, _ in index.top_k(["slider"], 2)] == [0, 1]
+
+    def test_synthetic_corpus(self):
+        corpus = synthetic_corpus()
+        reference = BM25Okapi(corpus)
+        index = InvertedBM25Index.build(corpus)
+        rng = random.Random(3)
+
+        for _ in range(50):
+            query = rng.sample(corpus[rng.randrange(len(corpus))] or ["juce"], k=1) + ["term1", "slider", "missing"]
+            np.testing.assert_allclose(index.get_scores(query), reference.get_scores(query), rtol=1e-12, atol=1e-12)
+            assert [doc for doc, _ in index.top_k(query, 10)] == reference_top_k(reference, query, 10)
+
+    def test_repeated_query_terms_count_twice(self):
+        corpus = synthetic_corpus(50)
+        reference = BM25Okapi(corpus)
+        index = InvertedBM25Index.build(corpus)
+        np.testing.assert_allclose(index.get_scores(["juce", "juce"]), reference.get_scores(["juce", "juce"]))
+
+    def test_save_and_open(self, tmp_path):
+        corpus = synthetic_corpus(100)
+        index = InvertedBM25Index.build(corpus, doc_ids=[f"chunk-{i}" for i in range(len(corpus))])
+        path = str(tmp_path / "bm25_index.bin")
+        index.save(path)
+
+        opened = InvertedBM25Index.open(path)
+
+        assert list(opened.vocabulary) == index.vocabulary
+        assert list(opened.doc_ids) == index.doc_ids
+        assert opened.doc_ids[-1] == "chunk-99"
+        for query in (["term3", "buffer"], ["juce", "juce", "missing"], ["zzz"]):
+            assert opened.top_k(query, 10) == index.top_k(query, 10)
+
+    def test_open_maps_instead_of_deserializing(self, tmp_path):
+        path = str(tmp_path / "bm25_index.bin")
+        InvertedBM25Index.build(synthetic_corpus(100)).save(path)
+
+        opened = InvertedBM25Index.open(path)
+
+        assert isinstance(opened.vocabulary, BlobStrings)
+        assert opened.term_ids is None
+        for array in (opened.postings_docs, opened.postings_tfs, opened.idf, opened.doc_norms):
+            assert not array.flags.owndata
+            assert not array.flags.writeable
+
+    def test_vocabulary_binary_search(self):
+        offsets, blob = BlobStrings.pack(sorted(["juce", "slider", "audio", "zeta", "älpha"]))
+        strings = BlobStrings(offsets, np.frombuffer(blob, dtype=np.uint8))
+
+        for i, term in enumerate(strings):
+            assert strings.find(term) == i
+        assert strings.find("sliders") is None
+        assert strings.find("") is None
+
+    def test_rejects_corrupt_files(self, tmp_path):
+        path = tmp_path / "bm25_index.bin"
+        InvertedBM25Index.build(synthetic_corpus(20)).save(str(path))
+        data = path.read_bytes()
+
+        path.write_bytes(data[:len(data) // 2])
+        with pytest.raises(ValueError):
+            InvertedBM25Index.open(str(path))
+
+        path.write_bytes(b"NOTBM25!" + data[8:])
+        with pytest.raises(ValueError):
+            InvertedBM25Index.open(str(path))
+
+    def test_select_top_k_breaks_ties_by_doc_id(self):
+        docs = np.arange(10, dtype=np.int32)
+        scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0, 2.0, 0.5, 3.0, 2.0, 1.0])
+
+        for k in range(1, 12):
+            top_docs, top_scores = InvertedBM25Index.select_top_k(docs, scores, k)
+            expected = sorted(range(10), key=lambda i: scores[i], reverse=True)[:k]
+            assert top_docs.tolist() == expected
+            assert top_scores.tolist() == [scores[i] for i in expected]
+
+    def test_min_score_threshold(self):
+        index = InvertedBM25Index.build([tokenize(t) for t in EXACT_MATCH_CORPUS])
+        all_hits = index.top_k(["slider", "attachment"], 5)
+        threshold = all_hits[0][1]
+
+        assert index.top_k(["slider", "attachment"], 5, min_score=threshold) == all_hits[:1]
+
+    def test_empty_corpus(self):
+        index = InvertedBM25Index.build([])
+        assert index.top_k(["slider"], 5) == []
+        assert len(index.get_scores(["slider"])) == 0
+
+
+class TestVectorStoreBM25:
+
+    def test_exact_match_ranking_through_store(self, ollama_server, tmp_path):
+        store = VectorStore(db_path=str(tmp_path), collection_name="bm25_test")
+        processor = JuceProcessor()
+        titles = ["JUCE: juce::Slider Class Reference", "JUCE: juce::SliderAttachment Class Reference"] + \
+                 [f"Filler {i}" for i in range(10)]
+        for i, (title, text) in enumerate(zip(titles, EXACT_MATCH_CORPUS)):
+            doc = ScrapedDocument(url=f"url_{i}", title=title, items=[ScrapedItem(text=text, metadata={"type": "class_description"})])
+            store.add_documents(processor.chunk_document(doc))
+        store.build_and_save_bm25()
+
+        reopened = VectorStore(db_path=str(tmp_path), collection_name="bm25_test")
+        results = reopened.hybrid_query("Slider", top_k=5)
+
+        found = [m['title'] for m in results['metadatas'][0]]
+        assert found.index("JUCE: juce::Slider Class Reference") < found.index("JUCE: juce::SliderAttachment Class Reference")
+
+        bm25_scores = [s for s in results['bm25_scores'][0] if s is not None]
+        assert len(bm25_scores) == 2
+        assert results['bm25_threshold'][0] == min(bm25_scores)
+        assert results['scores'][0] == sorted(results['scores'][0], reverse=True)
+
+        strict = reopened.hybrid_query("Slider", top_k=5, min_bm25_score=max(bm25_scores))
+        assert [s for s in strict['bm25_scores'][0] if s is not None] == [max(bm25_scores)]
+
+    def test_legacy_pickle_is_not_loaded(self, ollama_server, tmp_path):
+        corpus = [tokenize(t) for t in EXACT_MATCH_CORPUS]
+        with open(tmp_path / "bm25_index.pkl", "wb") as f:
+            pickle.dump(BM25Okapi(corpus), f)
+
+        store = VectorStore(db_path=str(tmp_path), collection_name="bm25_test")
+
+        assert store.bm25 is None
+
+    def test_build_replaces_legacy_files(self, ollama_server, tmp_path):
+        for name in ("bm25_index.pkl", "bm25_mapping.pkl"):
+            (tmp_path / name).write_bytes(b"legacy")
+        store = VectorStore(db_path=str(tmp_path), collection_name="bm25_test")
+        doc = ScrapedDocument(url="u", title="T", items=[ScrapedItem(text="juce::Slider", metadata={})])
+        store.add_documents(JuceProcessor().chunk_document(doc))
+        store.build_and_save_bm25()
+
+        assert not (tmp_path / "bm25_index.pkl").exists()
+        assert not (tmp_path / "bm25_mapping.pkl").exists()
+        assert (tmp_path / "bm25_index.bin").exists()
+        assert list(VectorStore(db_path=str(tmp_path), collection_name="bm25_test").bm25_mapping) == list(store.bm25_mapping)
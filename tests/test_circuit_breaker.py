@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import pytest
+
+from src.build_rag import JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+DOC = ScrapedDocument(
+    url="https://docs.juce.com/master/classjuce_1_1AudioBuffer.html",
+    title="JUCE: juce::AudioBuffer Class Reference",
+    items=[ScrapedItem(text="A multi-channel buffer containing floating point audio samples.",
+                       metadata={"type": "class_description"}),
+           ScrapedItem(text="void juce::AudioBuffer::clear ( )\nClears all the samples in all channels.",
+                       metadata={"type": "method"})],
+    version="master"
+)
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def failing():
+    raise ConnectionError("connection refused")
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(probe=failing, failure_threshold=3, probe_interval=60)
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(failing)
+        assert breaker.state == "open"
+
+        calls = []
+        with pytest.raises(CircuitOpenError):
+            breaker.call(calls.append, "x")
+        assert calls == []  # Fails fast without touching the backend
+        assert breaker.stats["rejected"] == 1
+        breaker.stop()
+
+    def test_success_resets_the_count(self):
+        breaker = CircuitBreaker(probe=failing, failure_threshold=2, probe_interval=60)
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+        assert breaker.call(lambda: "ok") == "ok"
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+        assert breaker.state == "closed"
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker(probe=failing, failure_threshold=2, slow_call_seconds=0.01, probe_interval=60)
+        for _ in range(2):
+            assert breaker.call(time.sleep, 0.03) is None  # The slow result is still returned
+        assert breaker.state == "open"
+        breaker.stop()
+
+    def test_probe_closes_the_circuit(self):
+        healthy = []
+
+        def probe():
+            if not healthy:
+                raise ConnectionError("still down")
+
+        breaker = CircuitBreaker(probe=probe, failure_threshold=1, probe_interval=0.02)
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+        assert wait_until(lambda: breaker.stats["probes"] >= 3)
+        assert breaker.state == "open"  # Failed probes keep it open
+
+        healthy.append(True)
+        assert wait_until(lambda: breaker.state == "closed")
+        assert breaker.call(lambda: "ok") == "ok"
+
+    def test_async_call(self):
+        breaker = CircuitBreaker(probe=failing, failure_threshold=1, probe_interval=60)
+
+        async def afailing():
+            failing()
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(breaker.acall(afailing))
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(breaker.acall(afailing))
+        breaker.stop()
+
+
+class TestLexicalOnlyMode:
+
+    @pytest.fixture
+    def store(self, ollama_server, tmp_path, monkeypatch):
+        monkeypatch.setenv("JUCE_BREAKER_FAILURES", "2")
+        monkeypatch.setenv("JUCE_BREAKER_PROBE_SECONDS", "0.05")
+        builder = VectorStore(db_path=str(tmp_path), collection_name="breaker_test", persist_query_cache=False)
+        builder.add_documents(JuceProcessor().chunk_document(DOC))
+        builder.build_and_save_bm25()
+        store = VectorStore(db_path=str(tmp_path), collection_name="breaker_test", persist_query_cache=False)
+        yield store
+        store.close()
+
+    def test_outage_degrades_to_bm25_and_recovers(self, store, monkeypatch):
+        store.hybrid_query("cached samples question", top_k=2)  # Cache one embedding while healthy
+        embed_query = store.embedding_fn.embed_query
+        calls = []
+
+        def down(texts):
+            calls.append(texts)
+            raise ConnectionError("embedding host down")
+
+        monkeypatch.setattr(store.embedding_fn, "embed_query", down)
+        for i in range(2):
+            assert store.hybrid_query(f"clear samples {i}", top_k=2)["legs"] == [{"bm25": "ok", "vector": "error"}]
+        assert store.embedding_breaker.state == "open"
+
+        calls.clear()
+        results = store.hybrid_query("clear the samples", top_k=2)
+        assert results["legs"] == [{"bm25": "ok", "vector": "circuit_open"}]
+        assert results["ids"][0]  # Keyword results
+        batch = store.hybrid_query_batch(["clear the samples", "audio buffer"], top_k=2)
+        assert [r["legs"] for r in batch] == [[{"bm25": "ok", "vector": "circuit_open"}]] * 2
+        asyncio.run(store.ahybrid_query("floating point audio", top_k=2))
+        # Only the background probe reached the backend
+        assert all(texts == ["ping"] for texts in calls)
+
+        # Cached embeddings still get the vector leg
+        assert store.hybrid_query("cached samples question", top_k=2)["legs"] == [{"bm25": "ok", "vector": "ok"}]
+
+        monkeypatch.setattr(store.embedding_fn, "embed_query", embed_query)
+        assert wait_until(lambda: store.embedding_breaker.state == "closed")
+        assert store.hybrid_query("clear the samples", top_k=2)["legs"] == [{"bm25": "ok", "vector": "ok"}]
+
+    def test_hung_host_opens_the_circuit(self, store, ollama_server):
+        store.vector_timeout = 0.2
+        store.embedding_fn.query_timeout = 0.2
+        ollama_server.delay = 3.0
+        seen = len(ollama_server.requests_seen)
+
+        def query_requests():
+            # Requests made by queries, not by the background probe
+            return sum(body["input"] != ["ping"] for _, body in ollama_server.requests_seen[seen:])
+
+        for i in range(2):
+            results = store.hybrid_query(f"clear samples {i}", top_k=2)
+            assert results["legs"] == [{"bm25": "ok", "vector": "timeout"}]
+        assert store.embedding_breaker.state == "open"
+        assert store.embedding_breaker.stats["failures"] == 2  # Each hung call counted once
+        assert query_requests() == 2
+
+        start = time.monotonic()
+        for i in range(4):
+            results = asyncio.run(store.ahybrid_query(f"audio buffer {i}", top_k=2))
+            assert results["legs"] == [{"bm25": "ok", "vector": "circuit_open"}]
+        assert time.monotonic() - start < 0.2  # No query waits out the leg timeout
+        time.sleep(0.3)  # Let the abandoned requests time out
+        assert store.embedding_breaker.stats["failures"] == 2
+        assert query_requests() == 2
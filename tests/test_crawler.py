@@ -0,0 +1,155 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from src.build_rag import JuceScraper
+from src.crawl import TokenBucket, HostRateLimiter
+
+NUM_CLASSES = 12
+
+
+def class_page(name):
+    return f"""<html><head><title>JUCE: juce::{name} Class Reference</title></head><body>
+<div class="contents"><div class="textblock"><p>The {name} class does things.</p></div>
+<div class="memitem"><div class="memproto">void {name}::run ()</div>
+<div class="memdoc"><p>Runs the {name}.</p></div></div></div></body></html>"""
+
+
+def make_handler(delays=None, failures=None):
+    """Fake docs.juce.com: a classes.html index plus one page per class."""
+    delays = delays or {}
+    failures = dict(failures or {})
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        hits = {}
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.lstrip("/")
+            with lock:
+                Handler.hits[path] = Handler.hits.get(path, 0) + 1
+                fail = failures.get(path, 0)
+                if fail:
+                    failures[path] = fail - 1
+            if fail:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+            time.sleep(delays.get(path, 0))
+
+            if path == "classes.html":
+                links = "".join(f'<a href="classjuce_1_1Widget{i}.html">Widget{i}</a>' for i in range(NUM_CLASSES))
+                body = f"<html><body><div class='contents'>{links}</div></body></html>"
+            elif path.startswith("classjuce_1_1Widget"):
+                body = class_page(path[len("classjuce_1_1"):-len(".html")])
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+class TestConcurrentCrawl:
+
+    def test_concurrent_crawl_yields_every_page(self, http_server):
+        base_url = http_server(make_handler())
+        scraper = JuceScraper(base_url=base_url, concurrency=4, requests_per_second=None)
+
+        docs = list(scraper.crawl())
+
+        assert len(docs) == NUM_CLASSES
+        assert {d.title for d in docs} == {f"JUCE: juce::Widget{i} Class Reference" for i in range(NUM_CLASSES)}
+        assert all(d.items[0].metadata["type"] == "class_description" for d in docs)
+
+    def test_concurrent_crawl_matches_sequential(self, http_server):
+        base_url = http_server(make_handler())
+        sequential = JuceScraper(base_url=base_url, requests_per_second=None)
+        concurrent = JuceScraper(base_url=base_url, concurrency=6, requests_per_second=None)
+
+        seq_docs = {d.url: [i.text for i in d.items] for d in sequential.crawl()}
+        con_docs = {d.url: [i.text for i in d.items] for d in concurrent.crawl()}
+
+        assert seq_docs == con_docs
+
+    def test_streams_before_crawl_finishes(self, http_server):
+        # One page is very slow; the fast ones must be yielded before it completes.
+        handler = make_handler(delays={"classjuce_1_1Widget0.html": 1.5})
+        base_url = http_server(handler)
+        scraper = JuceScraper(base_url=base_url, concurrency=4, requests_per_second=None)
+
+        start = time.monotonic()
+        stream = scraper.crawl()
+        first = next(stream)
+        assert time.monotonic() - start < 1.0
+        assert "Widget0" not in first.url
+
+        remaining = list(stream)
+        assert len(remaining) == NUM_CLASSES - 1
+
+    def test_retries_transient_errors(self, http_server):
+        handler = make_handler(failures={"classjuce_1_1Widget3.html": 2})
+        base_url = http_server(handler)
+        scraper = JuceScraper(base_url=base_url, concurrency=3, requests_per_second=None, backoff=0.01)
+
+        docs = list(scraper.crawl())
+
+        assert len(docs) == NUM_CLASSES
+        assert handler.hits["classjuce_1_1Widget3.html"] == 3
+
+    def test_gives_up_after_max_retries(self, http_server):
+        handler = make_handler(failures={"classjuce_1_1Widget5.html": 10})
+        base_url = http_server(handler)
+        scraper = JuceScraper(base_url=base_url, concurrency=3, requests_per_second=None,
+                              max_retries=1, backoff=0.01)
+
+        docs = list(scraper.crawl())
+
+        assert len(docs) == NUM_CLASSES - 1
+        assert handler.hits["classjuce_1_1Widget5.html"] == 2
+
+
+class TestRateLimiting:
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # First token is free, the remaining 5 need 1/20s each
+        assert time.monotonic() - start >= 0.2
+
+    def test_limiter_is_per_host(self):
+        limiter = HostRateLimiter(requests_per_second=5, burst=1)
+        start = time.monotonic()
+        limiter.acquire("http://a.example/x")
+        limiter.acquire("http://b.example/x")
+        limiter.acquire("http://c.example/x")
+        assert time.monotonic() - start < 0.1
+
+        limiter.acquire("http://a.example/y")
+        assert time.monotonic() - start >= 0.15
+
+    def test_concurrent_crawl_respects_rate_limit(self, http_server):
+        base_url = http_server(make_handler())
+        scraper = JuceScraper(base_url=base_url, concurrency=8, requests_per_second=40)
+        scraper.rate_limiter.burst = 1
+
+        start = time.monotonic()
+        docs = list(scraper.crawl())
+        elapsed = time.monotonic() - start
+
+        # classes.html + 12 pages through a 40 req/s bucket with no burst
+        assert len(docs) == NUM_CLASSES
+        assert elapsed >= 12 / 40 * 0.9
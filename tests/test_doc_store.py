@@ -0,0 +1,101 @@
+import pytest
+
+from src.build_rag import DOCS_URL, JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore
+from src.doc_store import DocStore
+
+
+def make_doc(name, texts, version="master"):
+    return ScrapedDocument(
+        url=DOCS_URL.format(version=version) + f"classjuce_1_1{name}.html",
+        title=f"JUCE: juce::{name} Class Reference",
+        items=[ScrapedItem(text=t, metadata={"type": "method"}) for t in texts],
+        version=version
+    )
+
+
+def build(db_path, docs):
+    store = VectorStore(db_path=str(db_path), collection_name="doc_store_test", persist_query_cache=False)
+    processor = JuceProcessor()
+    for doc in docs:
+        store.add_documents(processor.chunk_document(doc))
+    store.prune_stale_chunks()
+    store.build_and_save_bm25()
+    return VectorStore(db_path=str(db_path), collection_name="doc_store_test", persist_query_cache=False)
+
+
+def count_gets(monkeypatch, store):
+    calls = []
+    original = store.collection.get
+
+    def wrapper(*args, **kwargs):
+        calls.append(kwargs.get("ids"))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(store.collection, "get", wrapper)
+    return calls
+
+
+@pytest.fixture
+def store(ollama_server, tmp_path):
+    build(tmp_path, [make_doc("Slider", ["setRange sets the range", "getValue returns the value"]),
+                     make_doc("Label", ["setText sets the text"])])
+    # A second version sharing one chunk, so stored metadata carries both version flags
+    return build(tmp_path, [make_doc("Slider", ["setRange sets the range", "setSkew sets the skew"], "7.0.12")])
+
+
+class TestDocStore:
+
+    def test_save_and_open(self, tmp_path):
+        path = str(tmp_path / "doc_store.bin")
+        DocStore.build({
+            "b": ("Second – ünïcode", {"title": "B", "chunk_index": 1}),
+            "a": ("First", {"title": "A", "version:master": True}),
+        }).save(path)
+        store = DocStore.open(path)
+
+        assert len(store) == 2
+        assert store.get("a") == {"document": "First", "metadata": {"title": "A", "version:master": True}}
+        assert store.get("b")["document"] == "Second – ünïcode"
+        assert store.get("c") is None
+        assert list(store.records(["c", "b"])) == ["b"]
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "doc_store.bin"
+        path.write_bytes(b"JUCEBM25" + b"\0" * 200)
+        with pytest.raises(ValueError):
+            DocStore.open(str(path))
+
+
+class TestHybridQueryMaterialization:
+
+    def test_results_match_chroma(self, store):
+        for version in (None, "master", "7.0.12"):
+            local = store.hybrid_query("sets the range value skew", top_k=5, version=version)
+            store.doc_store = None
+            remote = store.hybrid_query("sets the range value skew", top_k=5, version=version)
+            store.load_doc_store()
+            assert local == remote
+            assert local["ids"][0]
+
+    def test_no_chroma_get(self, store, monkeypatch):
+        gets = count_gets(monkeypatch, store)
+        store.hybrid_query("sets the text", top_k=3)
+        store.hybrid_query("setRange", top_k=3)  # Symbol path
+        assert gets == []
+
+    def test_missing_records_fall_back_to_chroma(self, store, monkeypatch):
+        stored = store.collection.get(include=[])["ids"]
+        store.doc_store = DocStore.build({id_: ("stale text", {"title": "stale"}) for id_ in stored[1:]})
+        gets = count_gets(monkeypatch, store)
+
+        records = store.fetch_records(stored)
+
+        assert gets == [[stored[0]]]
+        assert records[stored[0]]["document"] != "stale text"
+        assert records[stored[1]]["document"] == "stale text"
+
+    def test_stale_doc_store_is_ignored(self, store, tmp_path):
+        DocStore.build({"x": ("text", {})}).save(store.doc_store_path)
+        reopened = VectorStore(db_path=str(tmp_path), collection_name="doc_store_test", persist_query_cache=False)
+        assert reopened.doc_store is None
+        assert reopened.hybrid_query("sets the text", top_k=1)["documents"] == [["setText sets the text"]]
@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import onnxruntime
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers
+
+from src import build_rag
+from src.build_rag import JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore
+from src.embedding_backends import (EmbeddingBackend, OllamaEmbeddingFunction, OnnxEmbeddingFunction,
+                                    create_embedding_backend)
+
+VOCAB = ["[PAD]", "[UNK]", "slider", "range", "audio", "buffer", "clear", "samples", "set", "the"]
+# Token states of the fake model: one row per vocabulary entry
+TABLE = np.random.default_rng(0).standard_normal((len(VOCAB), 8)).astype(np.float32)
+
+
+class FakeSession:
+    """Stands in for a model file: token states are rows of TABLE."""
+    runs = []
+
+    def __init__(self, path, sess_options=None, providers=None):
+        self.path = path
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, feeds):
+        FakeSession.runs.append(feeds)
+        return [TABLE[feeds["input_ids"]]]
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    tokenizer = Tokenizer(models.WordLevel({t: i for i, t in enumerate(VOCAB)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    (tmp_path / "model.onnx").write_bytes(b"")
+    FakeSession.runs = []
+    monkeypatch.setattr(onnxruntime, "InferenceSession", FakeSession)
+    return tmp_path
+
+
+def expected_embedding(text):
+    ids = [VOCAB.index(w) if w in VOCAB else 1 for w in text.lower().split()]
+    pooled = TABLE[ids].mean(axis=0)
+    return pooled / np.linalg.norm(pooled)
+
+
+class TestOnnxBackend:
+
+    def test_mean_pools_over_the_attention_mask(self, model_dir):
+        fn = OnnxEmbeddingFunction(str(model_dir))
+        embeddings = fn(["slider range", "clear the audio samples"])
+
+        # The shorter text was padded; padding must not shift its vector
+        assert FakeSession.runs[0]["attention_mask"].tolist()[0] == [1, 1, 0, 0]
+        assert "token_type_ids" not in FakeSession.runs[0]  # The model doesn't declare it
+        for text, embedding in zip(["slider range", "clear the audio samples"], embeddings):
+            assert np.allclose(embedding, expected_embedding(text), atol=1e-6)
+        assert fn.model_id == f"onnx:{model_dir.name}/model.onnx"
+        assert fn.needs_wake is False
+
+    def test_batches_and_async(self, model_dir):
+        fn = OnnxEmbeddingFunction(str(model_dir / "model.onnx"), batch_size=2)
+        texts = ["slider", "range", "audio buffer"]
+        assert fn.embed_documents(texts) == asyncio.run(fn.aembed_query(texts))
+        assert len(FakeSession.runs) == 4  # Two batches per call
+
+
+class TestBackendSelection:
+
+    def test_selection(self, model_dir, monkeypatch):
+        monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+        assert isinstance(create_embedding_backend(), OllamaEmbeddingFunction)
+        assert create_embedding_backend().model_id == "embeddinggemma:latest@embed"
+
+        monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+        monkeypatch.setenv("EMBEDDING_MODEL_PATH", str(model_dir))
+        assert isinstance(create_embedding_backend(), OnnxEmbeddingFunction)
+
+    def test_invalid_configuration(self, monkeypatch):
+        monkeypatch.delenv("EMBEDDING_MODEL_PATH", raising=False)
+        with pytest.raises(ValueError):
+            create_embedding_backend("onnx")
+        with pytest.raises(ValueError):
+            create_embedding_backend("word2vec")
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class NoCall(EmbeddingBackend):
+            model_id = "incomplete"
+
+        with pytest.raises(TypeError):
+            NoCall()
+
+
+class TestLocalBackendStore:
+
+    def build(self, db_path, **kwargs):
+        store = VectorStore(db_path=str(db_path), collection_name="backend_test", persist_query_cache=False, **kwargs)
+        doc = ScrapedDocument(
+            url="https://docs.juce.com/master/classjuce_1_1AudioBuffer.html",
+            title="JUCE: juce::AudioBuffer Class Reference",
+            items=[ScrapedItem(text="clear the audio samples", metadata={"type": "method"}),
+                   ScrapedItem(text="set the slider range", metadata={"type": "method"})],
+            version="master"
+        )
+        store.add_documents(JuceProcessor().chunk_document(doc))
+        store.build_and_save_bm25()
+        return store
+
+    def test_no_ollama_and_no_wake(self, model_dir, tmp_path, monkeypatch):
+        monkeypatch.setenv("OLLAMA_URL", "http://127.0.0.1:9")  # Nothing listens here
+        monkeypatch.setenv("EMBEDDING_MODEL_PATH", str(model_dir))
+
+        def wake_device():
+            raise AssertionError("a local backend must not wake the Ollama host")
+
+        monkeypatch.setattr(build_rag, "WoL", SimpleNamespace(wake_device=wake_device, missing_config=list))
+        self.build(tmp_path / "db", embedding_backend="onnx")
+        store = VectorStore(db_path=str(tmp_path / "db"), collection_name="backend_test",
+                            persist_query_cache=False, embedding_backend="onnx")
+
+        results = store.hybrid_query("audio samples", top_k=2)
+        assert results["legs"] == [{"bm25": "ok", "vector": "ok"}]
+        assert results["documents"][0][0] == "clear the audio samples"
+
+    def test_model_change_is_detected(self, model_dir, ollama_server, tmp_path, monkeypatch):
+        monkeypatch.setenv("EMBEDDING_MODEL_PATH", str(model_dir))
+        self.build(tmp_path, embedding_backend="ollama")
+
+        store = VectorStore(db_path=str(tmp_path), collection_name="backend_test", persist_query_cache=False,
+                            embedding_backend="onnx")
+        assert store.model_changed
+        assert store.manifest == {}
+        store.reset_collection()
+        assert store.collection.count() == 0
+        assert not store.model_changed
@@ -0,0 +1,48 @@
+import pytest
+
+from src.build_rag import OllamaEmbeddingFunction
+
+
+def texts(n):
+    return [f"memitem chunk number {i}" for i in range(n)]
+
+
+class TestBatchedEmbedding:
+
+    def test_batches_use_multi_input_endpoint(self, ollama_server, fake_embedding):
+        fn = OllamaEmbeddingFunction(ollama_server.url, "embeddinggemma:latest", batch_size=4)
+
+        embeddings = fn(texts(10))
+
+        paths = [path for path, _ in ollama_server.requests_seen]
+        assert paths == ["/api/embed"] * 3
+        assert sorted(len(body["input"]) for _, body in ollama_server.requests_seen) == [2, 4, 4]
+        assert embeddings == [fake_embedding(t) for t in texts(10)]
+        assert fn.batch_supported is True
+
+    def test_falls_back_to_per_item_calls(self, ollama_server, fake_embedding):
+        ollama_server.batch_supported = False
+        fn = OllamaEmbeddingFunction(ollama_server.url, "embeddinggemma:latest", batch_size=4, max_in_flight=1)
+
+        embeddings = fn(texts(6))
+
+        paths = [path for path, _ in ollama_server.requests_seen]
+        # One rejected probe, then per-item requests; batching isn't retried afterwards
+        assert paths == ["/api/embed"] + ["/api/embeddings"] * 6
+        # Normalized like /api/embed's vectors, so both kinds can share one collection
+        assert embeddings == [pytest.approx(fake_embedding(t)) for t in texts(6)]
+        assert fn.batch_supported is False
+
+    def test_bounded_batches_in_flight(self, ollama_server, fake_embedding):
+        ollama_server.delay = 0.05
+        fn = OllamaEmbeddingFunction(ollama_server.url, "embeddinggemma:latest", batch_size=2, max_in_flight=3)
+
+        embeddings = fn(texts(20))
+
+        assert embeddings == [fake_embedding(t) for t in texts(20)]
+        assert 1 < ollama_server.max_in_flight <= 3
+
+    def test_empty_input(self, ollama_server):
+        fn = OllamaEmbeddingFunction(ollama_server.url, "embeddinggemma:latest")
+        assert fn([]) == []
+        assert ollama_server.requests_seen == []
@@ -0,0 +1,165 @@
+import pytest
+
+from src.bm25_index import MASK_CACHE_SIZE, InvertedBM25Index
+from src.build_rag import JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore, class_name
+
+BASE = "https://docs.juce.com/master/"
+
+
+def make_doc(page, title, items, version="master"):
+    return ScrapedDocument(
+        url=BASE.replace("master", version) + page,
+        title=title,
+        items=[ScrapedItem(text=text, metadata={"type": type_}) for type_, text in items],
+        version=version
+    )
+
+
+DOCS = [
+    make_doc("classjuce_1_1Slider.html", "JUCE: juce::Slider Class Reference", [
+        ("class_description", "A slider control for changing a value."),
+        ("method", "void setValue (double newValue) sets the slider value"),
+        ("method", "double getValue () returns the slider value"),
+    ]),
+    make_doc("classjuce_1_1Slider_1_1Listener.html", "JUCE: juce::Slider::Listener Class Reference", [
+        ("class_description", "A class for receiving callbacks from a Slider."),
+        ("method", "virtual void sliderValueChanged (Slider *) called when the slider value changes"),
+    ]),
+    make_doc("classjuce_1_1AudioBuffer.html", "JUCE: juce::AudioBuffer< Type > Class Template Reference", [
+        ("class_description", "A multi-channel buffer containing floating point audio samples."),
+        ("method", "void setSample (int channel, int index, Type value) sets a sample value"),
+    ]),
+    make_doc("group__juce__audio__basics-buffers.html", "JUCE: Buffers", [
+        ("overview", "Audio buffer classes and the value of samples."),
+    ]),
+]
+
+
+@pytest.fixture
+def store(ollama_server, tmp_path):
+    store = VectorStore(db_path=str(tmp_path), collection_name="filters_test")
+    processor = JuceProcessor()
+    for doc in DOCS:
+        store.add_documents(processor.chunk_document(doc))
+    store.build_and_save_bm25()
+    # Query a freshly opened store, i.e. the memory-mapped index
+    return VectorStore(db_path=str(tmp_path), collection_name="filters_test")
+
+
+def hits(results):
+    return list(zip(results["documents"][0], results["metadatas"][0]))
+
+
+class TestClassName:
+
+    def test_titles(self):
+        assert class_name("JUCE: juce::Slider Class Reference") == "Slider"
+        assert class_name("JUCE:   juce::AudioBuffer< Type > Class Template Reference") == "AudioBuffer"
+        assert class_name("JUCE: juce::AudioSourceChannelInfo Struct Reference") == "AudioSourceChannelInfo"
+        assert class_name("JUCE: Buffers") is None
+
+
+class TestFilteredSearch:
+
+    def test_type_filter(self, store):
+        results = store.hybrid_query("value", top_k=2, filters={"type": "class_description"})
+        found = hits(results)
+        assert len(found) == 2
+        assert all(meta["type"] == "class_description" for _, meta in found)
+
+        both = store.hybrid_query("value", top_k=10, filters={"type": ["overview", "class_description"]})
+        assert {meta["type"] for _, meta in hits(both)} == {"overview", "class_description"}
+
+    def test_class_filter(self, store):
+        for name in ("Slider", "juce::Slider"):
+            found = hits(store.hybrid_query("value", top_k=10, filters={"class": name}))
+            assert len(found) == 3
+            assert {meta["title"] for _, meta in found} == {"JUCE: juce::Slider Class Reference"}
+
+        found = hits(store.hybrid_query("sample", top_k=10, filters={"class": "AudioBuffer", "type": "method"}))
+        assert [text for text, _ in found] == ["void setSample (int channel, int index, Type value) sets a sample value"]
+
+    def test_url_prefix_filter(self, store):
+        full = hits(store.hybrid_query("value", top_k=10, filters={"url_prefix": BASE + "classjuce_1_1Slider"}))
+        relative = hits(store.hybrid_query("value", top_k=10, filters={"url_prefix": "classjuce_1_1Slider"}))
+        assert sorted(t for t, _ in full) == sorted(t for t, _ in relative)
+        assert len(full) == 5  # Slider and Slider::Listener
+        assert all(meta["url"].startswith(BASE + "classjuce_1_1Slider") for _, meta in full)
+
+        assert hits(store.hybrid_query("value", filters={"url_prefix": "namespacejuce"})) == []
+        # Another version's base URL implies that version
+        assert hits(store.hybrid_query("value", filters={"url_prefix": BASE.replace("master", "7.0.12")})) == []
+
+    def test_filters_reach_both_retrievers(self, store):
+        where, mask, version = store.resolve_filters({"type": "method", "class": "Slider"}, version="master")
+
+        assert version == "master"
+        assert where == {"$and": [{"version:master": True}, {"type": {"$in": ["method"]}},
+                                  {"title": {"$in": ["JUCE: juce::Slider Class Reference"]}}]}
+        assert mask.sum() == 2
+        # Vector leg alone respects the where clause
+        vector = store.collection.query(query_embeddings=store.embed_queries(["slider"]), n_results=10, where=where)
+        assert len(vector["ids"][0]) == 2
+
+    def test_no_possible_match(self, store):
+        assert store.resolve_filters({"class": "Synthesiser"}) is None
+        assert store.hybrid_query("value", filters={"class": "Synthesiser"})["ids"] == [[]]
+        assert store.query("value", filters={"type": []})["ids"] == [[]]
+
+    def test_unknown_filter_key(self, store):
+        with pytest.raises(ValueError):
+            store.hybrid_query("value", filters={"colour": "red"})
+
+    def test_index_without_filter_data(self, store):
+        store.bm25 = InvertedBM25Index.build([store.simple_tokenize("slider value")], doc_ids=["x"])
+        _, mask, _ = store.resolve_filters({"type": "method"})
+        assert not mask.any()  # Keyword leg sits out rather than returning unfiltered hits
+        with pytest.raises(ValueError):
+            store.resolve_filters({"class": "Slider"})
+
+
+class TestBM25AttributeMasks:
+
+    def build_index(self):
+        corpus = [["slider", "value"], ["value"], ["buffer", "value"], ["value", "value"]]
+        return InvertedBM25Index.build(corpus, doc_attributes={
+            "type": ["method", "class_description", "method", "overview"],
+            "page": ["classjuce_1_1Slider.html", "classjuce_1_1Slider.html",
+                     "classjuce_1_1AudioBuffer.html", "group__buffers.html"],
+            "title": ["Slider", "Slider", "AudioBuffer", "Buffers"],
+        })
+
+    def test_masked_scores_equal_post_filtered_scores(self):
+        index = self.build_index()
+        mask = index.attribute_mask("type", ["method"])
+        all_docs, all_scores = index.score_matches(["value", "slider"])
+        docs, scores = index.score_matches(["value", "slider"], doc_mask=mask)
+        assert docs.tolist() == [0, 2]
+        assert scores.tolist() == all_scores[mask[all_docs]].tolist()
+
+    def test_prefix_mask_and_save_open(self, tmp_path):
+        path = str(tmp_path / "bm25_index.bin")
+        self.build_index().save(path)
+        index = InvertedBM25Index.open(path)
+
+        assert list(index.attribute_values("type")) == ["class_description", "method", "overview"]
+        assert index.attribute_prefix_mask("page", "classjuce_1_1").tolist() == [True, True, True, False]
+        assert index.attribute_prefix_range("page", "classjuce_1_1Slider") == (1, 2)
+        assert not index.attribute_prefix_mask("page", "namespace").any()
+        assert index.attribute_mask("title", ["Slider", "Missing"]).tolist() == [True, True, False, False]
+        assert index.attribute_mask("type", ["method"]) is index.attribute_mask("type", ["method"])
+
+
+    def test_mask_cache_is_bounded(self):
+        index = self.build_index()
+        first = index.attribute_prefix_mask("page", "classjuce_1_1")
+        assert index.attribute_prefix_mask("page", "classjuce_1_1") is first  # Cached
+        for i in range(MASK_CACHE_SIZE * 2):
+            index.attribute_prefix_mask("page", f"client-supplied-{i}")
+            index.version_mask(f"v{i}")
+        assert len(index.masks) == MASK_CACHE_SIZE
+        assert index.attribute_prefix_mask("page", "classjuce_1_1").tolist() == first.tolist()
+    def test_unknown_attribute(self):
+        with pytest.raises(ValueError):
+            InvertedBM25Index.build([["a"]], doc_attributes={"colour": ["red"]})
+        assert InvertedBM25Index.build([["a"]]).attribute_mask("type", ["method"]) is None
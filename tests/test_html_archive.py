@@ -0,0 +1,177 @@
+import gzip
+import os
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from src import build_rag
+from src.build_rag import JuceScraper
+from src.html_archive import HtmlArchive
+from src.index_generations import IndexGenerations
+
+NUM_CLASSES = 5
+
+
+def class_page(name, version=1):
+    return (f"<html><head><title>JUCE: juce::{name} Class Reference</title></head><body>"
+            f"<div class='textblock'><p>The {name} class, revision {version}.</p></div>"
+            f"<div class='memitem'><div class='memproto'>void {name}::run ()</div>"
+            f"<div class='memdoc'>Runs the {name}.</div></div></body></html>").encode()
+
+
+def make_handler(etags=False):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        hits = 0
+        not_modified = 0
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                Handler.hits += 1
+            name = self.path.lstrip("/")
+            if name == "classes.html":
+                links = "".join(f'<a href="classjuce_1_1C{i}.html">C{i}</a>' for i in range(NUM_CLASSES))
+                body = f"<html><body><div class='contents'>{links}</div></body></html>".encode()
+            elif name.startswith("classjuce_1_1C"):
+                body = class_page(name[len("classjuce_1_1"):-len(".html")])
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            etag = f'"{len(body)}"'
+            if etags and self.headers.get("If-None-Match") == etag:
+                with lock:
+                    Handler.not_modified += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            if etags:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def crawl(scraper):
+    docs = list(scraper.crawl(scraper.get_class_list()))
+    scraper.close()
+    return sorted(docs, key=lambda d: d.url)
+
+
+class TestHtmlArchive:
+
+    def test_put_is_content_addressed_and_compressed(self, tmp_path):
+        archive = HtmlArchive(str(tmp_path))
+        body = class_page("Slider") * 50
+
+        sha = archive.put(body)
+        assert archive.put(body) == sha
+        assert archive.get(sha) == body
+        path = archive.object_path(sha)
+        assert os.path.getsize(path) < len(body) / 5
+        assert gzip.decompress(open(path, "rb").read()) == body
+        assert len(os.listdir(os.path.dirname(path))) == 1
+
+    def test_snapshot_visible_only_after_commit(self, tmp_path):
+        archive = HtmlArchive(str(tmp_path))
+        writer = archive.begin_snapshot("http://docs.test/")
+        writer.record("http://docs.test/a.html", content=b"<p>a</p>")
+        writer.record("http://docs.test/b.html", content=b"<p>a</p>")  # same body, stored once
+
+        assert archive.snapshots() == []
+        with pytest.raises(FileNotFoundError):
+            archive.open_snapshot()
+
+        writer.commit()
+        snapshot = archive.open_snapshot()
+        assert snapshot.name == writer.name == archive.latest()
+        assert snapshot.base_url == "http://docs.test/"
+        assert len(snapshot) == 2
+        assert snapshot.get("http://docs.test/b.html") == b"<p>a</p>"
+        with pytest.raises(KeyError):
+            snapshot.get("http://docs.test/missing.html")
+
+    def test_aborted_snapshot_leaves_no_trace(self, tmp_path):
+        archive = HtmlArchive(str(tmp_path))
+        writer = archive.begin_snapshot("http://docs.test/")
+        writer.abort()
+        assert os.listdir(archive.snapshots_dir) == []
+
+    def test_record_by_hash_requires_archived_body(self, tmp_path):
+        archive = HtmlArchive(str(tmp_path))
+        writer = archive.begin_snapshot("http://docs.test/")
+        with pytest.raises(ValueError):
+            writer.record("http://docs.test/a.html", sha256="0" * 64)
+        writer.abort()
+
+
+class TestReplay:
+
+    def test_replay_matches_live_crawl_without_network(self, http_server, tmp_path):
+        handler = make_handler()
+        base_url = http_server(handler)
+        archive = HtmlArchive(str(tmp_path / "archive"))
+
+        live = crawl(JuceScraper(base_url=base_url, concurrency=3, requests_per_second=None, archive=archive))
+        hits = handler.hits
+        assert len(archive.open_snapshot()) == NUM_CLASSES + 1  # classes.html too
+
+        replayed = crawl(JuceScraper(concurrency=3, source=archive.open_snapshot()))
+
+        assert handler.hits == hits
+        assert replayed == live
+        assert len(replayed) == NUM_CLASSES
+
+    def test_not_modified_pages_are_archived(self, http_server, tmp_path):
+        handler = make_handler(etags=True)
+        base_url = http_server(handler)
+        archive = HtmlArchive(str(tmp_path / "archive"))
+        cache_dir = str(tmp_path / "cache")
+
+        crawl(JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=cache_dir, archive=archive))
+        first = archive.latest()
+        crawl(JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=cache_dir, archive=archive))
+
+        assert handler.not_modified == NUM_CLASSES + 1
+        second = archive.open_snapshot()
+        assert second.name != first
+        assert second.pages == archive.open_snapshot(first).pages
+
+    def test_missing_archive_object_forces_full_fetch(self, http_server, tmp_path):
+        handler = make_handler(etags=True)
+        base_url = http_server(handler)
+        cache_dir = str(tmp_path / "cache")
+        crawl(JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=cache_dir))
+
+        # Archive enabled after the page cache was warm: bodies must still be captured
+        archive = HtmlArchive(str(tmp_path / "archive"))
+        crawl(JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=cache_dir, archive=archive))
+
+        assert handler.not_modified == 0
+        assert len(archive.open_snapshot()) == NUM_CLASSES + 1
+
+    def test_main_rebuilds_index_from_snapshot(self, http_server, ollama_server, tmp_path, monkeypatch):
+        handler = make_handler()
+        base_url = http_server(handler)
+        archive_dir = str(tmp_path / "archive")
+        crawl(JuceScraper(base_url=base_url, requests_per_second=None, archive=HtmlArchive(archive_dir)))
+        hits = handler.hits
+
+        monkeypatch.setenv("JUCE_PARSE_WORKERS", "1")
+        monkeypatch.setattr(build_rag, "default_db_path", lambda: str(tmp_path / "legacy_db"))
+        build_rag.main(concurrency=2, index_root=str(tmp_path / "index"), archive_dir=archive_dir, replay="latest")
+
+        assert handler.hits == hits
+        db_path = IndexGenerations(str(tmp_path / "index")).current_path()
+        assert db_path is not None
+        store = build_rag.VectorStore(db_path=db_path)
+        assert store.collection.count() == 2 * NUM_CLASSES
+        assert len(store.bm25_mapping) == 2 * NUM_CLASSES
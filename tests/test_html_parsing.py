@@ -0,0 +1,130 @@
+import glob
+import json
+import os
+import pickle
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from src.build_rag import JuceScraper
+from src.html_parsing import parse_page, resolve_backend, available_backends
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+FIXTURES = sorted(os.path.basename(p) for p in glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+BASE_URL = "https://docs.juce.com/master/"
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        content = f.read()
+    with open(os.path.join(FIXTURES_DIR, name[:-len(".html")] + ".expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    return content, expected
+
+
+def require(backend):
+    if backend == "selectolax":
+        pytest.importorskip("selectolax.lexbor")
+    elif backend == "lxml":
+        pytest.importorskip("lxml")
+
+
+@pytest.mark.parametrize("backend", ["html.parser", "lxml", "selectolax"])
+@pytest.mark.parametrize("fixture", FIXTURES)
+class TestParserParity:
+    """Every backend must produce exactly the items the original html.parser code did."""
+
+    def test_matches_expected_output(self, backend, fixture):
+        require(backend)
+        content, expected = load_fixture(fixture)
+        assert parse_page(BASE_URL + fixture, content, backend) == expected
+
+    def test_accepts_decoded_text(self, backend, fixture):
+        require(backend)
+        content, expected = load_fixture(fixture)
+        assert parse_page(BASE_URL + fixture, content.decode("utf-8"), backend) == expected
+
+
+class TestParsing:
+
+    def test_fixture_sanity(self):
+        _, slider = load_fixture("classjuce_1_1Slider.html")
+        types = [item["metadata"]["type"] for item in slider["items"]]
+        assert types == ["class_description", "method", "method", "method"]
+        assert "Member Enumeration Documentation" not in slider["items"][0]["text"]
+        assert slider["items"][1]["text"].startswith("void juce::Slider::setRange ( double newMinimum")
+
+        _, index = load_fixture("index.html")
+        assert index["title"] == "JUCE:   Main Page"
+        assert "not text" not in index["items"][0]["text"]
+
+    def test_missing_title_falls_back_to_url(self):
+        result = parse_page(BASE_URL + "page.html", b"<html><body><p>hi</p></body></html>")
+        assert result == {"title": "page.html", "items": [{"text": "hi", "metadata": {"type": "overview"}}]}
+
+    def test_resolve_backend(self):
+        assert resolve_backend("auto") == available_backends()[0]
+        assert resolve_backend("html.parser") == "html.parser"
+        with pytest.raises(ValueError):
+            resolve_backend("regex")
+
+    def test_parse_page_is_picklable(self):
+        # Required to ship it to a ProcessPoolExecutor
+        assert pickle.loads(pickle.dumps(parse_page)) is parse_page
+
+
+def make_handler():
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            name = self.path.lstrip("/")
+            if name == "classes.html":
+                links = "".join(f'<a href="{f}">x</a>' for f in FIXTURES if f.startswith(("class", "struct")))
+                body = f"<html><body><div class='contents'>{links}</div></body></html>".encode()
+            elif name in FIXTURES:
+                body, _ = load_fixture(name)
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class TestProcessPoolParsing:
+
+    def test_process_pool_matches_inline(self, http_server):
+        base_url = http_server(make_handler())
+
+        inline = JuceScraper(base_url=base_url, concurrency=2, requests_per_second=None,
+                             parser_backend="html.parser")
+        pooled = JuceScraper(base_url=base_url, concurrency=2, requests_per_second=None,
+                             parser_backend="html.parser", parse_workers=2)
+        try:
+            expected = {doc.url: doc for doc in inline.crawl()}
+            docs = {doc.url: doc for doc in pooled.crawl()}
+            assert pooled.parse_pool is not None
+        finally:
+            pooled.close()
+
+        assert len(docs) == 2
+        assert docs == expected
+        assert pooled.parse_pool is None
+
+    def test_parse_errors_mark_page_failed(self, http_server, monkeypatch):
+        base_url = http_server(make_handler())
+        scraper = JuceScraper(base_url=base_url, requests_per_second=None, parser_backend="html.parser")
+
+        def broken(url, content):
+            raise RuntimeError("parser crashed")
+        monkeypatch.setattr(scraper, "parse_page", broken)
+
+        doc = scraper.scrape_content(base_url + "classjuce_1_1Slider.html")
+        assert doc.items == []
+        assert scraper.failed_urls == [base_url + "classjuce_1_1Slider.html"]
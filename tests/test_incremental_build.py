@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.build_rag import JuceProcessor, VectorStore, ScrapedDocument, ScrapedItem
+
+
+def make_doc(name, texts):
+    return ScrapedDocument(
+        url=f"http://docs.test/classjuce_1_1{name}.html",
+        title=f"JUCE: juce::{name} Class Reference",
+        items=[ScrapedItem(text=t, metadata={"type": "method"}) for t in texts]
+    )
+
+
+def build(db_path, docs):
+    """Runs a full build the way build_rag.main() does."""
+    store = VectorStore(db_path=str(db_path), collection_name="incremental_test")
+    processor = JuceProcessor()
+    for doc in docs:
+        store.add_documents(processor.chunk_document(doc))
+    store.prune_stale_chunks()
+    store.build_and_save_bm25()
+    return store
+
+
+class TestIncrementalBuild:
+
+    def test_unchanged_rebuild_embeds_nothing(self, ollama_server, tmp_path):
+        docs = [make_doc("Slider", ["setRange sets the range", "getValue returns the value"]),
+                make_doc("Button", ["onClick callback"])]
+        build(tmp_path, docs)
+        assert len(ollama_server.prompts) == 3
+
+        store = build(tmp_path, docs)
+
+        assert len(ollama_server.prompts) == 3
+        assert store.build_stats["unchanged"] == 3
+        assert store.build_stats["embedded"] == 0
+        assert len(store.bm25_mapping) == 3
+
+    def test_only_changed_chunks_are_reembedded(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range", "getValue returns the value"])])
+        ollama_server.prompts.clear()
+
+        store = build(tmp_path, [make_doc("Slider", ["setRange sets the range", "getValue returns the current value"])])
+
+        assert ollama_server.prompts == ["getValue returns the current value"]
+        assert store.build_stats["embedded"] == 1
+        stored = store.collection.get(ids=[store.bm25_mapping[1]])
+        assert stored["documents"] == ["getValue returns the current value"]
+
+    def test_metadata_change_does_not_reembed(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range"])])
+        ollama_server.prompts.clear()
+
+        renamed = make_doc("Slider", ["setRange sets the range"])
+        renamed.title = "JUCE: juce::Slider Class Reference (renamed)"
+        store = build(tmp_path, [renamed])
+
+        assert ollama_server.prompts == []
+        assert store.build_stats["metadata_updated"] == 1
+        assert store.collection.get()["metadatas"][0]["title"].endswith("(renamed)")
+
+    def test_removed_chunks_are_deleted(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range"]), make_doc("Button", ["onClick callback"])])
+
+        store = build(tmp_path, [make_doc("Slider", ["setRange sets the range"])])
+
+        assert store.build_stats["deleted"] == 1
+        assert store.collection.count() == 1
+        assert len(store.manifest) == 1
+        assert len(store.bm25_mapping) == 1
+
+    def test_failed_pages_are_kept(self, ollama_server, tmp_path):
+        button = make_doc("Button", ["onClick callback"])
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range"]), button])
+
+        store = VectorStore(db_path=str(tmp_path), collection_name="incremental_test")
+        store.add_documents(JuceProcessor().chunk_document(make_doc("Slider", ["setRange sets the range"])))
+        deleted = store.prune_stale_chunks(keep_urls=[button.url])
+        store.build_and_save_bm25()
+
+        assert deleted == 0
+        assert store.collection.count() == 2
+        assert len(store.bm25_mapping) == 2
+
+    def test_manifest_ignored_when_collection_is_empty(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range"])])
+        store = VectorStore(db_path=str(tmp_path), collection_name="incremental_test")
+        store.client.delete_collection("incremental_test")
+        ollama_server.prompts.clear()
+
+        store = build(tmp_path, [make_doc("Slider", ["setRange sets the range"])])
+
+        assert ollama_server.prompts == ["setRange sets the range"]
+        assert store.collection.count() == 1
+
+
+class TestEmbeddingDedup:
+
+    def test_identical_texts_in_a_batch_are_embedded_once(self, ollama_server, tmp_path):
+        boilerplate = "JUCE_DECLARE_NON_COPYABLE (Component)"
+        chunks = []
+        for name in ("Slider", "Button", "Label"):
+            chunks += JuceProcessor().chunk_document(make_doc(name, [boilerplate, f"{name} specific method"]))
+
+        store = VectorStore(db_path=str(tmp_path), collection_name="incremental_test")
+        store.add_documents(chunks)
+
+        assert sorted(ollama_server.prompts) == sorted([boilerplate, "Slider specific method",
+                                                        "Button specific method", "Label specific method"])
+        assert store.collection.count() == 6
+        assert store.build_stats["embedded"] == 6
+        assert store.build_stats["duplicates"] == 2
+        copies = [c["id"] for c in chunks if c["text"] == boilerplate]
+        stored = store.collection.get(ids=copies, include=["embeddings"])
+        assert len({tuple(e) for e in stored["embeddings"]}) == 1
+
+    def test_text_already_stored_reuses_its_embedding(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["operator= copies the value"])])
+        ollama_server.prompts.clear()
+
+        store = build(tmp_path, [make_doc("Slider", ["operator= copies the value"]),
+                                 make_doc("Button", ["operator= copies the value", "onClick callback"])])
+
+        assert ollama_server.prompts == ["onClick callback"]
+        assert store.build_stats["reused"] == 1
+        assert store.collection.count() == 3
+
+    def test_stale_text_index_falls_back_to_embedding(self, ollama_server, tmp_path):
+        store = build(tmp_path, [make_doc("Slider", ["setRange sets the range"])])
+        # Point the index at a record that holds different text
+        text_hash = VectorStore.content_hashes({"text": "getValue", "metadata": {}})["text"]
+        store.text_index[text_hash] = next(iter(store.manifest))
+        ollama_server.prompts.clear()
+
+        store.add_documents(JuceProcessor().chunk_document(make_doc("Button", ["getValue"])))
+
+        assert ollama_server.prompts == ["getValue"]
+        assert store.build_stats["reused"] == 0
+
+    def test_text_shared_by_concurrent_batches_is_embedded_once(self, ollama_server, tmp_path):
+        boilerplate = "JUCE_DECLARE_NON_COPYABLE (Component)"
+        store = VectorStore(db_path=str(tmp_path), collection_name="incremental_test")
+        batches = [JuceProcessor().chunk_document(make_doc(name, [boilerplate, f"{name} specific method"]))
+                   for name in ("Slider", "Button")]
+        ollama_server.delay = 0.2  # Both embed workers are in flight at once
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            plans = list(pool.map(lambda batch: store.embed_plan(store.plan_documents(batch)), batches))
+        for plan in plans:
+            store.write_documents(plan)
+
+        assert ollama_server.prompts.count(boilerplate) == 1
+        assert store.build_stats["embedded"] == 4
+        assert store.build_stats["reused"] == 1
+        assert store.pending_embeddings == {}
+        copies = [c["id"] for batch in batches for c in batch if c["text"] == boilerplate]
+        stored = store.collection.get(ids=copies, include=["embeddings"])
+        assert len({tuple(e) for e in stored["embeddings"]}) == 1
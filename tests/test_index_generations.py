@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+
+from src.index_generations import IndexGenerations, SnapshotManager
+from src.build_rag import StoreRegistry, current_db_path
+
+
+class FakeStore:
+    def __init__(self, db_path, collection_name):
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.closed = False
+        time.sleep(0.02)
+
+    def close(self):
+        self.closed = True
+
+
+def publish_generation(generations, marker):
+    generation, path = generations.prepare()
+    with open(os.path.join(path, "marker.txt"), "w") as f:
+        f.write(marker)
+    generations.publish(generation)
+    return generation, path
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestIndexGenerations:
+
+    def test_no_current_generation(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        assert generations.current() is None
+        assert generations.current_path() is None
+
+    def test_publish_switches_current(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        first, first_path = publish_generation(generations, "one")
+        assert generations.current_path() == first_path
+
+        second, second_path = publish_generation(generations, "two")
+        assert second != first
+        assert generations.current()["generation"] == second
+        assert generations.current_path() == second_path
+        # No temp files left behind by the atomic rename
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    def test_prepare_seeds_from_current_generation(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        publish_generation(generations, "one")
+
+        _, path = generations.prepare()
+        with open(os.path.join(path, "marker.txt")) as f:
+            assert f.read() == "one"
+
+    def test_prepare_seeds_from_legacy_db(self, tmp_path):
+        legacy = tmp_path / "legacy_db"
+        legacy.mkdir()
+        (legacy / "chroma.sqlite3").write_bytes(b"db")
+
+        generations = IndexGenerations(str(tmp_path / "index"))
+        _, path = generations.prepare(seed_path=str(legacy))
+        assert open(os.path.join(path, "chroma.sqlite3"), "rb").read() == b"db"
+
+    def test_prune_keeps_live_and_newest(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        published = [publish_generation(generations, str(i))[0] for i in range(5)]
+
+        generations.prune(keep=2)
+
+        assert sorted(os.listdir(generations.generations_dir)) == published[-2:]
+
+    def test_current_db_path_falls_back_to_legacy(self, tmp_path):
+        assert current_db_path(str(tmp_path)).endswith(os.path.join("data", "juce_chroma_db"))
+        _, path = publish_generation(IndexGenerations(str(tmp_path)), "one")
+        assert current_db_path(str(tmp_path)) == path
+
+    def test_manifest_is_json(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        generation, _ = generations.prepare()
+        generations.publish(generation, chunks=12)
+        with open(generations.manifest_path) as f:
+            manifest = json.load(f)
+        assert manifest["generation"] == generation
+        assert manifest["chunks"] == 12
+
+
+class TestSnapshotManager:
+
+    def test_serves_fallback_without_generation(self, tmp_path):
+        manager = SnapshotManager(str(tmp_path), factory=FakeStore, poll_interval=0,
+                                  fallback_db_path=str(tmp_path / "legacy")).start()
+        with manager.acquire() as store:
+            assert store.db_path == str(tmp_path / "legacy")
+        assert manager.status()["generation"] == "legacy"
+
+    def test_refresh_swaps_and_closes_idle_snapshot(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        _, first_path = publish_generation(generations, "one")
+        manager = SnapshotManager(str(tmp_path), factory=FakeStore, poll_interval=0).start()
+        with manager.acquire() as store:
+            old = store
+        assert old.db_path == first_path
+
+        assert manager.refresh() is False
+        _, second_path = publish_generation(generations, "two")
+        assert manager.refresh() is True
+
+        with manager.acquire() as store:
+            assert store.db_path == second_path
+        assert old.closed
+
+    def test_in_flight_query_keeps_old_snapshot(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        publish_generation(generations, "one")
+        manager = SnapshotManager(str(tmp_path), factory=FakeStore, poll_interval=0).start()
+
+        with manager.acquire() as old:
+            second, _ = publish_generation(generations, "two")
+            manager.refresh()
+
+            # New queries see the new generation while the old one drains
+            with manager.acquire() as new:
+                assert new is not old
+            assert not old.closed
+            assert manager.status()["draining"] == {manager.retired[0].generation: 1}
+
+        assert old.closed
+        assert manager.status() == {"generation": second, "in_flight": 0, "draining": {}}
+
+    def test_watcher_picks_up_new_generation(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        publish_generation(generations, "one")
+        manager = SnapshotManager(str(tmp_path), factory=FakeStore, poll_interval=0.02).start()
+        try:
+            second, second_path = publish_generation(generations, "two")
+            assert wait_for(lambda: manager.status()["generation"] == second)
+            with manager.acquire() as store:
+                assert store.db_path == second_path
+        finally:
+            manager.stop()
+
+    def test_queries_never_fail_during_swaps(self, tmp_path):
+        generations = IndexGenerations(str(tmp_path))
+        publish_generation(generations, "0")
+        manager = SnapshotManager(str(tmp_path), factory=FakeStore, poll_interval=0.01).start()
+        errors = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                with manager.acquire() as store:
+                    if store.closed:
+                        errors.append(store.db_path)
+                    time.sleep(0.002)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for t in threads:
+            t.start()
+        try:
+            for i in range(1, 4):
+                generation, _ = publish_generation(generations, str(i))
+                assert wait_for(lambda: manager.status()["generation"] == generation)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+            manager.stop()
+
+        assert errors == []
+
+
+class TestRegistryWithGenerations:
+
+    def test_pruned_generation_is_forgotten(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore)
+        old = tmp_path / "old"
+        old.mkdir()
+        registry.get(str(old))
+        old.rmdir()
+
+        new = tmp_path / "new"
+        new.mkdir()
+        registry.get(str(new))
+
+        assert [key[0] for key in registry.entries] == [str(new)]
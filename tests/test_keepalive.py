@@ -0,0 +1,194 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import WoL
+from src import build_rag
+from src.embedding_backends import OllamaEmbeddingFunction
+from src.keepalive import HostKeepAlive, create_keepalive
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class FakeHost:
+    """
+    A TCP port that can go to sleep (stop listening) and be woken; embed() stands in
+    for Ollama, paying `load_delay` on the first call after each wake (model load).
+    """
+
+    def __init__(self, boot_delay=0.1, load_delay=0.1):
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        self.port = probe.getsockname()[1]
+        probe.close()
+        self.boot_delay = boot_delay
+        self.load_delay = load_delay
+        self.listener = None
+        self.model_loaded = False
+        self.wakes = 0
+        self.embeds = []
+
+    def up(self):
+        listener = socket.socket()
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("127.0.0.1", self.port))
+        listener.listen(64)
+        self.listener = listener
+        threading.Thread(target=self.accept, args=(listener,), daemon=True).start()
+
+    def accept(self, listener):
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            conn.close()
+
+    def sleep(self):
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+        self.model_loaded = False
+
+    def wake(self):
+        self.wakes += 1
+        threading.Timer(self.boot_delay, self.up).start()
+
+    def embed(self, texts):
+        if not self.listener:
+            raise ConnectionError("host is asleep")
+        if not self.model_loaded:
+            time.sleep(self.load_delay)
+            self.model_loaded = True
+        self.embeds.append(texts)
+        return [[0.0] for _ in texts]
+
+
+@pytest.fixture
+def host():
+    host = FakeHost()
+    yield host
+    host.sleep()
+
+
+def keepalive_for(host, **kwargs):
+    options = dict(keepalive_interval=0.05, keep_warm_seconds=5, check_interval=0.05, connect_timeout=0.05)
+    options.update(kwargs)
+    return HostKeepAlive("127.0.0.1", host.port, embed=host.embed, wake=host.wake, **options)
+
+
+class TestHostKeepAlive:
+
+    def test_prewarm_wakes_and_measures_cold_start(self, host):
+        keepalive = keepalive_for(host)
+        assert keepalive.prewarm()
+
+        status = keepalive.status()
+        assert host.wakes == 1
+        assert status["state"] == "up" and status["model_loaded"]
+        # Boot (0.1 s) + model load (0.1 s)
+        assert 0.2 <= status["cold_start_seconds"] < 2
+        assert 0.1 <= status["model_load_seconds"] < status["cold_start_seconds"]
+
+        assert keepalive.prewarm()  # Already warm: no second wake or load
+        assert host.wakes == 1 and len(host.embeds) == 1
+
+    def test_start_prewarms_and_keeps_the_model_loaded(self, host):
+        keepalive = keepalive_for(host).start()
+        try:
+            assert wait_until(lambda: keepalive.stats["keepalives"] >= 3)
+            assert host.wakes == 1
+            assert all(texts == ["keep-alive"] for texts in host.embeds)
+
+            # The host slept while the server is in use: woken again ahead of the next query
+            host.sleep()
+            assert wait_until(lambda: host.wakes == 2 and keepalive.status()["model_loaded"])
+        finally:
+            keepalive.stop()
+
+    def test_idle_host_is_left_to_sleep_until_used(self, host):
+        host.up()
+        keepalive = keepalive_for(host, keep_warm_seconds=0.2).start(prewarm=False)
+        try:
+            assert wait_until(lambda: keepalive.state == "up")
+            host.sleep()
+            assert wait_until(lambda: keepalive.state == "asleep")
+            time.sleep(0.2)
+            assert host.wakes == 0 and host.embeds == []  # Not in use: no wake, no keep-alive
+
+            keepalive.touch()  # First query after the idle period
+            assert wait_until(lambda: keepalive.status()["model_loaded"])
+            assert host.wakes == 1
+            assert keepalive.status()["cold_start_seconds"] is not None
+
+            # No more queries: keep-alives stop once keep_warm_seconds pass
+            time.sleep(0.3)
+            embeds = len(host.embeds)
+            time.sleep(0.2)
+            assert len(host.embeds) == embeds
+            assert not keepalive.status()["in_use"]
+        finally:
+            keepalive.stop()
+
+    def test_without_wake_on_lan_only_tracks_state(self, host):
+        keepalive = HostKeepAlive("127.0.0.1", host.port, embed=host.embed, connect_timeout=0.05)
+        assert not keepalive.prewarm()
+        assert keepalive.state == "asleep"
+        host.up()
+        assert keepalive.prewarm()
+        assert keepalive.status()["cold_start_seconds"] is None  # Nothing was woken
+        assert keepalive.status()["model_load_seconds"] >= 0.1
+
+
+class TestServerStartup:
+
+    def test_keepalive_follows_the_store_backend(self, host):
+        backend = OllamaEmbeddingFunction(base_url=f"http://127.0.0.1:{host.port}", model_name="m")
+        keepalive = create_keepalive(backend)
+        assert (keepalive.host, keepalive.port) == ("127.0.0.1", host.port)
+        assert keepalive.embed is backend  # No query timeout: a cold model load may be slow
+        assert create_keepalive(backend, embed=host.embed).embed == host.embed
+        assert create_keepalive(SimpleNamespace(needs_wake=False)) is None  # In-process backends
+
+    def test_store_load_can_leave_waking_to_the_keepalive(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("OLLAMA_URL", "http://127.0.0.1:9")  # Asleep
+
+        def wake_device():
+            raise AssertionError("the store must not wake the host itself")
+
+        monkeypatch.setattr(build_rag, "WoL", SimpleNamespace(wake_device=wake_device, missing_config=list))
+        store = build_rag.VectorStore(db_path=str(tmp_path), collection_name="keepalive_test",
+                                      persist_query_cache=False, wake_host=False)
+        store.close()
+
+
+class TestWakeOnLan:
+
+    def test_magic_packet_and_reachability(self, host):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(2)
+        WoL.wake_device(mac="01:23:45:67:89:ab", broadcast_ip="127.0.0.1", ports=(receiver.getsockname()[1],))
+        packet = receiver.recv(1024)
+        receiver.close()
+        assert packet == b"\xff" * 6 + bytes.fromhex("0123456789ab") * 16
+
+        assert not WoL.is_up("127.0.0.1", host.port, timeout=0.1)
+        host.up()
+        assert WoL.wait_for_ollama("127.0.0.1", host.port, timeout=1, interval=0.05)
+
+    def test_unconfigured(self, monkeypatch):
+        monkeypatch.setattr(WoL, "TARGET_MAC", None)
+        assert WoL.missing_config()
+        with pytest.raises(ValueError):
+            WoL.wake_device()
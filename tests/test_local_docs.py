@@ -0,0 +1,128 @@
+import os
+import shutil
+import tarfile
+import zipfile
+
+import pytest
+
+from src import build_rag
+from src.build_rag import JuceScraper
+from src.html_parsing import parse_page
+from src.index_generations import IndexGenerations
+from src.local_docs import LocalDocs, DEFAULT_BASE_URL
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+CLASS_PAGES = ["classjuce_1_1Slider.html", "structjuce_1_1AudioSourceChannelInfo.html"]
+
+
+def make_doxygen_tree(root):
+    """A minimal Doxygen html/ output: the fixture pages plus a classes.html index linking them."""
+    html_dir = root / "build" / "docs" / "html"
+    html_dir.mkdir(parents=True)
+    for name in os.listdir(FIXTURES_DIR):
+        if name.endswith(".html"):
+            shutil.copy(os.path.join(FIXTURES_DIR, name), html_dir / name)
+    links = "".join(f'<a href="{name}">{name}</a>' for name in CLASS_PAGES)
+    (html_dir / "classes.html").write_text(f"<html><body><div class='contents'>{links}</div></body></html>")
+    (html_dir / "search").mkdir()
+    (html_dir / "search" / "all_0.html").write_text("<html><body>search</body></html>")
+    (html_dir / "doxygen.css").write_text("body {}")
+    return html_dir
+
+
+def expected_docs():
+    docs = {}
+    for name in CLASS_PAGES:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            docs[DEFAULT_BASE_URL + name] = parse_page(DEFAULT_BASE_URL + name, f.read())
+    return docs
+
+
+def crawl(scraper):
+    try:
+        return {doc.url: {"title": doc.title, "items": [{"text": i.text, "metadata": i.metadata} for i in doc.items]}
+                for doc in scraper.crawl(scraper.get_class_list())}
+    finally:
+        scraper.close()
+
+
+class TestLocalDocs:
+
+    def test_directory_source_finds_html_root(self, tmp_path):
+        html_dir = make_doxygen_tree(tmp_path)
+        docs = LocalDocs(str(tmp_path / "build"))
+
+        assert docs.root == str(html_dir)
+        assert DEFAULT_BASE_URL + "classes.html" in docs
+        assert DEFAULT_BASE_URL + "missing.html" not in docs
+        assert DEFAULT_BASE_URL + "search/all_0.html" in set(docs.urls())
+        assert all(url.endswith(".html") for url in docs.urls())
+        assert docs.get(DEFAULT_BASE_URL + "classjuce_1_1Slider.html#a4").startswith(b"<!DOCTYPE")
+
+    def test_rejects_urls_outside_tree(self, tmp_path):
+        make_doxygen_tree(tmp_path)
+        (tmp_path / "secret.html").write_text("secret")
+        docs = LocalDocs(str(tmp_path / "build" / "docs" / "html"))
+
+        for url in (DEFAULT_BASE_URL + "../../../secret.html", DEFAULT_BASE_URL + "%2e%2e/%2e%2e/%2e%2e/secret.html",
+                    "https://elsewhere.test/classes.html"):
+            assert url not in docs
+            with pytest.raises(KeyError):
+                docs.get(url)
+
+    @pytest.mark.parametrize("suffix", [".tar.gz", ".tar", ".zip"])
+    def test_archive_source(self, tmp_path, suffix):
+        make_doxygen_tree(tmp_path)
+        archive_path = tmp_path / f"docs{suffix}"
+        if suffix == ".zip":
+            with zipfile.ZipFile(archive_path, "w") as zf:
+                for dirpath, _, filenames in os.walk(tmp_path / "build"):
+                    for name in filenames:
+                        full = os.path.join(dirpath, name)
+                        zf.write(full, os.path.relpath(full, tmp_path))
+        else:
+            with tarfile.open(archive_path, "w:gz" if suffix == ".tar.gz" else "w") as tf:
+                tf.add(tmp_path / "build", arcname="build")
+
+        with LocalDocs(str(archive_path)) as docs:
+            tmp_dir = docs.tmp_dir
+            assert docs.root.endswith(os.path.join("build", "docs", "html"))
+            assert docs.get(DEFAULT_BASE_URL + "classes.html")
+            # Only HTML is unpacked
+            assert not os.path.exists(os.path.join(docs.root, "doxygen.css"))
+        assert not os.path.exists(tmp_dir)
+
+    def test_unsupported_path(self, tmp_path):
+        path = tmp_path / "docs.txt"
+        path.write_text("x")
+        with pytest.raises(ValueError):
+            LocalDocs(str(path))
+
+
+class TestLocalIngestion:
+
+    def test_scraper_matches_parsed_fixtures(self, tmp_path):
+        make_doxygen_tree(tmp_path)
+        scraper = JuceScraper(concurrency=4, parser_backend="html.parser", source=LocalDocs(str(tmp_path)))
+        assert crawl(scraper) == expected_docs()
+
+    def test_parallel_parsing_across_processes(self, tmp_path):
+        make_doxygen_tree(tmp_path)
+        scraper = JuceScraper(concurrency=4, parser_backend="html.parser", parse_workers=2,
+                              source=LocalDocs(str(tmp_path)))
+        assert crawl(scraper) == expected_docs()
+
+    def test_main_builds_from_tarball(self, ollama_server, tmp_path, monkeypatch):
+        make_doxygen_tree(tmp_path)
+        tarball = tmp_path / "juce-docs.tar.gz"
+        with tarfile.open(tarball, "w:gz") as tf:
+            tf.add(tmp_path / "build", arcname="build")
+
+        monkeypatch.setenv("JUCE_PARSE_WORKERS", "1")
+        monkeypatch.setattr(build_rag, "default_db_path", lambda: str(tmp_path / "legacy_db"))
+        build_rag.main(index_root=str(tmp_path / "index"), archive_dir="", local_docs=str(tarball))
+
+        store = build_rag.VectorStore(db_path=IndexGenerations(str(tmp_path / "index")).current_path())
+        urls = {m["url"] for m in store.collection.get()["metadatas"]}
+        assert urls == set(expected_docs())
+        assert store.collection.count() == sum(len(d["items"]) for d in expected_docs().values())
@@ -0,0 +1,147 @@
+from http.server import BaseHTTPRequestHandler
+
+from src.build_rag import JuceScraper
+from src.page_cache import PageCache
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def make_handler(pages):
+    """
+    Serves `pages` (path -> dict(body, etag, last_modified)).
+    Honours If-None-Match / If-Modified-Since like a static file server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        requests_seen = []
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.lstrip("/")
+            page = pages.get(path)
+            Handler.requests_seen.append((path, dict(self.headers)))
+            if page is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            etag = page.get("etag")
+            last_modified = page.get("last_modified")
+            if (etag and self.headers.get("If-None-Match") == etag) or \
+               (last_modified and self.headers.get("If-Modified-Since") == last_modified):
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            data = page["body"].encode()
+            self.send_response(200)
+            if etag:
+                self.send_header("ETag", etag)
+            if last_modified:
+                self.send_header("Last-Modified", last_modified)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def page(name, extra=""):
+    return (f"<html><head><title>JUCE: juce::{name} Class Reference</title></head><body>"
+            f"<div class='textblock'><p>{name} description.{extra}</p></div></body></html>")
+
+
+def count_parses(scraper):
+    calls = []
+    original = scraper.parse_page
+
+    def counting(url, content):
+        calls.append(url)
+        return original(url, content)
+
+    scraper.parse_page = counting
+    return calls
+
+
+class TestPageCache:
+
+    def test_etag_revalidation_reuses_parsed_items(self, http_server, tmp_path):
+        pages = {"classjuce_1_1Foo.html": {"body": page("Foo"), "etag": '"foo-v1"'}}
+        handler = make_handler(pages)
+        base_url = http_server(handler)
+        url = base_url + "classjuce_1_1Foo.html"
+
+        first = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path))
+        doc1 = first.scrape_content(url)
+
+        second = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path))
+        parses = count_parses(second)
+        doc2 = second.scrape_content(url)
+
+        assert doc2 == doc1
+        assert parses == []
+        assert handler.requests_seen[-1][1].get("If-None-Match") == '"foo-v1"'
+        assert second.page_cache.stats["not_modified"] == 1
+
+    def test_last_modified_revalidation(self, http_server, tmp_path):
+        pages = {"classjuce_1_1Bar.html": {"body": page("Bar"), "last_modified": LAST_MODIFIED}}
+        handler = make_handler(pages)
+        base_url = http_server(handler)
+        url = base_url + "classjuce_1_1Bar.html"
+
+        JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path)).scrape_content(url)
+        scraper = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path))
+        doc = scraper.scrape_content(url)
+
+        assert doc.items[0].text == "Bar description."
+        assert handler.requests_seen[-1][1].get("If-Modified-Since") == LAST_MODIFIED
+        assert scraper.page_cache.stats["not_modified"] == 1
+
+    def test_identical_body_without_validators_skips_parse(self, http_server, tmp_path):
+        pages = {"classjuce_1_1Baz.html": {"body": page("Baz")}}
+        base_url = http_server(make_handler(pages))
+        url = base_url + "classjuce_1_1Baz.html"
+
+        JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path)).scrape_content(url)
+        scraper = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path))
+        parses = count_parses(scraper)
+        doc = scraper.scrape_content(url)
+
+        assert doc.items[0].text == "Baz description."
+        assert parses == []
+        assert scraper.page_cache.stats["unchanged"] == 1
+
+    def test_changed_page_is_reparsed(self, http_server, tmp_path):
+        pages = {"classjuce_1_1Foo.html": {"body": page("Foo"), "etag": '"foo-v1"'}}
+        base_url = http_server(make_handler(pages))
+        url = base_url + "classjuce_1_1Foo.html"
+
+        JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path)).scrape_content(url)
+        pages["classjuce_1_1Foo.html"] = {"body": page("Foo", " Now with more."), "etag": '"foo-v2"'}
+
+        scraper = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path))
+        doc = scraper.scrape_content(url)
+
+        assert doc.items[0].text == "Foo description. Now with more."
+        assert scraper.page_cache.stats["fetched"] == 1
+        assert scraper.page_cache.get(url)["etag"] == '"foo-v2"'
+
+    def test_class_list_is_cached(self, http_server, tmp_path):
+        index = "".join(f'<a href="classjuce_1_1W{i}.html">W{i}</a>' for i in range(3))
+        pages = {"classes.html": {"body": f"<html><body>{index}</body></html>", "etag": '"idx"'}}
+        base_url = http_server(make_handler(pages))
+
+        links = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path)).get_class_list()
+        scraper = JuceScraper(base_url=base_url, requests_per_second=None, cache_dir=str(tmp_path))
+
+        assert scraper.get_class_list() == links
+        assert len(links) == 3
+        assert scraper.page_cache.stats["not_modified"] == 1
+
+    def test_parser_version_mismatch_ignores_entry(self, tmp_path):
+        PageCache(str(tmp_path), parser_version="1").put("http://x/a.html", '"e"', None, "h", {"title": "A", "items": []})
+
+        assert PageCache(str(tmp_path), parser_version="1").get("http://x/a.html") is not None
+        assert PageCache(str(tmp_path), parser_version="2").get("http://x/a.html") is None
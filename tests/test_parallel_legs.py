@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from src.build_rag import JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore
+
+DOC = ScrapedDocument(
+    url="https://docs.juce.com/master/classjuce_1_1AudioBuffer.html",
+    title="JUCE: juce::AudioBuffer Class Reference",
+    items=[ScrapedItem(text="A multi-channel buffer containing floating point audio samples.",
+                       metadata={"type": "class_description"}),
+           ScrapedItem(text="void juce::AudioBuffer::clear ( )\nClears all the samples in all channels.",
+                       metadata={"type": "method"})],
+    version="master"
+)
+
+
+@pytest.fixture
+def make_store(ollama_server, tmp_path):
+    builder = VectorStore(db_path=str(tmp_path), collection_name="legs_test", persist_query_cache=False)
+    builder.add_documents(JuceProcessor().chunk_document(DOC))
+    builder.build_and_save_bm25()
+
+    def make(**kwargs):
+        return VectorStore(db_path=str(tmp_path), collection_name="legs_test", persist_query_cache=False, **kwargs)
+    return make
+
+
+def slow_bm25(store, monkeypatch, delay):
+    top_k = store.bm25.top_k
+
+    def slow(*args, **kwargs):
+        time.sleep(delay)
+        return top_k(*args, **kwargs)
+
+    monkeypatch.setattr(store.bm25, "top_k", slow)
+
+
+class TestParallelLegs:
+
+    def test_legs_overlap(self, make_store, ollama_server, monkeypatch):
+        store = make_store(vector_timeout=5)
+        ollama_server.delay = 0.4
+        slow_bm25(store, monkeypatch, 0.4)
+
+        start = time.monotonic()
+        results = store.hybrid_query("clear the samples", top_k=2)
+
+        assert time.monotonic() - start < 0.7  # Not the 0.8 s sum
+        assert results["legs"] == [{"bm25": "ok", "vector": "ok"}]
+
+    def test_slow_vector_leg_degrades_to_bm25(self, make_store, ollama_server):
+        store = make_store(vector_timeout=0.2)
+        ollama_server.delay = 0.3  # Late, but within the embedding request's timeout
+
+        start = time.monotonic()
+        results = store.hybrid_query("clear the samples", top_k=2)
+
+        assert time.monotonic() - start < 0.6
+        assert results["legs"] == [{"bm25": "ok", "vector": "timeout"}]
+        assert results["documents"][0][0].startswith("void juce::AudioBuffer::clear")
+        assert None not in results["bm25_scores"][0]  # Nothing came from the vector leg
+
+        # The late leg still cached the query embedding, so a retry has both legs
+        time.sleep(0.5)
+        ollama_server.delay = 0.0
+        prompts = len(ollama_server.prompts)
+        assert store.hybrid_query("clear the samples", top_k=2)["legs"] == [{"bm25": "ok", "vector": "ok"}]
+        assert len(ollama_server.prompts) == prompts
+
+    def test_failed_vector_leg_degrades_to_bm25(self, make_store, monkeypatch):
+        store = make_store()
+
+        def unreachable(texts):
+            raise ConnectionError("Ollama is asleep")
+
+        monkeypatch.setattr(store, "embed_queries", unreachable)
+        results = store.hybrid_query("clear the samples", top_k=2)
+        assert results["legs"] == [{"bm25": "ok", "vector": "error"}]
+        assert results["ids"][0]
+
+    def test_symbol_queries_skip_the_vector_leg(self, make_store):
+        results = make_store().hybrid_query("AudioBuffer", top_k=2)
+        assert results["legs"] == [{"bm25": "ok", "vector": "skipped"}]
+
+    def test_timeout_from_environment(self, make_store, monkeypatch):
+        monkeypatch.setenv("JUCE_VECTOR_TIMEOUT", "1.5")
+        assert make_store().vector_timeout == 1.5
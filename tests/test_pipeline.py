@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+
+from src.pipeline import Batcher, Pipeline, Stage
+from src.build_rag import JuceProcessor, VectorStore, ScrapedDocument, ScrapedItem, build_pipeline
+
+
+def slow(fn, delay):
+    def wrapper(item):
+        time.sleep(delay)
+        return fn(item)
+    return wrapper
+
+
+class TestPipeline:
+
+    def test_all_items_flow_through(self):
+        results = []
+        lock = threading.Lock()
+
+        def sink(item):
+            with lock:
+                results.append(item)
+
+        pipeline = Pipeline(range(100), [
+            Stage("double", lambda x: [x * 2], workers=3, queue_size=4),
+            Stage("split", lambda x: [x, x + 1], workers=2, queue_size=4),
+            Stage("sink", sink, queue_size=4),
+        ])
+        report = pipeline.run()
+
+        assert sorted(results) == sorted(v for x in range(100) for v in (2 * x, 2 * x + 1))
+        assert report["source"]["items_out"] == 100
+        assert report["double"]["items_in"] == 100
+        assert report["split"]["items_out"] == 200
+        assert report["sink"]["items_in"] == 200
+
+    def test_batcher_flushes_partial_batch(self):
+        batches = []
+        batcher = Batcher(10)
+        Pipeline(range(25), [
+            Stage("batch", batcher.add, flush=batcher.flush),
+            Stage("sink", batches.append),
+        ]).run()
+
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert sorted(x for b in batches for x in b) == list(range(25))
+
+    def test_stages_overlap(self):
+        # Three stages of 10ms per item: sequential would take ~0.6s for 20 items
+        pipeline = Pipeline(range(20), [
+            Stage("a", slow(lambda x: [x], 0.01)),
+            Stage("b", slow(lambda x: [x], 0.01)),
+            Stage("c", slow(lambda x: None, 0.01)),
+        ])
+        start = time.perf_counter()
+        pipeline.run()
+        assert time.perf_counter() - start < 0.45
+
+    def test_workers_parallelize_slow_stage(self):
+        pipeline = Pipeline(range(40), [Stage("embed", slow(lambda x: None, 0.02), workers=8)])
+        start = time.perf_counter()
+        report = pipeline.run()
+        assert time.perf_counter() - start < 0.5
+        assert report["embed"]["workers"] == 8
+
+    def test_backpressure_bounds_queues(self):
+        produced = []
+
+        def source():
+            for i in range(50):
+                produced.append(i)
+                yield i
+
+        seen_lag = []
+
+        def sink(item):
+            # Producer can only be ahead by the queue capacity (+1 item in hand per thread)
+            seen_lag.append(len(produced) - item)
+            time.sleep(0.002)
+
+        report = Pipeline(source(), [Stage("sink", sink, queue_size=3)]).run()
+
+        assert max(seen_lag) <= 3 + 2
+        assert report["sink"]["max_queue_depth"] <= 3
+        assert report["sink"]["avg_queue_depth"] > 0
+
+    def test_error_aborts_and_is_raised(self):
+        def boom(x):
+            if x == 5:
+                raise ValueError("bad item")
+            return [x]
+
+        pipeline = Pipeline(iter(range(10_000)), [
+            Stage("boom", boom, workers=2, queue_size=2),
+            Stage("sink", slow(lambda x: None, 0.001), queue_size=2),
+        ])
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            pipeline.run()
+        assert time.perf_counter() - start < 5
+
+    def test_report_utilization(self):
+        report = Pipeline(range(10), [Stage("work", slow(lambda x: None, 0.01))]).run()
+        assert 0.3 < report["work"]["utilization"] <= 1.0
+        assert report["work"]["throughput"] > 0
+
+
+def make_doc(name, texts):
+    return ScrapedDocument(
+        url=f"http://docs.test/classjuce_1_1{name}.html",
+        title=f"JUCE: juce::{name} Class Reference",
+        items=[ScrapedItem(text=t, metadata={"type": "method"}) for t in texts]
+    )
+
+
+class FakeScraper:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def crawl(self, links=None):
+        yield from self.docs
+
+
+class TestPipelinedBuild:
+
+    def test_matches_sequential_build(self, ollama_server, tmp_path):
+        docs = [make_doc(f"Class{i}", [f"method{i}_{j} does thing {j}" for j in range(3)]) for i in range(20)]
+        processor = JuceProcessor()
+
+        sequential = VectorStore(db_path=str(tmp_path / "seq"), collection_name="pipeline_test")
+        for doc in docs:
+            sequential.add_documents(processor.chunk_document(doc))
+        sequential.build_and_save_bm25()
+
+        store = VectorStore(db_path=str(tmp_path / "pipe"), collection_name="pipeline_test")
+        pipeline = build_pipeline(FakeScraper(docs), processor, store, batch_size=7,
+                                  chunk_workers=2, embed_workers=3, progress_interval=None)
+        report = pipeline.run()
+        store.build_and_save_bm25()
+
+        assert report["batch"]["items_in"] == 60
+        assert report["write"]["items_in"] == 9  # ceil(60 / 7)
+        assert store.collection.count() == sequential.collection.count() == 60
+        assert store.build_stats["embedded"] == 60
+        assert sorted(store.bm25_mapping) == sorted(sequential.bm25_mapping)
+        assert store.manifest == sequential.manifest
+
+        ids = sorted(store.manifest)[:5]
+        piped = store.collection.get(ids=ids, include=["embeddings"])
+        seq = sequential.collection.get(ids=ids, include=["embeddings"])
+        seq_by_id = dict(zip(seq["ids"], seq["embeddings"]))
+        for id_, embedding in zip(piped["ids"], piped["embeddings"]):
+            assert list(embedding) == pytest.approx(list(seq_by_id[id_]))
+
+    def test_rebuild_embeds_nothing(self, ollama_server, tmp_path):
+        docs = [make_doc("Slider", ["setRange sets the range", "getValue returns the value"])]
+        processor = JuceProcessor()
+        store = VectorStore(db_path=str(tmp_path), collection_name="pipeline_test")
+        build_pipeline(FakeScraper(docs), processor, store, progress_interval=None).run()
+        store.build_and_save_bm25()
+        ollama_server.prompts.clear()
+
+        store = VectorStore(db_path=str(tmp_path), collection_name="pipeline_test")
+        build_pipeline(FakeScraper(docs), processor, store, progress_interval=None).run()
+
+        assert ollama_server.prompts == []
+        assert store.build_stats["unchanged"] == 2
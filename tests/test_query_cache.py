@@ -0,0 +1,88 @@
+from src.build_rag import JuceProcessor, VectorStore, ScrapedDocument, ScrapedItem
+from src.embedding_cache import QueryEmbeddingCache
+
+
+def populated_store(db_path, **kwargs):
+    store = VectorStore(db_path=str(db_path), collection_name="query_cache_test", **kwargs)
+    doc = ScrapedDocument(
+        url="http://docs.test/classjuce_1_1AudioBuffer.html",
+        title="JUCE: juce::AudioBuffer Class Reference",
+        items=[ScrapedItem(text="A multi-channel buffer containing floating point audio samples.", metadata={"type": "class_description"}),
+               ScrapedItem(text="void clear () Clears all the samples in all channels.", metadata={"type": "method"})]
+    )
+    store.add_documents(JuceProcessor().chunk_document(doc))
+    store.build_and_save_bm25()
+    return store
+
+
+class TestQueryEmbeddingCache:
+
+    def test_lru_eviction(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")
+        cache.put("m", "c", [3.0])
+
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "a") == [1.0]
+        assert cache.get("m", "c") == [3.0]
+
+    def test_key_includes_model_and_normalizes_whitespace(self):
+        cache = QueryEmbeddingCache()
+        cache.put("model-a", "how to use  Slider", [1.0, 2.0])
+
+        assert cache.get("model-a", "  how to use Slider ") == [1.0, 2.0]
+        assert cache.get("model-b", "how to use Slider") is None
+        assert cache.stats == {"hits": 1, "disk_hits": 0, "misses": 1}
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        cache = QueryEmbeddingCache(disk_path=path)
+        cache.put("m", "AudioBuffer", [0.25, -1.5])
+        cache.close()
+
+        reopened = QueryEmbeddingCache(disk_path=path)
+        assert reopened.get("m", "AudioBuffer") == [0.25, -1.5]
+        assert reopened.stats["disk_hits"] == 1
+
+    def test_get_or_compute_batches_misses(self):
+        cache = QueryEmbeddingCache()
+        cache.put("m", "cached", [0.0])
+        calls = []
+
+        def compute(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        result = cache.get_or_compute("m", ["cached", "new one", "new  one", "other"], compute)
+
+        assert calls == [["new one", "other"]]
+        assert result == [[0.0], [7.0], [7.0], [5.0]]
+
+
+class TestVectorStoreQueryCache:
+
+    def test_repeated_queries_skip_ollama(self, ollama_server, tmp_path):
+        store = populated_store(tmp_path)
+        ollama_server.prompts.clear()
+
+        for _ in range(3):
+            # A bare class name would be answered by the symbol index without embedding
+            store.hybrid_query("AudioBuffer", top_k=2, symbol_lookup=False)
+            store.query("AudioBuffer", n_results=1)
+
+        assert ollama_server.prompts == ["AudioBuffer"]
+        assert store.query_cache.stats["misses"] == 1
+        assert store.query_cache.stats["hits"] == 5
+
+    def test_cache_persists_across_store_instances(self, ollama_server, tmp_path):
+        populated_store(tmp_path).hybrid_query("how to clear a buffer")
+        ollama_server.prompts.clear()
+
+        store = VectorStore(db_path=str(tmp_path), collection_name="query_cache_test")
+        results = store.hybrid_query("how to clear a buffer", top_k=2)
+
+        assert ollama_server.prompts == []
+        assert store.query_cache.stats["disk_hits"] == 1
+        assert len(results["ids"][0]) == 2
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+from src.build_rag import StoreRegistry, VectorStore, JuceProcessor, ScrapedDocument, ScrapedItem
+
+
+class FakeStore:
+    created = []
+
+    def __init__(self, db_path, collection_name):
+        self.db_path = db_path
+        self.collection_name = collection_name
+        time.sleep(0.05)  # Simulate a slow load so concurrent callers overlap
+        self.closed = False
+        FakeStore.created.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def touch(path, content=b"x"):
+    with open(path, "ab") as f:
+        f.write(content)
+
+
+class TestStoreRegistry:
+
+    def setup_method(self):
+        FakeStore.created = []
+
+    def test_store_is_built_once(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore)
+
+        first = registry.get(str(tmp_path))
+        second = registry.get(str(tmp_path) + os.sep)
+
+        assert first is second
+        assert len(FakeStore.created) == 1
+
+    def test_keyed_by_path_and_collection(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore)
+
+        a = registry.get(str(tmp_path), "docs")
+        b = registry.get(str(tmp_path), "other")
+        c = registry.get(str(tmp_path / "elsewhere"), "docs")
+
+        assert len({id(a), id(b), id(c)}) == 3
+
+    def test_concurrent_callers_share_one_load(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get(str(tmp_path)))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(FakeStore.created) == 1
+        assert all(r is results[0] for r in results)
+
+    def test_reloads_when_index_changes(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore, check_interval=0)
+        touch(tmp_path / "bm25_index.bin")
+        first = registry.get(str(tmp_path))
+        assert registry.get(str(tmp_path)) is first
+
+        touch(tmp_path / "bm25_index.bin", b"rebuilt")
+        second = registry.get(str(tmp_path))
+
+        assert second is not first
+        assert registry.get(str(tmp_path)) is second
+
+    def test_change_checks_are_throttled(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore, check_interval=60)
+        first = registry.get(str(tmp_path))
+        touch(tmp_path / "bm25_index.bin")
+
+        assert registry.get(str(tmp_path)) is first
+
+    def test_replaced_store_is_closed_after_its_queries(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore, check_interval=0)
+        first = registry.get(str(tmp_path))
+        with registry.acquire(str(tmp_path)) as pinned:
+            assert pinned is first
+            touch(tmp_path / "bm25_index.bin")
+            second = registry.get(str(tmp_path))
+            assert second is not first
+            assert not first.closed  # Still in use
+        assert first.closed
+        assert not second.closed
+
+        touch(tmp_path / "bm25_index.bin", b"rebuilt")
+        registry.get(str(tmp_path))
+        assert second.closed  # Nobody pinned it: closed right away
+
+    def test_deleted_generation_is_closed(self, tmp_path):
+        registry = StoreRegistry(factory=FakeStore, check_interval=0)
+        (tmp_path / "old").mkdir()
+        old = registry.get(str(tmp_path / "old"))
+        (tmp_path / "old").rmdir()
+        registry.get(str(tmp_path / "new"))
+        assert old.closed
+
+    def test_real_store_reused_across_queries(self, ollama_server, tmp_path):
+        store = VectorStore(db_path=str(tmp_path), collection_name="registry_test")
+        doc = ScrapedDocument(url="u", title="JUCE: juce::Slider Class Reference",
+                              items=[ScrapedItem(text="The juce::Slider class is a component", metadata={"type": "class_description"})])
+        store.add_documents(JuceProcessor().chunk_document(doc))
+        store.build_and_save_bm25()
+
+        registry = StoreRegistry(check_interval=0)
+        shared = registry.get(str(tmp_path), "registry_test")
+        for _ in range(3):
+            results = registry.get(str(tmp_path), "registry_test").hybrid_query("Slider", top_k=1)
+            assert results["metadatas"][0][0]["title"] == "JUCE: juce::Slider Class Reference"
+
+        assert registry.get(str(tmp_path), "registry_test") is shared
+
+        # A rebuild swaps the store; the old one releases its retrieval threads
+        bm25_path = os.path.join(str(tmp_path), "bm25_index.bin")
+        os.utime(bm25_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        reloaded = registry.get(str(tmp_path), "registry_test")
+        assert reloaded is not shared
+        assert shared.retrieval_pool._shutdown
+        assert not reloaded.retrieval_pool._shutdown
+        reloaded.close()
@@ -0,0 +1,162 @@
+import json
+import os
+
+import pytest
+
+from src.build_rag import JuceProcessor, ScrapedDocument, ScrapedItem, VectorStore
+from src.symbols import SymbolIndex, looks_like_symbol, member_symbol, normalize_symbol
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+BASE = "https://docs.juce.com/master/"
+
+
+def fixture_doc(name):
+    with open(os.path.join(FIXTURES_DIR, name + ".expected.json"), encoding="utf-8") as f:
+        parsed = json.load(f)
+    return ScrapedDocument(url=BASE + name + ".html", title=parsed["title"],
+                           items=[ScrapedItem(**item) for item in parsed["items"]], version="master")
+
+
+def attachment_doc():
+    return ScrapedDocument(
+        url=BASE + "classjuce_1_1SliderParameterAttachment.html",
+        title="JUCE: juce::SliderParameterAttachment Class Reference",
+        items=[ScrapedItem(text="Connects a slider to a parameter, so the slider follows it.",
+                           metadata={"type": "class_description"}),
+               ScrapedItem(text="void juce::SliderParameterAttachment::sendInitialUpdate ( )\nCall once the slider is set up.",
+                           metadata={"type": "method"})],
+        version="master"
+    )
+
+
+@pytest.fixture
+def store(ollama_server, tmp_path):
+    store = VectorStore(db_path=str(tmp_path), collection_name="symbols_test")
+    processor = JuceProcessor()
+    for doc in (fixture_doc("classjuce_1_1Slider"), fixture_doc("structjuce_1_1AudioSourceChannelInfo"),
+                attachment_doc()):
+        store.add_documents(processor.chunk_document(doc))
+    store.build_and_save_bm25()
+    return VectorStore(db_path=str(tmp_path), collection_name="symbols_test")
+
+
+class TestSymbolParsing:
+
+    def test_member_symbol(self):
+        assert member_symbol("void juce::Slider::setRange ( double newMinimum , juce::String s )\nSets...") == "Slider::setRange"
+        assert member_symbol("std::function< void()> juce::Slider::onValueChange\nYou can...") == "Slider::onValueChange"
+        assert member_symbol("AudioBuffer <float>* juce::AudioSourceChannelInfo::buffer\nThe...") == "AudioSourceChannelInfo::buffer"
+        assert member_symbol("juce::Slider::~Slider ( )") == "Slider::~Slider"
+        assert member_symbol("Slider & juce::Slider::operator= ( const Slider & )") == "Slider::operator="
+        assert member_symbol("int dummy\nA memitem nested in the textblock.") is None
+
+    def test_normalize_and_detect(self):
+        assert normalize_symbol("juce::Slider :: setRange()") == "slider::setrange"
+        assert looks_like_symbol("AudioProcessorValueTreeState")
+        assert looks_like_symbol("juce::Slider::setRange")
+        assert looks_like_symbol("getValue()")
+        assert not looks_like_symbol("how to use Slider")
+        assert not looks_like_symbol("Slider.setRange")
+
+
+class TestSymbolIndex:
+
+    def build(self):
+        return SymbolIndex.build([
+            ("Slider", "Slider::setRange", False),
+            ("Slider", None, True),
+            ("Slider", "Slider::getValue", False),
+            ("SliderParameterAttachment", None, True),
+            ("Button", "Button::setRange", False),
+            (None, None, False),
+        ])
+
+    def test_lookup(self):
+        index = self.build()
+        assert index.lookup("Slider") == [1, 0, 2]  # Class description first
+        assert index.lookup("juce::slider") == [1, 0, 2]
+        assert index.lookup("juce::Slider::setRange") == [0]
+        assert index.lookup("setRange") == []  # Bare member names are ambiguous
+        assert index.members_named("setRange") == [0, 4]  # Every class declaring it
+        assert index.members_named("Slider") == [] and index.members_named("Slider::setRange") == []
+        assert index.lookup("Slider::missing") == []
+        assert index.name("juce::slider::getvalue") == "Slider::getValue"
+
+    def test_prefix(self):
+        index = self.build()
+        assert index.prefix("slider") == ["Slider", "Slider::getValue", "Slider::setRange", "SliderParameterAttachment"]
+        assert index.prefix("Slider::", limit=1) == ["Slider::getValue"]
+        assert index.prefix("Synth") == []
+
+    def test_save_and_open(self, tmp_path):
+        path = str(tmp_path / "symbols.json")
+        index = self.build()
+        index.save(path)
+        loaded = SymbolIndex.open(path)
+        assert loaded.corpus_size == 6
+        assert loaded.members_named("setRange") == index.members_named("setRange")
+        assert loaded.prefix("b") == ["Button", "Button::setRange"]
+
+
+class TestSymbolQueries:
+
+    def test_exact_class_lookup_skips_ollama(self, store, ollama_server):
+        requests_before = len(ollama_server.requests_seen)
+        results = store.hybrid_query("juce::Slider", top_k=6)
+
+        assert len(ollama_server.requests_seen) == requests_before
+        assert results["symbol"] == ["Slider"]
+        titles = [m["title"] for m in results["metadatas"][0]]
+        types = [m["type"] for m in results["metadatas"][0]]
+        assert titles[:4] == ["JUCE: juce::Slider Class Reference"] * 4
+        assert types[0] == "class_description"
+        # Remaining slots come from BM25 only
+        assert "JUCE: juce::SliderParameterAttachment Class Reference" in titles[4:]
+        assert results["scores"][0] == sorted(results["scores"][0], reverse=True)
+
+    def test_qualified_member_lookup(self, store):
+        results = store.hybrid_query("juce::Slider::setRange", top_k=1)
+        assert results["symbol"] == ["Slider::setRange"]
+        assert results["documents"][0][0].startswith("void juce::Slider::setRange (")
+
+    def test_lookup_respects_filters(self, store):
+        results = store.hybrid_query("Slider", top_k=3, filters={"type": "method"})
+        assert results["symbol"] == ["Slider"]
+        assert all(m["type"] == "method" for m in results["metadatas"][0])
+
+    def test_other_queries_use_the_hybrid_path(self, store, ollama_server):
+        for query in ("how do I set the slider range", "Synthesiser"):
+            requests_before = len(ollama_server.requests_seen)
+            results = store.hybrid_query(query, top_k=3)
+            assert len(ollama_server.requests_seen) == requests_before + 1
+            assert results["symbol"] == [None]
+        results = store.hybrid_query("Slider", top_k=3, symbol_lookup=False)
+        assert results["symbol"] == [None]
+
+    def test_stale_symbol_index_is_ignored(self, store, tmp_path):
+        SymbolIndex.build([("Slider", None, True)]).save(store.symbols_path)
+        reopened = VectorStore(db_path=str(tmp_path), collection_name="symbols_test")
+        assert reopened.symbols is None
+
+    def test_ambiguous_member_name_is_ranked_not_answered(self, ollama_server, tmp_path):
+        store = VectorStore(db_path=str(tmp_path), collection_name="members_test")
+        processor = JuceProcessor()
+        # Index order puts the other classes' clear() first
+        for name, text in (("Aaa", "Resets aaa."), ("Bbb", "Resets bbb."), ("Ccc", "Resets ccc."),
+                           ("AudioBuffer", "Clear: clear all samples, clear every channel.")):
+            store.add_documents(processor.chunk_document(ScrapedDocument(
+                url=f"{BASE}classjuce_1_1{name}.html", title=f"JUCE: juce::{name} Class Reference",
+                items=[ScrapedItem(text=f"A class called {name}.", metadata={"type": "class_description"}),
+                       ScrapedItem(text=f"void juce::{name}::clear ( )\n{text}", metadata={"type": "method"}),
+                       ScrapedItem(text=f"int juce::{name}::size ( )\nReturns the size.", metadata={"type": "method"}),
+                       ScrapedItem(text=f"bool juce::{name}::isEmpty ( )\nTrue if empty.", metadata={"type": "method"})],
+                version="master")))
+        store.build_and_save_bm25()
+        store = VectorStore(db_path=str(tmp_path), collection_name="members_test")
+
+        results = store.hybrid_query("clear", top_k=3)
+        assert results["symbol"] == [None]
+        assert results["legs"] == [{"bm25": "ok", "vector": "ok"}]
+        documents = results["documents"][0]
+        assert documents[0].startswith("void juce::AudioBuffer::clear")
+        assert all("::clear ( )" in doc for doc in documents)  # The boost keeps clear() members on top
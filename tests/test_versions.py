@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from src import bm25_index
+from src.bm25_index import InvertedBM25Index
+from src.build_rag import (DOCS_URL, JuceProcessor, JuceScraper, ScrapedDocument, ScrapedItem, VectorStore,
+                           docs_version, version_path)
+
+
+def make_doc(name, texts, version):
+    return ScrapedDocument(
+        url=DOCS_URL.format(version=version) + f"classjuce_1_1{name}.html",
+        title=f"JUCE: juce::{name} Class Reference",
+        items=[ScrapedItem(text=t, metadata={"type": "method"}) for t in texts],
+        version=version
+    )
+
+
+def build(db_path, docs):
+    """Full build of one docs version, the way build_rag.main() does it."""
+    store = VectorStore(db_path=str(db_path), collection_name="versions_test")
+    processor = JuceProcessor()
+    for doc in docs:
+        store.add_documents(processor.chunk_document(doc))
+    store.prune_stale_chunks()
+    store.build_and_save_bm25()
+    return store
+
+
+def texts_by_id(store):
+    stored = store.collection.get()
+    return dict(zip(stored["ids"], stored["documents"]))
+
+
+class TestVersionHelpers:
+
+    def test_docs_version(self):
+        assert docs_version("https://docs.juce.com/master/") == "master"
+        assert docs_version("https://docs.juce.com/7.0.12/") == "7.0.12"
+        assert docs_version("http://127.0.0.1:8000/") is None
+
+    def test_version_path(self):
+        assert version_path("https://docs.juce.com/8.0.3/classjuce_1_1Slider.html", "8.0.3") == "classjuce_1_1Slider.html"
+        assert version_path("http://docs.test/a.html", None) == "http://docs.test/a.html"
+
+    def test_scraper_version(self):
+        assert JuceScraper().version == "master"
+        scraper = JuceScraper(version="7.0.12")
+        assert scraper.base_url == "https://docs.juce.com/7.0.12/"
+        assert scraper.version == "7.0.12"
+
+    def test_identical_chunks_share_ids_across_versions(self):
+        processor = JuceProcessor()
+        master = processor.chunk_document(make_doc("Slider", ["setRange", "getValue"], "master"))
+        old = processor.chunk_document(make_doc("Slider", ["getValue", "setSkew"], "7.0.12"))
+        assert master[1]["id"] == old[0]["id"]
+        assert master[0]["id"] != old[1]["id"]
+        assert old[0]["metadata"]["version"] == "7.0.12"
+
+
+class TestMultiVersionStore:
+
+    def test_second_version_embeds_only_the_delta(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range", "getValue returns the value"], "master")])
+        ollama_server.prompts.clear()
+
+        store = build(tmp_path, [make_doc("Slider", ["setRange sets the range", "setSkew sets the skew"], "7.0.12")])
+
+        assert ollama_server.prompts == ["setSkew sets the skew"]
+        assert store.collection.count() == 3
+        assert len(store.bm25_mapping) == 3
+        assert store.build_stats["metadata_updated"] == 1
+        versions = {store.manifest[id_]["text"]: store.manifest[id_]["versions"] for id_ in store.manifest}
+        assert sorted(versions.values()) == [["7.0.12"], ["7.0.12", "master"], ["master"]]
+
+    def test_version_filter(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range", "getValue returns the value"], "master")])
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range", "setSkew sets the skew"], "7.0.12")])
+        store = VectorStore(db_path=str(tmp_path), collection_name="versions_test")
+
+        old = store.hybrid_query("sets the range value skew", top_k=5, version="7.0.12")
+        assert sorted(old["documents"][0]) == ["setRange sets the range", "setSkew sets the skew"]
+        for meta in old["metadatas"][0]:
+            assert meta["url"] == "https://docs.juce.com/7.0.12/classjuce_1_1Slider.html"
+            assert meta["version"] == "7.0.12"
+            assert not any(key.startswith("version:") for key in meta)
+
+        master = store.hybrid_query("sets the range value skew", top_k=5, version="master")
+        assert sorted(master["documents"][0]) == ["getValue returns the value", "setRange sets the range"]
+        assert {m["url"] for m in master["metadatas"][0]} == {"https://docs.juce.com/master/classjuce_1_1Slider.html"}
+
+        everything = store.hybrid_query("sets the range value skew", top_k=5)
+        assert len(everything["documents"][0]) == 3
+        assert store.hybrid_query("sets the range", top_k=5, version="6.1.6")["ids"] == [[]]
+
+        vector_only = store.query("skew", n_results=5, version="master")
+        assert "setSkew sets the skew" not in vector_only["documents"][0]
+
+    def test_rebuild_prunes_only_its_own_version(self, ollama_server, tmp_path):
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range", "getValue returns the value"], "master")])
+        build(tmp_path, [make_doc("Slider", ["setRange sets the range", "setSkew sets the skew"], "7.0.12")])
+
+        # setRange left master, getValue was removed from it entirely
+        store = build(tmp_path, [make_doc("Slider", ["setValue sets the value"], "master")])
+
+        assert sorted(texts_by_id(store).values()) == ["setRange sets the range", "setSkew sets the skew",
+                                                        "setValue sets the value"]
+        assert store.build_stats["deleted"] == 1
+        master = store.hybrid_query("sets the range", top_k=5, version="master")
+        assert master["documents"][0] == ["setValue sets the value"]
+        old = store.hybrid_query("sets the range", top_k=5, version="7.0.12")
+        assert sorted(old["documents"][0]) == ["setRange sets the range", "setSkew sets the skew"]
+
+    def test_chunks_without_version_belong_to_master(self, ollama_server, tmp_path):
+        doc = make_doc("Slider", ["setRange sets the range"], "master")
+        doc.version = None
+        store = build(tmp_path, [doc])
+        assert store.hybrid_query("range", version="master")["documents"][0] == ["setRange sets the range"]
+        assert store.hybrid_query("range", version="8.0.0")["documents"][0] == []
+
+
+class TestBM25VersionMask:
+
+    def test_version_mask(self):
+        index = InvertedBM25Index.build([["a"], ["a", "b"], ["b"]], doc_ids=["x", "y", "z"],
+                                        doc_versions=[["master"], ["master", "7.0.12"], ["7.0.12"]])
+        assert index.version_mask("master").tolist() == [True, True, False]
+        assert index.version_mask("7.0.12").tolist() == [False, True, True]
+        assert not index.version_mask("6.0.0").any()
+        assert [doc for doc, _ in index.top_k(["a"], 5, doc_mask=index.version_mask("7.0.12"))] == [1]
+
+    def test_masks_survive_save_and_open(self, tmp_path):
+        path = str(tmp_path / "bm25_index.bin")
+        InvertedBM25Index.build([["a"], ["a", "b"]], doc_versions=[["8.0.3"], ["7.0.12"]]).save(path)
+        index = InvertedBM25Index.open(path)
+        assert index.version_names == ["7.0.12", "8.0.3"]
+        assert index.version_mask("8.0.3").tolist() == [True, False]
+
+    def test_opens_version_1_files(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "bm25_index.bin")
+        with monkeypatch.context() as m:
+            m.setattr(bm25_index, "FORMAT_VERSION", 1)
+            m.setattr(bm25_index, "SECTIONS", bm25_index.SECTIONS_V1)
+            m.setattr(bm25_index, "HEADER", bm25_index._header(bm25_index.SECTIONS_V1))
+            InvertedBM25Index.build([["a"], ["a", "b"]], doc_ids=["x", "y"]).save(path)
+
+        index = InvertedBM25Index.open(path)
+        assert list(index.doc_ids) == ["x", "y"]
+        assert index.version_mask("master") is None
+        assert [doc for doc, _ in index.top_k(["b"], 5)] == [1]
+
+    def test_too_many_versions(self):
+        with pytest.raises(ValueError):
+            InvertedBM25Index.build([["a"]] * 65, doc_versions=[[str(i)] for i in range(65)])
+
+    def test_unversioned_index_maps_to_master(self, ollama_server, tmp_path):
+        store = VectorStore(db_path=str(tmp_path), collection_name="versions_test")
+        store.bm25 = InvertedBM25Index.build([["a"], ["b"]])
+        assert store.bm25_version_mask("master") is None
+        assert not np.any(store.bm25_version_mask("7.0.12"))